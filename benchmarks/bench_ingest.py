@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# 目的：行情接入吞吐基准：OrderBookStore.update_from_message 单条写入，以及 解码 -> 写入 -> 检测 全链路，
+#       在 100 / 1k / 10k 个订阅 token 下的 消息/秒 与 µs/消息；可选一个读线程持续全量扫描，模拟 run_once 与写入争锁
+# 方法：用 src.mock_clob.SyntheticFlow 按固定种子预生成 book / price_change / last_trade_price 帧（计时不含生成），
+#       每个场景重复 --repeat 次取最好成绩与中位数；结果写 JSON（含 commit、Python 版本、是否安装 orjson），
+#       --compare 与另一次结果逐项对比，µs/消息 变慢超过 --threshold 时标为回退并以非 0 退出
+# 示例：python benchmarks/bench_ingest.py
+#       python benchmarks/bench_ingest.py --tokens 1000 --messages 50000 --compare benchmarks/results/<上次>.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.arbitrage import scan_markets_all_strategies
+from src.mock_clob import SyntheticFlow
+from src.orderbook import OrderBookStore, _orjson, decode_frame
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# 场景名 -> 是否带争锁读线程
+CASES = (
+    ("update_from_message", False),
+    ("update_from_message+reader", True),
+    ("decode_apply_detect", False),
+    ("decode_apply_detect+reader", True),
+)
+
+
+@dataclass
+class Workload:
+    """目的：一个 token 规模下的基准输入。方法：markets 与初始 book 快照用于建 store，frames 为计时的原始帧"""
+    markets: List[Dict[str, Any]]
+    books: List[Dict[str, Any]]
+    frames: List[str]
+
+
+def build_workload(tokens: int, messages: int, book_ratio: float = 0.05, seed: int = 0) -> Workload:
+    """
+    目的：预生成一组真实形态的原始帧
+    方法：tokens/2 个二元市场；按 book_ratio 混入单个 token 的 book 全量快照（模拟重连/重订阅），其余为合成增量；
+         每帧为一条消息的 JSON 文本，与 CLOB 推送一致
+    """
+    flow = SyntheticFlow(num_markets=max(1, tokens // 2), seed=seed)
+    books = [flow.snapshot(aid) for aid in flow.asset_ids]
+    rng = random.Random(seed + 1)
+    frames: List[str] = []
+    t = 0.0
+    while len(frames) < messages:
+        t += 0.001
+        if rng.random() < book_ratio:
+            frames.append(json.dumps([flow.snapshot(rng.choice(flow.asset_ids))]))
+            continue
+        for msg in flow.step(t, 1):
+            frames.append(json.dumps(msg))
+    return Workload(flow.markets, books, frames[:messages])
+
+
+def _fresh_store(work: Workload) -> OrderBookStore:
+    store = OrderBookStore()
+    store.set_markets(work.markets)
+    store.apply_batch(work.books)
+    store.pop_dirty_markets()
+    return store
+
+
+def _start_reader(store: OrderBookStore, markets: List[Dict[str, Any]]) -> Tuple[Callable[[], int], threading.Thread]:
+    """目的：后台读线程不停地对全部市场跑一轮检测（同 run_once 的轮询模式），与写入争锁。返回：(停止并取扫描轮数, 线程)"""
+    stop = threading.Event()
+    scans = [0]
+
+    def _loop() -> None:
+        while not stop.is_set():
+            scan_markets_all_strategies(markets, store.get_market_snapshot, min_profit=0.005, maker_enabled=True)
+            scans[0] += 1
+
+    t = threading.Thread(target=_loop, daemon=True, name="bench-reader")
+    t.start()
+
+    def _stop() -> int:
+        stop.set()
+        t.join()
+        return scans[0]
+
+    return _stop, t
+
+
+def run_case(work: Workload, case: str, with_reader: bool) -> Dict[str, Any]:
+    """
+    目的：跑一次场景并计时
+    方法：update_from_message 场景先在计时外解码，只计写入；decode_apply_detect 场景每帧 decode_frame -> apply_batch ->
+         pop_dirty_markets -> 对脏市场 scan_markets_all_strategies，与事件驱动主循环一帧的工作量相同
+    """
+    store = _fresh_store(work)
+    frames = work.frames
+    by_cid = {m["condition_id"]: m for m in work.markets}
+    decoded = [decode_frame(f) for f in frames] if case.startswith("update_from_message") else None
+    stop_reader = None
+    if with_reader:
+        stop_reader, _ = _start_reader(store, work.markets)
+    detected = 0
+    t0 = time.perf_counter()
+    if decoded is not None:
+        update = store.update_from_message
+        for msgs in decoded:
+            for msg in msgs:
+                update(msg)
+    else:
+        for raw in frames:
+            store.apply_batch(decode_frame(raw))
+            dirty = store.pop_dirty_markets()
+            if dirty:
+                batch = [by_cid[cid] for cid in dirty if cid in by_cid]
+                detected += len(batch)
+                scan_markets_all_strategies(batch, store.get_market_snapshot, min_profit=0.005, maker_enabled=True)
+    elapsed = time.perf_counter() - t0
+    scans = stop_reader() if stop_reader is not None else 0
+    return {"seconds": elapsed, "reader_scans": scans, "markets_detected": detected}
+
+
+def run_suite(token_counts: List[int], messages: int, repeat: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """目的：对每个 token 规模、每个场景重复 repeat 次。返回：结果行列表（best/median 的 msgs_per_sec 与 us_per_msg）"""
+    rows: List[Dict[str, Any]] = []
+    for tokens in token_counts:
+        work = build_workload(tokens, messages, seed=seed)
+        n = len(work.frames)
+        for case, with_reader in CASES:
+            runs = [run_case(work, case, with_reader) for _ in range(max(1, repeat))]
+            secs = sorted(r["seconds"] for r in runs)
+            best, median = secs[0], statistics.median(secs)
+            rows.append({
+                "case": case,
+                "tokens": 2 * len(work.markets),
+                "messages": n,
+                "best_sec": best,
+                "median_sec": median,
+                "msgs_per_sec": n / best,
+                "us_per_msg": best / n * 1e6,
+                "median_us_per_msg": median / n * 1e6,
+                "reader_scans": runs[0]["reader_scans"],
+            })
+    return rows
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """
+    目的：与基线结果逐项对比
+    方法：按 (case, tokens) 配对，change = 当前 / 基线 - 1（µs/消息，正数为变慢）；超过 threshold 标为 regression
+    """
+    base = {(r["case"], r["tokens"]): r for r in baseline}
+    out = []
+    for r in current:
+        b = base.get((r["case"], r["tokens"]))
+        if b is None:
+            continue
+        change = r["us_per_msg"] / b["us_per_msg"] - 1.0
+        out.append({"case": r["case"], "tokens": r["tokens"], "baseline_us": b["us_per_msg"],
+                    "current_us": r["us_per_msg"], "change": change, "regression": change > threshold})
+    return out
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="行情接入吞吐基准")
+    p.add_argument("--tokens", type=str, default="100,1000,10000", help="订阅 token 数，逗号分隔")
+    p.add_argument("--messages", type=int, default=20000, help="每个场景的消息数")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=str, default=None, help="结果 JSON 路径（默认 benchmarks/results/<时间>-<commit>.json）")
+    p.add_argument("--compare", type=str, default=None, help="与该结果 JSON 对比")
+    p.add_argument("--threshold", type=float, default=0.10, help="µs/消息 变慢超过该比例视为回退")
+    args = p.parse_args()
+
+    token_counts = [int(x) for x in args.tokens.split(",") if x.strip()]
+    rows = run_suite(token_counts, args.messages, args.repeat, args.seed)
+    commit = _git_commit()
+    result = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "orjson": _orjson is not None,
+            "messages": args.messages,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": rows,
+    }
+    print("%-28s %7s %12s %10s %10s %8s" % ("case", "tokens", "msgs/s", "µs/msg", "median", "scans"))
+    for r in rows:
+        print("%-28s %7d %12.0f %10.2f %10.2f %8d" % (
+            r["case"], r["tokens"], r["msgs_per_sec"], r["us_per_msg"], r["median_us_per_msg"], r["reader_scans"],
+        ))
+    out = args.out or os.path.join(RESULTS_DIR, "%s-%s.json" % (time.strftime("%Y%m%d-%H%M%S"), commit))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print("结果已写入:", out)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        diffs = compare(rows, baseline.get("results", []), args.threshold)
+        print("对比 %s（commit %s）:" % (args.compare, baseline.get("meta", {}).get("commit")))
+        for d in diffs:
+            print("%-28s %7d %10.2f -> %10.2f µs %+7.1f%%%s" % (
+                d["case"], d["tokens"], d["baseline_us"], d["current_us"], d["change"] * 100,
+                "  <- 回退" if d["regression"] else "",
+            ))
+        if any(d["regression"] for d in diffs):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
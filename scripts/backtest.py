@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# 目的：对录制的行情帧做离线回测，输出各策略 PnL、命中率、机会持续时间与资金占用
+# 方法：读取 capture_dir 下的录制文件与 markets.json，按配置（可用命令行覆盖）运行 src.backtest.run_backtest
+# 示例：python scripts/backtest.py --capture-dir captures --min-profit 0.01 --maker --json result.json
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backtest import run_backtest
+from src.capture import list_capture_files, load_markets
+from src.config_loader import load_config
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="回放录制行情，回测套利与波动策略")
+    p.add_argument("--capture-dir", type=str, default="captures", help="录制目录（含 frames-*.bin[.gz] 与 markets.json）")
+    p.add_argument("--markets", type=str, default=None, help="市场列表 JSON（默认 capture-dir/markets.json）")
+    p.add_argument("--config", type=str, default=None, help="配置文件路径（默认同 main）")
+    p.add_argument("--min-profit", type=float, default=None)
+    p.add_argument("--fee-bps", type=float, default=None)
+    p.add_argument("--size", type=float, default=None, help="default_size")
+    p.add_argument("--maker-bid-spread", type=float, default=None)
+    p.add_argument("--maker", action="store_true", help="启用 Maker 策略")
+    p.add_argument("--volatility", action="store_true", help="启用波动策略")
+    p.add_argument("--volatility-deviation-pct", type=float, default=None)
+    p.add_argument("--volatility-hold-sec", type=float, default=60.0, help="波动策略模拟持仓秒数")
+    p.add_argument("--json", type=str, default=None, help="把结果写入 JSON 文件")
+    args = p.parse_args()
+
+    config = load_config(args.config)
+    for key, value in (
+        ("min_profit", args.min_profit),
+        ("fee_bps", args.fee_bps),
+        ("default_size", args.size),
+        ("maker_bid_spread", args.maker_bid_spread),
+        ("volatility_deviation_pct", args.volatility_deviation_pct),
+    ):
+        if value is not None:
+            config[key] = value
+    if args.maker:
+        config["maker_arb_enabled"] = True
+    if args.volatility:
+        config["volatility_enabled"] = True
+
+    files = list_capture_files(args.capture_dir)
+    if not files:
+        print("录制目录下没有录制文件:", args.capture_dir)
+        return 1
+    if args.markets:
+        with open(args.markets, "r", encoding="utf-8") as f:
+            markets = json.load(f)
+    else:
+        markets = load_markets(args.capture_dir)
+    if not markets:
+        print("缺少市场列表（markets.json），无法把 token 对应到市场")
+        return 1
+
+    result = run_backtest(files, markets, config, volatility_hold_sec=args.volatility_hold_sec)
+    print("文件 %d 个，帧 %d，覆盖 %.1fs，耗时 %.2fs（%.0fx 实时）" % (
+        len(files), result.frames, result.sim_seconds, result.wall_seconds, result.speedup,
+    ))
+    print("%-10s %8s %8s %8s %10s %12s %12s %10s %10s" % (
+        "strategy", "signals", "trades", "hit%", "pnl", "capital", "cap_peak", "avg_dur", "max_dur",
+    ))
+    for name, st in result.strategies.items():
+        d = st.to_dict()
+        print("%-10s %8d %8d %8.1f %10.4f %12.2f %12.2f %10.2f %10.2f" % (
+            name, d["signals"], d["trades"], d["hit_rate"] * 100, d["pnl"],
+            d["capital_used"], d["capital_peak"], d["avg_duration_sec"], d["max_duration_sec"],
+        ))
+    print("总 PnL: %.4f" % result.total_pnl)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
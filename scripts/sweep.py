@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# 目的：多进程参数扫描：对同一份录制数据并行回测一组配置变体，输出按 PnL 排序的结果表
+# 方法：可选先从实时行情录制 --record-seconds 秒（市场取 24h 成交量 top N）；再按逗号分隔的参数列表展开网格，调用 src.sweep.run_sweep
+# 示例：python scripts/sweep.py --capture-dir captures --min-profit 0.005,0.01,0.02 --maker-bid-spread 0.005,0.01 --maker --workers 8
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.capture import list_capture_files, load_markets, record_live
+from src.config_loader import load_config
+from src.sweep import format_table, run_sweep
+
+# 命令行参数 -> 配置键及取值类型
+GRID_ARGS = (
+    ("min_profit", "min_profit", float),
+    ("fee_bps", "fee_bps", float),
+    ("maker_bid_spread", "maker_bid_spread", float),
+    ("size", "default_size", float),
+    ("volatility_window", "volatility_window_size", int),
+    ("volatility_deviation_pct", "volatility_deviation_pct", float),
+)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="并行参数扫描（基于录制行情回测）")
+    p.add_argument("--capture-dir", type=str, default="captures", help="录制目录（含 frames-*.bin[.gz] 与 markets.json）")
+    p.add_argument("--config", type=str, default=None, help="基准配置文件路径（默认同 main）")
+    p.add_argument("--record-seconds", type=float, default=0.0, help=">0 时先从实时行情录制 N 秒到 capture-dir")
+    p.add_argument("--record-markets", type=int, default=50, help="录制时订阅的 top N 市场数")
+    for flag, _, _ in GRID_ARGS:
+        p.add_argument("--" + flag.replace("_", "-"), type=str, default=None, help="逗号分隔的取值列表")
+    p.add_argument("--maker", action="store_true", help="启用 Maker 策略")
+    p.add_argument("--volatility", action="store_true", help="启用波动策略")
+    p.add_argument("--volatility-hold-sec", type=float, default=60.0)
+    p.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    p.add_argument("--rank-by", type=str, default="total_pnl")
+    p.add_argument("--top", type=int, default=20, help="只打印前 N 行")
+    p.add_argument("--json", type=str, default=None, help="把全部结果写入 JSON 文件")
+    args = p.parse_args()
+
+    if args.record_seconds > 0:
+        from src.gamma import fetch_top10_binary_markets_by_volume
+
+        markets = fetch_top10_binary_markets_by_volume(top_n=args.record_markets)
+        print("录制 %d 个市场 %.0fs 到 %s ..." % (len(markets), args.record_seconds, args.capture_dir))
+        n = record_live(args.capture_dir, markets, args.record_seconds)
+        print("录制完成，%d 帧" % n)
+
+    files = list_capture_files(args.capture_dir)
+    markets = load_markets(args.capture_dir)
+    if not files or not markets:
+        print("录制目录下缺少录制文件或 markets.json:", args.capture_dir)
+        return 1
+
+    base = load_config(args.config)
+    if args.maker:
+        base["maker_arb_enabled"] = True
+    if args.volatility:
+        base["volatility_enabled"] = True
+    grid = {}
+    for flag, key, cast in GRID_ARGS:
+        raw = getattr(args, flag)
+        if raw:
+            grid[key] = [cast(v) for v in raw.split(",") if v.strip()]
+
+    rows = run_sweep(
+        files, markets, grid, base_config=base, max_workers=args.workers,
+        volatility_hold_sec=args.volatility_hold_sec, rank_by=args.rank_by,
+    )
+    print(format_table(rows, limit=args.top))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,14 @@
 #       「买 YES 的最优卖价 + 买 NO 的最优卖价」< 1
 # orderbook 上：买 YES 的最优卖价 = YES 合约的 best ask，买 NO 的最优卖价 = NO 合约的 best ask
 # 方法：对同一 market 的 YES/NO token 取 get_best_ask；若 ask_yes + ask_no < 1 - min_profit 则生成套利信号（fee=0 时）
+# 数量：传入深度时沿两腿订单簿同步逐档吃单（walk_joint），直到边际利润低于 min_profit，再按单市场剩余仓位
+#       （及可选的单笔上限 max_order_size）封顶；可获利深度不足 min_book_depth 的市场不出信号；未传深度时沿用 default_size
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 订单簿一边的档位，按从优到劣排序的 (price, size)，同 OrderBookStore.get_depth
+Levels = List[Tuple[float, float]]
 
 
 @dataclass
@@ -23,6 +28,8 @@ class ArbitrageSignal:
     condition_id: str = ""
     question: str = ""
     arb_type: str = "merge"  # "merge" 表示买入 YES+NO 后等待结算或合并
+    seq_yes: int = 0  # 检测所用快照中 YES 腿的更新序号（0 表示未知），下单前用于校验报价仍为最新
+    seq_no: int = 0
 
 
 @dataclass
@@ -40,6 +47,8 @@ class SplitArbitrageSignal:
     condition_id: str = ""
     question: str = ""
     arb_type: str = "split"  # "split" 表示拆分 USDC 后卖出
+    seq_yes: int = 0  # 同 ArbitrageSignal.seq_yes
+    seq_no: int = 0
 
 
 @dataclass
@@ -60,6 +69,123 @@ class MakerArbitrageSignal:
     condition_id: str = ""
     question: str = ""
     arb_type: str = "maker"  # "maker" 表示 Maker 策略
+    seq_yes: int = 0  # 同 ArbitrageSignal.seq_yes
+    seq_no: int = 0
+
+
+@dataclass
+class JointFill:
+    """
+    目的：多腿同步吃单的结果（YES/NO 两腿，或多结果事件的 N 腿）
+    方法：size 为每腿成交量（各腿相同），profit 为逐档边际利润之和，worst 为各腿吃到的最差价（即下单限价）；
+         depth 为不受 max_size 限制时边际利润仍达标的总深度，用于 min_book_depth 过滤
+    """
+    size: float = 0.0
+    profit: float = 0.0
+    worst: List[Optional[float]] = field(default_factory=list)
+    depth: float = 0.0
+
+    @property
+    def worst_yes(self) -> Optional[float]:
+        return self.worst[0] if self.worst else None
+
+    @property
+    def worst_no(self) -> Optional[float]:
+        return self.worst[1] if len(self.worst) > 1 else None
+
+
+def walk_legs(
+    legs: List[Levels],
+    edge: Callable[[List[float]], float],
+    min_profit: float,
+    max_size: Optional[float] = None,
+) -> JointFill:
+    """
+    目的：求各腿一起成交时利润最大的数量：只要下一份的边际利润 edge(各腿当前价) >= min_profit 就继续加量
+    方法：每腿持一个档位指针，每步取各腿当前档剩余量的最小者；档位吃完则前进，任一腿吃完或边际利润不达标即停。
+         max_size 只截断 size/profit，depth 继续累计到边际利润不达标为止
+    """
+    fill = JointFill(worst=[None] * len(legs))
+    if not legs:
+        return fill
+    idx = [0] * len(legs)
+    left = [lv[0][1] if lv else 0.0 for lv in legs]
+    while all(idx[k] < len(lv) for k, lv in enumerate(legs)):
+        prices = [lv[idx[k]][0] for k, lv in enumerate(legs)]
+        e = edge(prices)
+        if e < min_profit:
+            break
+        q = min(left)
+        if q > 0:
+            fill.depth += q
+            take = q if max_size is None else min(q, max_size - fill.size)
+            if take > 0:
+                fill.size += take
+                fill.profit += e * take
+                fill.worst = prices
+        for k, lv in enumerate(legs):
+            left[k] -= q
+            if left[k] <= 1e-12:
+                idx[k] += 1
+                left[k] = lv[idx[k]][1] if idx[k] < len(lv) else 0.0
+    return fill
+
+
+def walk_joint(
+    levels_yes: Levels,
+    levels_no: Levels,
+    edge: Callable[[float, float], float],
+    min_profit: float,
+    max_size: Optional[float] = None,
+) -> JointFill:
+    """目的：二元市场两腿的 walk_legs，edge 以 (price_yes, price_no) 调用"""
+    return walk_legs([levels_yes, levels_no], lambda p: edge(p[0], p[1]), min_profit, max_size)
+
+
+def size_from_depth(
+    legs: List[Levels],
+    edge: Callable[[List[float]], float],
+    min_profit: float,
+    min_book_depth: float,
+    max_size: Optional[float],
+) -> Optional[JointFill]:
+    """
+    目的：按深度定量并做深度/仓位过滤。返回：可下单的 JointFill，可获利深度不足 min_book_depth 或无剩余仓位时为 None
+    方法：只有最优价、没有数量的档位（旧格式 bid/ask 消息写入的 size=0）视为深度未知，返回 JointFill(depth=-1)，由调用方沿用 default_size
+    """
+    if any(not any(q > 0 for _, q in lv) for lv in legs):
+        return JointFill(depth=-1.0)
+    fill = walk_legs(legs, edge, min_profit, max_size)
+    if fill.depth <= 0 or fill.depth < min_book_depth or fill.size <= 0:
+        return None
+    return fill
+
+
+def size_cap(max_size: Optional[float], max_order_size: Optional[float] = None) -> Optional[float]:
+    """
+    目的：按深度定量时的数量上限：剩余可加仓数量 max_size 与可选的单笔上限 max_order_size 取小
+    方法：max_order_size 为 None 或 <= 0 表示不设单笔上限；两者都没有时返回 None（只受可获利深度约束）
+    """
+    caps = [c for c in (max_size, max_order_size if max_order_size and max_order_size > 0 else None) if c is not None]
+    return min(caps) if caps else None
+
+
+def _snapshot_getters(snapshot: Any) -> Tuple[Callable[[str], Optional[float]], Callable[[str], Optional[float]]]:
+    """
+    目的：把一次性读取的市场快照包装成 get_best_ask/get_best_bid，使 check_* 在两腿一致的报价上计算
+    方法：按 token_id 匹配快照中的 YES/NO 腿；快照为 OrderBookStore.get_market_snapshot 返回的 MarketSnapshot
+    """
+    def get_ask(tid: str) -> Optional[float]:
+        if tid == snapshot.token_id_yes:
+            return snapshot.ask_yes
+        return snapshot.ask_no if tid == snapshot.token_id_no else None
+
+    def get_bid(tid: str) -> Optional[float]:
+        if tid == snapshot.token_id_yes:
+            return snapshot.bid_yes
+        return snapshot.bid_no if tid == snapshot.token_id_no else None
+
+    return get_ask, get_bid
 
 
 def check_arbitrage(
@@ -71,10 +197,17 @@ def check_arbitrage(
     default_size: float = 5.0,
     condition_id: str = "",
     question: str = "",
+    get_asks: Optional[Callable[[str], Levels]] = None,
+    min_book_depth: float = 0.0,
+    max_size: Optional[float] = None,
+    max_order_size: Optional[float] = None,
 ) -> Optional[ArbitrageSignal]:
     """
     目的：判断同一二元市场的 YES/NO 买价之和是否 < 1，若成立则返回套利信号
     方法：Polymarket 无手续费，套利条件为 ask_yes + ask_no < 1（再扣 min_profit 阈值）；利润 = 1 - (ask_yes + ask_no)
+    get_asks 非空时（返回某 token 的 asks 档位）沿两腿 asks 同步定量，price_yes/price_no 为吃到的最差价、expected_profit 为逐档利润之和；
+    max_size 为该市场剩余可加仓数量（<= 0 时不出信号），max_order_size 为可选的单笔上限；
+    有深度时数量 = min(可获利深度, max_size, max_order_size)，深度未知时为 default_size 按同样上限封顶
     """
     ask_yes = get_best_ask(token_id_yes)
     ask_no = get_best_ask(token_id_no)
@@ -92,14 +225,28 @@ def check_arbitrage(
 
     if net_profit < min_profit:
         return None
+    if max_size is not None and max_size <= 0:
+        return None
+
+    cap = size_cap(max_size, max_order_size)
+    size, profit = default_size if cap is None else min(default_size, cap), None
+    if get_asks is not None:
+        fill = size_from_depth(
+            [get_asks(token_id_yes), get_asks(token_id_no)],
+            lambda p: 1.0 - p[0] - p[1] - fee, min_profit, min_book_depth, cap,
+        )
+        if fill is None:
+            return None
+        if fill.depth >= 0:
+            size, profit, ask_yes, ask_no = fill.size, fill.profit, fill.worst_yes, fill.worst_no
 
     return ArbitrageSignal(
         token_id_yes=token_id_yes,
         token_id_no=token_id_no,
         price_yes=ask_yes,
         price_no=ask_no,
-        size=default_size,
-        expected_profit=net_profit * default_size,
+        size=size,
+        expected_profit=net_profit * size if profit is None else profit,
         condition_id=condition_id,
         question=question,
     )
@@ -111,10 +258,12 @@ def scan_markets_for_arbitrage(
     min_profit: float = 0.005,
     fee_bps: float = 0.0,
     default_size: float = 5.0,
+    get_snapshot: Optional[Callable[[str, str], Any]] = None,
 ) -> List[ArbitrageSignal]:
     """
     目的：对多个二元市场批量检测 Merge 套利机会，供 main 循环调用
-    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_arbitrage，收集非空信号
+    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_arbitrage，收集非空信号；
+         传入 get_snapshot 时每个市场一次性读取两腿快照，信号带上两腿序号
     """
     signals: List[ArbitrageSignal] = []
     for m in markets:
@@ -122,10 +271,11 @@ def scan_markets_for_arbitrage(
         tn = m.get("token_id_no")
         if not ty or not tn:
             continue
+        snap = get_snapshot(ty, tn) if get_snapshot is not None else None
         sig = check_arbitrage(
             token_id_yes=ty,
             token_id_no=tn,
-            get_best_ask=get_best_ask,
+            get_best_ask=_snapshot_getters(snap)[0] if snap is not None else get_best_ask,
             min_profit=min_profit,
             fee_bps=fee_bps,
             default_size=default_size,
@@ -133,6 +283,8 @@ def scan_markets_for_arbitrage(
             question=m.get("question", ""),
         )
         if sig is not None:
+            if snap is not None:
+                sig.seq_yes, sig.seq_no = snap.seq_yes, snap.seq_no
             signals.append(sig)
     return signals
 
@@ -146,11 +298,16 @@ def check_split_arbitrage(
     default_size: float = 5.0,
     condition_id: str = "",
     question: str = "",
+    get_bids: Optional[Callable[[str], Levels]] = None,
+    min_book_depth: float = 0.0,
+    max_size: Optional[float] = None,
+    max_order_size: Optional[float] = None,
 ) -> Optional[SplitArbitrageSignal]:
     """
     目的：判断同一二元市场的 YES/NO 卖价（bid）之和是否 > 1，若成立则返回 Split 套利信号
     方法：Polymarket 无手续费，Split 套利条件为 bid_yes + bid_no > 1 + min_profit；
          利润 = (bid_yes + bid_no) - 1（用 $1 USDC 拆分成 YES+NO，然后卖出）
+    get_bids 非空时沿两腿 bids 同步定量，bid_yes/bid_no 为吃到的最低价（卖出限价）；max_size、max_order_size 与数量同 check_arbitrage
     """
     bid_yes = get_best_bid(token_id_yes)
     bid_no = get_best_bid(token_id_no)
@@ -168,14 +325,28 @@ def check_split_arbitrage(
 
     if net_profit < min_profit:
         return None
+    if max_size is not None and max_size <= 0:
+        return None
+
+    cap = size_cap(max_size, max_order_size)
+    size, profit = default_size if cap is None else min(default_size, cap), None
+    if get_bids is not None:
+        fill = size_from_depth(
+            [get_bids(token_id_yes), get_bids(token_id_no)],
+            lambda p: p[0] + p[1] - 1.0 - fee, min_profit, min_book_depth, cap,
+        )
+        if fill is None:
+            return None
+        if fill.depth >= 0:
+            size, profit, bid_yes, bid_no = fill.size, fill.profit, fill.worst_yes, fill.worst_no
 
     return SplitArbitrageSignal(
         token_id_yes=token_id_yes,
         token_id_no=token_id_no,
         bid_yes=bid_yes,
         bid_no=bid_no,
-        size=default_size,
-        expected_profit=net_profit * default_size,
+        size=size,
+        expected_profit=net_profit * size if profit is None else profit,
         condition_id=condition_id,
         question=question,
     )
@@ -187,10 +358,12 @@ def scan_markets_for_split_arbitrage(
     min_profit: float = 0.005,
     fee_bps: float = 0.0,
     default_size: float = 5.0,
+    get_snapshot: Optional[Callable[[str, str], Any]] = None,
 ) -> List[SplitArbitrageSignal]:
     """
     目的：对多个二元市场批量检测 Split 套利机会，供 main 循环调用
-    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_split_arbitrage，收集非空信号
+    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_split_arbitrage，收集非空信号；
+         传入 get_snapshot 时每个市场一次性读取两腿快照，信号带上两腿序号
     """
     signals: List[SplitArbitrageSignal] = []
     for m in markets:
@@ -198,10 +371,11 @@ def scan_markets_for_split_arbitrage(
         tn = m.get("token_id_no")
         if not ty or not tn:
             continue
+        snap = get_snapshot(ty, tn) if get_snapshot is not None else None
         sig = check_split_arbitrage(
             token_id_yes=ty,
             token_id_no=tn,
-            get_best_bid=get_best_bid,
+            get_best_bid=_snapshot_getters(snap)[1] if snap is not None else get_best_bid,
             min_profit=min_profit,
             fee_bps=fee_bps,
             default_size=default_size,
@@ -209,6 +383,8 @@ def scan_markets_for_split_arbitrage(
             question=m.get("question", ""),
         )
         if sig is not None:
+            if snap is not None:
+                sig.seq_yes, sig.seq_no = snap.seq_yes, snap.seq_no
             signals.append(sig)
     return signals
 
@@ -224,6 +400,10 @@ def check_maker_arbitrage(
     default_size: float = 5.0,
     condition_id: str = "",
     question: str = "",
+    get_asks: Optional[Callable[[str], Levels]] = None,
+    min_book_depth: float = 0.0,
+    max_size: Optional[float] = None,
+    max_order_size: Optional[float] = None,
 ) -> Optional[MakerArbitrageSignal]:
     """
     目的：判断是否存在 Maker 套利机会（在 YES 和 NO 两边挂 Maker 买单）
@@ -232,6 +412,8 @@ def check_maker_arbitrage(
     2. 计算 Maker 买单价格：maker_bid = best_ask - maker_bid_spread
     3. 确保 maker_bid_yes + maker_bid_no < 1 且仍有利润
     4. 返回 Maker 套利信号
+    Maker 单挂在簿内、成交量取决于对手流，不能靠吃深度定量：数量为 default_size 按 max_size、max_order_size 封顶；
+    get_asks 非空时任一腿最优卖档数量不足 min_book_depth 的市场视为不活跃、不出信号
     """
     ask_yes = get_best_ask(token_id_yes)
     ask_no = get_best_ask(token_id_no)
@@ -273,7 +455,17 @@ def check_maker_arbitrage(
     
     if net_profit < min_profit:
         return None
-    
+    if max_size is not None and max_size <= 0:
+        return None
+    if get_asks is not None:
+        for tid in (token_id_yes, token_id_no):
+            top = get_asks(tid)
+            # size=0 为只有最优价的旧格式报价，深度未知时不过滤
+            if top and 0 < top[0][1] < min_book_depth:
+                return None
+    cap = size_cap(max_size, max_order_size)
+    size = default_size if cap is None else min(default_size, cap)
+
     return MakerArbitrageSignal(
         token_id_yes=token_id_yes,
         token_id_no=token_id_no,
@@ -281,8 +473,8 @@ def check_maker_arbitrage(
         maker_bid_no=maker_bid_no,
         best_ask_yes=ask_yes,
         best_ask_no=ask_no,
-        size=default_size,
-        expected_profit=net_profit * default_size,
+        size=size,
+        expected_profit=net_profit * size,
         condition_id=condition_id,
         question=question,
     )
@@ -296,10 +488,12 @@ def scan_markets_for_maker_arbitrage(
     maker_bid_spread: float = 0.01,
     fee_bps: float = 0.0,
     default_size: float = 5.0,
+    get_snapshot: Optional[Callable[[str, str], Any]] = None,
 ) -> List[MakerArbitrageSignal]:
     """
     目的：对多个二元市场批量检测 Maker 套利机会，供 main 循环调用
-    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_maker_arbitrage，收集非空信号
+    方法：遍历 markets（每项含 token_id_yes、token_id_no 等），对每个调用 check_maker_arbitrage，收集非空信号；
+         传入 get_snapshot 时每个市场一次性读取两腿快照，信号带上两腿序号
     """
     signals: List[MakerArbitrageSignal] = []
     for m in markets:
@@ -307,11 +501,13 @@ def scan_markets_for_maker_arbitrage(
         tn = m.get("token_id_no")
         if not ty or not tn:
             continue
+        snap = get_snapshot(ty, tn) if get_snapshot is not None else None
+        snap_ask, snap_bid = _snapshot_getters(snap) if snap is not None else (get_best_ask, get_best_bid)
         sig = check_maker_arbitrage(
             token_id_yes=ty,
             token_id_no=tn,
-            get_best_ask=get_best_ask,
-            get_best_bid=get_best_bid,
+            get_best_ask=snap_ask,
+            get_best_bid=snap_bid,
             min_profit=min_profit,
             maker_bid_spread=maker_bid_spread,
             fee_bps=fee_bps,
@@ -320,5 +516,110 @@ def scan_markets_for_maker_arbitrage(
             question=m.get("question", ""),
         )
         if sig is not None:
+            if snap is not None:
+                sig.seq_yes, sig.seq_no = snap.seq_yes, snap.seq_no
             signals.append(sig)
     return signals
+
+
+@dataclass
+class DetectionResult:
+    """
+    目的：一次统一检测的结果：各策略信号、各策略命中数，以及本轮读取到的报价
+    方法：quotes 为 token_id -> (bid, ask)，供波动等其他策略复用同一份一致视图而不再读 store
+    """
+    merge: List[ArbitrageSignal] = field(default_factory=list)
+    split: List[SplitArbitrageSignal] = field(default_factory=list)
+    maker: List[MakerArbitrageSignal] = field(default_factory=list)
+    hit_counts: Dict[str, int] = field(default_factory=dict)
+    markets_scanned: int = 0
+    quotes: Dict[str, Tuple[Optional[float], Optional[float]]] = field(default_factory=dict)
+    stale_skipped: int = 0  # 因任一腿报价超过 max_quote_age_sec 而跳过的市场数
+    invalid_skipped: int = 0  # 因任一腿订单簿失步（等待全量快照重同步）而跳过的市场数
+
+
+def scan_markets_all_strategies(
+    markets: List[Dict[str, Any]],
+    get_snapshot: Callable[[str, str], Any],
+    min_profit: float = 0.005,
+    fee_bps: float = 0.0,
+    default_size: float = 5.0,
+    maker_bid_spread: float = 0.01,
+    merge_enabled: bool = True,
+    split_enabled: bool = True,
+    maker_enabled: bool = False,
+    max_quote_age_sec: Optional[float] = None,
+    with_depth: bool = False,
+    min_book_depth: float = 0.0,
+    max_position: Optional[float] = None,
+    get_position: Optional[Callable[[str], float]] = None,
+    max_order_size: Optional[float] = None,
+) -> DetectionResult:
+    """
+    目的：单次遍历完成所有已启用策略的检测，替代分别调用三个 scan_markets_for_*（每 token 最多 6 次加锁读取）
+    方法：每个市场只调用一次 get_snapshot 取两腿报价，再依次对其运行 check_arbitrage / check_split_arbitrage /
+         check_maker_arbitrage；信号带上快照序号，hit_counts 记录各策略命中数
+    max_quote_age_sec 非空时，任一腿距上次更新超过该秒数（或年龄未知）的市场整体跳过、不计入 quotes，避免用陈旧报价下单；
+    快照 valid 为 False（任一腿订单簿失步）的市场同样跳过，直到重新收到全量快照
+    with_depth 为 True 时，最优价命中的市场再调用 get_snapshot(ty, tn, with_depth=True) 读一份带深度的快照（价格、序号、深度同一次持锁），
+    在这份快照上重新检测并按两腿深度定量（见 check_arbitrage），避免数量与价格出自不同簿状态；深度只在命中时读取。
+    有深度时数量只受可获利深度约束，max_position 非空时不超过 max_position - get_position(condition_id)，
+    max_order_size 非空且 > 0 时不超过该单笔上限；无深度（及 Maker）时数量为 default_size 按同样上限封顶
+    """
+    result = DetectionResult(hit_counts={"merge": 0, "split": 0, "maker": 0})
+    for m in markets:
+        ty = m.get("token_id_yes")
+        tn = m.get("token_id_no")
+        if not ty or not tn:
+            continue
+        snap = get_snapshot(ty, tn)
+        if not snap.valid:
+            result.invalid_skipped += 1
+            continue
+        if max_quote_age_sec is not None:
+            age = snap.max_age()
+            if age is None or age > max_quote_age_sec:
+                result.stale_skipped += 1
+                continue
+        result.markets_scanned += 1
+        result.quotes[ty] = (snap.bid_yes, snap.ask_yes)
+        result.quotes[tn] = (snap.bid_no, snap.ask_no)
+        cid = m.get("condition_id", "")
+        q = m.get("question", "")
+        sizing = {"min_book_depth": min_book_depth, "max_size": None, "max_order_size": max_order_size}
+        if max_position is not None:
+            sizing["max_size"] = max_position - (get_position(cid) if get_position is not None else 0.0)
+
+        def _check(s: Any) -> List[Any]:
+            # 对一份快照运行已启用策略；快照带深度时按深度定量
+            get_ask, get_bid = _snapshot_getters(s)
+            get_asks: Optional[Callable[[str], Levels]] = None
+            get_bids: Optional[Callable[[str], Levels]] = None
+            if s.depth_yes is not None and s.depth_no is not None:
+                get_asks = lambda tid: (s.depth_yes if tid == ty else s.depth_no)["asks"]
+                get_bids = lambda tid: (s.depth_yes if tid == ty else s.depth_no)["bids"]
+            found: List[Any] = []
+            if merge_enabled:
+                found.append(check_arbitrage(
+                    ty, tn, get_ask, min_profit, fee_bps, default_size, cid, q, get_asks=get_asks, **sizing,
+                ))
+            if split_enabled:
+                found.append(check_split_arbitrage(
+                    ty, tn, get_bid, min_profit, fee_bps, default_size, cid, q, get_bids=get_bids, **sizing,
+                ))
+            if maker_enabled:
+                found.append(check_maker_arbitrage(
+                    ty, tn, get_ask, get_bid, min_profit, maker_bid_spread, fee_bps, default_size, cid, q,
+                    get_asks=get_asks, **sizing,
+                ))
+            return [sig for sig in found if sig is not None]
+
+        hits = _check(snap)
+        if hits and with_depth:
+            snap = get_snapshot(ty, tn, with_depth=True)
+            hits = _check(snap) if snap.valid else []
+        for sig in hits:
+            sig.seq_yes, sig.seq_no = snap.seq_yes, snap.seq_no
+            getattr(result, sig.arb_type).append(sig)
+            result.hit_counts[sig.arb_type] += 1
+    return result
@@ -0,0 +1,450 @@
+# 目的：确定性回测：把录制的行情帧按录制时间回放进 OrderBookStore，在模拟时钟上运行真实的 arbitrage / volatility 检测，
+#       按录制深度模拟成交，分策略统计 PnL、命中率、机会持续时间与资金占用，用于离线调 min_profit、maker_bid_spread、
+#       volatility_deviation_pct 等参数
+# 方法：capture.replay_into_store 逐帧回放；每帧后只对脏市场调用 scan_markets_all_strategies（与 main 事件驱动检测一致）；
+#       同一市场同一策略连续命中视为一次机会，只在机会开始时尝试成交；模拟时钟取帧的录制接收时间，从不 sleep，
+#       回放速度只受 CPU 限制；不读墙钟、不用随机数，同样的输入得到同样的结果
+# 注意：成交不回写 store（录制数据中没有我们自己的成交），Maker 挂单按「录制的 ask 触及挂单价即成交」估算，不考虑排队位置
+
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.arbitrage import (
+    ArbitrageSignal,
+    MakerArbitrageSignal,
+    SplitArbitrageSignal,
+    scan_markets_all_strategies,
+)
+from src.capture import replay_into_store
+from src.config_loader import DEFAULTS
+from src.orderbook import OrderBookStore
+from src.volatility import VolatilityDetector, VolatilitySignal, scan_markets_for_volatility
+
+STRATEGIES = ("merge", "split", "maker", "volatility")
+
+Levels = List[Tuple[float, float]]
+
+
+@dataclass
+class StrategyStats:
+    """
+    目的：单个策略的回测统计
+    方法：signals 为机会数（同一市场连续命中合并为一次）；trades 为有成交的次数；wins 为 pnl > 0 的成交；
+         capital_used 为累计投入资金，capital_peak 为同时占用资金的峰值；durations 为每次机会的持续秒数（模拟时钟）
+    """
+    signals: int = 0
+    trades: int = 0
+    wins: int = 0
+    pnl: float = 0.0
+    filled_size: float = 0.0
+    capital_used: float = 0.0
+    capital_peak: float = 0.0
+    durations: List[float] = field(default_factory=list)
+
+    @property
+    def hit_rate(self) -> float:
+        """目的：盈利成交占机会数的比例；无机会时为 0"""
+        return self.wins / self.signals if self.signals else 0.0
+
+    @property
+    def avg_duration_sec(self) -> float:
+        return statistics.fmean(self.durations) if self.durations else 0.0
+
+    @property
+    def median_duration_sec(self) -> float:
+        return statistics.median(self.durations) if self.durations else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "signals": self.signals,
+            "trades": self.trades,
+            "wins": self.wins,
+            "hit_rate": self.hit_rate,
+            "pnl": self.pnl,
+            "filled_size": self.filled_size,
+            "capital_used": self.capital_used,
+            "capital_peak": self.capital_peak,
+            "avg_duration_sec": self.avg_duration_sec,
+            "median_duration_sec": self.median_duration_sec,
+            "max_duration_sec": max(self.durations) if self.durations else 0.0,
+        }
+
+
+@dataclass
+class BacktestResult:
+    """
+    目的：一次回测的汇总结果
+    方法：strategies 为策略名 -> StrategyStats；sim_seconds 为录制数据覆盖的时长，wall_seconds 为实际耗时；
+         stale_skipped 为因报价超龄（max_quote_age_sec）被跳过的市场检测次数
+    """
+    strategies: Dict[str, StrategyStats]
+    frames: int = 0
+    sim_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    stale_skipped: int = 0
+
+    @property
+    def total_pnl(self) -> float:
+        return sum(st.pnl for st in self.strategies.values())
+
+    @property
+    def speedup(self) -> float:
+        """目的：相对实时的回放倍速；wall_seconds 为 0 时返回 0"""
+        return self.sim_seconds / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "sim_seconds": self.sim_seconds,
+            "wall_seconds": self.wall_seconds,
+            "speedup": self.speedup,
+            "stale_skipped": self.stale_skipped,
+            "total_pnl": self.total_pnl,
+            "strategies": {name: st.to_dict() for name, st in self.strategies.items()},
+        }
+
+
+def take_liquidity(levels: Levels, qty: float, limit: Optional[float], is_buy: bool) -> Tuple[float, float, Levels]:
+    """
+    目的：按录制深度模拟一笔限价吃单
+    方法：levels 按从优到劣排序；逐档成交直到 qty 用完或价格越过 limit（买入不高于、卖出不低于；None 表示不限价）
+    返回：(成交量, 成交金额, 吃单后剩余档位)
+    """
+    filled = 0.0
+    notional = 0.0
+    rest: Levels = []
+    for i, (price, size) in enumerate(levels):
+        remaining = qty - filled
+        if remaining <= 1e-12 or (limit is not None and (price > limit + 1e-12 if is_buy else price < limit - 1e-12)):
+            rest.extend(levels[i:])
+            break
+        take = min(size, remaining)
+        filled += take
+        notional += take * price
+        if size - take > 1e-12:
+            rest.append((price, size - take))
+    return filled, notional, rest
+
+
+class Backtester:
+    """
+    目的：在回放过程中挂接检测与模拟成交；可直接作为 replay_into_store 的 on_frame 回调
+    方法：
+    - Merge：两腿按信号价限价吃 ask；成对部分到期各得 $1，多出的单腿立即按 bid 深度卖出平掉
+    - Split：拆分 size USDC 为 YES+NO，两腿按信号价限价卖入 bid；未卖出的成对部分合并回 USDC，多余单腿按剩余 bid 深度平掉
+    - Maker：按信号挂单价挂两腿买单；之后任一帧录制 ask 触及挂单价即按挂单价成交；两腿成交完为一笔完整成交，
+             超过 maker_order_timeout_sec 未成交完则撤单，已成交的成对部分计利润，多余单腿按 bid 深度平掉
+    - 波动：信号时按当前最优价吃单开仓（BUY 吃 ask、SELL 吃 bid），持有 volatility_hold_sec 后按对手最优价平仓
+    - fee_bps 按成对成交量扣除；instant_merge 为 false 时 Merge 占用资金直到回测结束
+    """
+
+    def __init__(
+        self,
+        markets: List[Dict[str, Any]],
+        config: Optional[Dict[str, Any]] = None,
+        store: Optional[OrderBookStore] = None,
+        volatility_hold_sec: float = 60.0,
+    ) -> None:
+        cfg = dict(DEFAULTS)
+        cfg.update(config or {})
+        self.config = cfg
+        # 默认 store 以模拟时钟记录更新时间，使 max_quote_age_sec 在回放中按录制时间生效
+        self.store = store or OrderBookStore(clock=lambda: self.now)
+        self.markets = [m for m in markets if m.get("token_id_yes") and m.get("token_id_no") and m.get("condition_id")]
+        self.store.set_markets(self.markets)
+        self._markets_by_cid: Dict[str, Dict[str, Any]] = {m["condition_id"]: m for m in self.markets}
+        self.volatility_hold_sec = volatility_hold_sec
+        self.stats: Dict[str, StrategyStats] = {name: StrategyStats() for name in STRATEGIES}
+        self.frames = 0
+        self.stale_skipped = 0
+        self.now = 0.0
+        self.start: Optional[float] = None
+        self._fee = float(cfg.get("fee_bps") or 0) / 10000.0
+        self._open: Dict[Tuple[str, str], float] = {}
+        self._capital: Dict[str, float] = {name: 0.0 for name in STRATEGIES}
+        # 挂单按挂出顺序存放（超时时长固定，最早挂出的最先超时）；另按 condition_id 索引，只撮合本帧有更新的市场
+        self._maker_orders: Dict[int, Dict[str, Any]] = {}
+        self._maker_by_cid: Dict[str, List[int]] = {}
+        self._maker_next_id = 0
+        self._vol_positions: Dict[str, Dict[str, Any]] = {}
+        self._vol_detectors: Dict[str, VolatilityDetector] = {}
+
+    # ---- 资金与机会记账 ----
+
+    def _hold(self, strategy: str, amount: float) -> None:
+        st = self.stats[strategy]
+        st.capital_used += amount
+        self._capital[strategy] += amount
+        st.capital_peak = max(st.capital_peak, self._capital[strategy])
+
+    def _release(self, strategy: str, amount: float) -> None:
+        self._capital[strategy] = max(0.0, self._capital[strategy] - amount)
+
+    def _record_trade(self, strategy: str, pnl: float, size: float) -> None:
+        st = self.stats[strategy]
+        st.trades += 1
+        st.pnl += pnl
+        st.filled_size += size
+        if pnl > 0:
+            st.wins += 1
+
+    def _track(self, strategy: str, key: str, hit: bool) -> bool:
+        """目的：维护 (策略, key) 的机会区间。返回：本次是否为新机会的开始"""
+        k = (strategy, key)
+        if hit:
+            if k in self._open:
+                return False
+            self._open[k] = self.now
+            self.stats[strategy].signals += 1
+            return True
+        opened = self._open.pop(k, None)
+        if opened is not None:
+            self.stats[strategy].durations.append(self.now - opened)
+        return False
+
+    def _unwind(self, token_id: str, qty: float) -> float:
+        """目的：把多出的单腿按当前 bid 深度卖出平仓，返回卖出所得；深度不足部分视为价值 0"""
+        if qty <= 1e-12:
+            return 0.0
+        _, proceeds, _ = take_liquidity(self.store.get_depth(token_id)["bids"], qty, None, is_buy=False)
+        return proceeds
+
+    # ---- 回放入口 ----
+
+    def advance(self, recv_ns: int) -> None:
+        """目的：每帧写入 store 前调用，把模拟时钟推进到该帧的录制接收时间"""
+        self.now = recv_ns / 1e9
+        if self.start is None:
+            self.start = self.now
+
+    def on_frame(self, recv_ns: int, msgs: List[Dict[str, Any]]) -> None:
+        """目的：每帧写入 store 后调用：处理挂单与持仓，再对脏市场做一轮检测"""
+        self.advance(recv_ns)
+        self.frames += 1
+        # 排序保证同一输入在不同进程中处理顺序一致（集合迭代顺序受字符串哈希随机化影响）
+        dirty = sorted(self.store.pop_dirty_markets())
+        if self._maker_orders:
+            self._update_maker_orders(dirty)
+        if self._vol_positions:
+            self._close_volatility_positions()
+        batch = [self._markets_by_cid[cid] for cid in dirty if cid in self._markets_by_cid]
+        if batch:
+            self._evaluate(batch)
+
+    def _evaluate(self, batch: List[Dict[str, Any]]) -> None:
+        cfg = self.config
+        merge_on = bool(cfg.get("merge_arb_enabled", True))
+        split_on = bool(cfg.get("split_arb_enabled", True))
+        maker_on = bool(cfg.get("maker_arb_enabled", False))
+        det = scan_markets_all_strategies(
+            batch,
+            get_snapshot=self.store.get_market_snapshot,
+            min_profit=cfg.get("min_profit", 0.005),
+            fee_bps=cfg.get("fee_bps", 0),
+            default_size=cfg.get("default_size", 5.0),
+            maker_bid_spread=cfg.get("maker_bid_spread", 0.01),
+            merge_enabled=merge_on,
+            split_enabled=split_on,
+            maker_enabled=maker_on,
+            max_quote_age_sec=cfg.get("max_quote_age_sec") or None,
+            with_depth=True,
+            min_book_depth=float(cfg.get("min_book_depth", 0.0) or 0.0),
+            max_position=cfg.get("max_position_per_market"),
+            max_order_size=cfg.get("max_order_size") or None,
+        )
+        self.stale_skipped += det.stale_skipped
+        for name, enabled, signals, simulate in (
+            ("merge", merge_on, det.merge, self._simulate_merge),
+            ("split", split_on, det.split, self._simulate_split),
+            ("maker", maker_on, det.maker, self._post_maker),
+        ):
+            if not enabled:
+                continue
+            by_cid = {s.condition_id: s for s in signals}
+            for m in batch:
+                cid = m["condition_id"]
+                sig = by_cid.get(cid)
+                if self._track(name, cid, sig is not None):
+                    simulate(sig)
+
+        if cfg.get("volatility_enabled"):
+            def get_bid(tid: str) -> Optional[float]:
+                return det.quotes.get(tid, (None, None))[0]
+
+            def get_ask(tid: str) -> Optional[float]:
+                return det.quotes.get(tid, (None, None))[1]
+
+            vol = scan_markets_for_volatility(
+                batch,
+                get_bid=get_bid,
+                get_ask=get_ask,
+                detectors=self._vol_detectors,
+                deviation_pct=cfg.get("volatility_deviation_pct", 0.05),
+                default_size=cfg.get("default_size", 5.0),
+                max_position=cfg.get("max_position_per_market", 50.0),
+                window_size=int(cfg.get("volatility_window_size", 20)),
+            )
+            by_token = {s.token_id: s for s in vol}
+            for m in batch:
+                tid = m["token_id_yes"]
+                sig = by_token.get(tid)
+                if self._track("volatility", tid, sig is not None):
+                    self._open_volatility(sig, get_bid(tid), get_ask(tid))
+
+    # ---- 各策略模拟成交 ----
+
+    def _simulate_merge(self, sig: ArbitrageSignal) -> None:
+        fy, cy, _ = take_liquidity(self.store.get_depth(sig.token_id_yes)["asks"], sig.size, sig.price_yes, True)
+        fn, cn, _ = take_liquidity(self.store.get_depth(sig.token_id_no)["asks"], sig.size, sig.price_no, True)
+        if fy <= 0 and fn <= 0:
+            return
+        pairs = min(fy, fn)
+        proceeds = pairs * (1.0 - self._fee)
+        proceeds += self._unwind(sig.token_id_yes, fy - pairs) + self._unwind(sig.token_id_no, fn - pairs)
+        cost = cy + cn
+        self._hold("merge", cost)
+        if self.config.get("instant_merge", False):
+            self._release("merge", cost)
+        self._record_trade("merge", proceeds - cost, pairs)
+
+    def _simulate_split(self, sig: SplitArbitrageSignal) -> None:
+        fy, py, rest_y = take_liquidity(self.store.get_depth(sig.token_id_yes)["bids"], sig.size, sig.bid_yes, False)
+        fn, pn, rest_n = take_liquidity(self.store.get_depth(sig.token_id_no)["bids"], sig.size, sig.bid_no, False)
+        if fy <= 0 and fn <= 0:
+            return
+        pairs = min(fy, fn)
+        left_y, left_n = sig.size - fy, sig.size - fn
+        merged = min(left_y, left_n)
+        proceeds = py + pn + merged - pairs * self._fee
+        proceeds += take_liquidity(rest_y, left_y - merged, None, False)[1]
+        proceeds += take_liquidity(rest_n, left_n - merged, None, False)[1]
+        self._hold("split", sig.size)
+        self._release("split", sig.size)
+        self._record_trade("split", proceeds - sig.size, pairs)
+
+    def _post_maker(self, sig: MakerArbitrageSignal) -> None:
+        order = {
+            "cid": sig.condition_id,
+            "legs": [
+                {"token": sig.token_id_yes, "price": sig.maker_bid_yes, "filled": 0.0},
+                {"token": sig.token_id_no, "price": sig.maker_bid_no, "filled": 0.0},
+            ],
+            "size": sig.size,
+            "posted_at": self.now,
+            "capital": sig.size * (sig.maker_bid_yes + sig.maker_bid_no),
+        }
+        self._hold("maker", order["capital"])
+        if self._fill_maker(order):
+            self._settle_maker(order)
+            return
+        oid = self._maker_next_id
+        self._maker_next_id += 1
+        self._maker_orders[oid] = order
+        self._maker_by_cid.setdefault(order["cid"], []).append(oid)
+
+    def _fill_maker(self, order: Dict[str, Any]) -> bool:
+        """目的：用当前录制 ask 深度撮合挂单的未成交部分。返回：两腿是否都已成交完"""
+        done = True
+        for leg in order["legs"]:
+            remaining = order["size"] - leg["filled"]
+            if remaining > 1e-12:
+                got, _, _ = take_liquidity(self.store.get_depth(leg["token"])["asks"], remaining, leg["price"], True)
+                leg["filled"] += got
+                done = done and order["size"] - leg["filled"] <= 1e-12
+        return done
+
+    def _settle_maker(self, order: Dict[str, Any]) -> None:
+        ly, ln = order["legs"]
+        pairs = min(ly["filled"], ln["filled"])
+        self._release("maker", order["capital"])
+        if ly["filled"] <= 0 and ln["filled"] <= 0:
+            return
+        cost = ly["filled"] * ly["price"] + ln["filled"] * ln["price"]
+        proceeds = pairs * (1.0 - self._fee)
+        proceeds += self._unwind(ly["token"], ly["filled"] - pairs) + self._unwind(ln["token"], ln["filled"] - pairs)
+        self._record_trade("maker", proceeds - cost, pairs)
+
+    def _update_maker_orders(self, dirty: List[str]) -> None:
+        """目的：撮合本帧有更新的市场上的挂单，再按挂出顺序撤掉超时挂单"""
+        for cid in dirty:
+            oids = self._maker_by_cid.get(cid)
+            if not oids:
+                continue
+            pending: List[int] = []
+            for oid in oids:
+                order = self._maker_orders[oid]
+                if self._fill_maker(order):
+                    del self._maker_orders[oid]
+                    self._settle_maker(order)
+                else:
+                    pending.append(oid)
+            self._maker_by_cid[cid] = pending
+        timeout = float(self.config.get("maker_order_timeout_sec", 300.0))
+        for oid, order in list(self._maker_orders.items()):
+            if self.now - order["posted_at"] < timeout:
+                break
+            del self._maker_orders[oid]
+            self._maker_by_cid[order["cid"]].remove(oid)
+            self._settle_maker(order)
+
+    def _open_volatility(self, sig: VolatilitySignal, bid: Optional[float], ask: Optional[float]) -> None:
+        if sig.token_id in self._vol_positions:
+            return
+        entry = ask if sig.side == "BUY" else bid
+        if entry is None:
+            return
+        self._vol_positions[sig.token_id] = {"side": sig.side, "entry": entry, "size": sig.size, "opened_at": self.now}
+        self._hold("volatility", entry * sig.size)
+
+    def _close_volatility_positions(self, force: bool = False) -> None:
+        """目的：平掉持有满 volatility_hold_sec 的仓位。方法：持仓按开仓顺序存放，遇到未到期的即停止"""
+        for tid, pos in list(self._vol_positions.items()):
+            if not force and self.now - pos["opened_at"] < self.volatility_hold_sec:
+                break
+            exit_px = self.store.get_best_bid(tid) if pos["side"] == "BUY" else self.store.get_best_ask(tid)
+            if exit_px is None:
+                if not force:
+                    continue
+                exit_px = pos["entry"]
+            sign = 1.0 if pos["side"] == "BUY" else -1.0
+            del self._vol_positions[tid]
+            self._release("volatility", pos["entry"] * pos["size"])
+            self._record_trade("volatility", sign * (exit_px - pos["entry"]) * pos["size"], pos["size"])
+
+    def finish(self) -> None:
+        """目的：回放结束：关闭仍在持续的机会区间，撤掉未成交挂单并结算，平掉波动持仓"""
+        for strategy, key in list(self._open):
+            self._track(strategy, key, False)
+        for order in self._maker_orders.values():
+            self._settle_maker(order)
+        self._maker_orders = {}
+        self._maker_by_cid = {}
+        self._close_volatility_positions(force=True)
+
+    def result(self, wall_seconds: float = 0.0) -> BacktestResult:
+        return BacktestResult(
+            strategies=self.stats,
+            frames=self.frames,
+            sim_seconds=(self.now - self.start) if self.start is not None else 0.0,
+            wall_seconds=wall_seconds,
+            stale_skipped=self.stale_skipped,
+        )
+
+
+def run_backtest(
+    paths: Union[str, List[str]],
+    markets: List[Dict[str, Any]],
+    config: Optional[Dict[str, Any]] = None,
+    volatility_hold_sec: float = 60.0,
+) -> BacktestResult:
+    """
+    目的：对一组录制文件运行一次完整回测
+    方法：新建 store 与 Backtester，replay_into_store 以 advance/on_frame 挂接，结束后 finish 并返回结果
+    """
+    bt = Backtester(markets, config, volatility_hold_sec=volatility_hold_sec)
+    t0 = time.perf_counter()
+    replay_into_store(paths, bt.store, on_frame=bt.on_frame, before_frame=bt.advance)
+    bt.finish()
+    return bt.result(wall_seconds=time.perf_counter() - t0)
@@ -0,0 +1,286 @@
+# 目的：录制与回放 market channel 原始帧，复现机器人当时看到的行情，供离线性能分析、检测器回归测试与套利窗口时长统计
+# 方法：追加写入紧凑的二进制日志：文件头（魔数 + 打开时的墙钟/单调时钟纳秒）+ 若干记录（uint32 长度 + uint64 单调接收时间纳秒 + 原始帧字节）；
+#       按小时轮转，轮转后的文件在后台 gzip 压缩；读取时未压缩文件用 mmap，压缩文件解压到内存后按同一格式解析
+
+import gzip
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from src.orderbook import OrderBookStore, decode_frame
+
+# 文件头：8 字节魔数 + 打开时墙钟 time.time_ns() + 单调时钟 time.monotonic_ns()
+CAPTURE_MAGIC = b"PSARBCAP"
+_HEADER = struct.Struct("<8sQQ")
+# 记录头：payload 长度 + 单调接收时间（纳秒）
+_RECORD = struct.Struct("<IQ")
+
+
+class FrameRecorder:
+    """
+    目的：接入路径上的只追加录制器，多个 WebSocket 线程可共用一个实例
+    方法：record() 持锁写入一条记录；当前小时（UTC，按 clock 的墙钟）变化时关闭旧文件并在后台线程 gzip 压缩；
+         文件名为 {prefix}-YYYYmmdd-HH.bin，压缩后为 .bin.gz
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "frames",
+        compress: bool = True,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fh = None
+        self._path: Optional[str] = None
+        self._bucket: Optional[str] = None
+        self._compressors: List[threading.Thread] = []
+        self.frames_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def current_path(self) -> Optional[str]:
+        return self._path
+
+    def _open(self, bucket: str) -> None:
+        """目的：打开本小时的文件并写文件头；同小时文件已存在（如重启）则追加新的文件头段。注意：调用方需持有 _lock"""
+        self._path = os.path.join(self.directory, "%s-%s.bin" % (self.prefix, bucket))
+        self._fh = open(self._path, "ab")
+        self._fh.write(_HEADER.pack(CAPTURE_MAGIC, time.time_ns(), time.monotonic_ns()))
+        self._bucket = bucket
+
+    def _rotate_out(self) -> None:
+        """目的：关闭当前文件并按需在后台压缩。注意：调用方需持有 _lock"""
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        if self.compress and self._path:
+            t = threading.Thread(target=compress_capture_file, args=(self._path,), daemon=True, name="capture-gzip")
+            t.start()
+            self._compressors.append(t)
+
+    def record(self, raw: Union[str, bytes], recv_ns: Optional[int] = None) -> None:
+        """
+        目的：记录一帧原始数据
+        方法：recv_ns 缺省取 time.monotonic_ns()（调用方应在 recv 返回后立即调用）；str 按 UTF-8 编码
+        """
+        if recv_ns is None:
+            recv_ns = time.monotonic_ns()
+        payload = raw.encode("utf-8") if isinstance(raw, str) else bytes(raw)
+        bucket = time.strftime("%Y%m%d-%H", time.gmtime(self._clock()))
+        with self._lock:
+            if bucket != self._bucket:
+                self._rotate_out()
+                self._open(bucket)
+            self._fh.write(_RECORD.pack(len(payload), recv_ns))
+            self._fh.write(payload)
+            self.frames_written += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self, wait: bool = True) -> None:
+        """目的：关闭当前文件（按配置压缩）；wait=True 时等待所有后台压缩完成"""
+        with self._lock:
+            self._rotate_out()
+            self._bucket = None
+        if wait:
+            for t in self._compressors:
+                t.join()
+            self._compressors = []
+
+
+def compress_capture_file(path: str) -> str:
+    """目的：把轮转出的 .bin 压缩为 .bin.gz 并删除原文件。返回压缩文件路径"""
+    gz_path = path + ".gz"
+    with open(path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=6) as dst:
+        while True:
+            chunk = src.read(1 << 20)
+            if not chunk:
+                break
+            dst.write(chunk)
+    os.remove(path)
+    return gz_path
+
+
+def list_capture_files(directory: str, prefix: str = "frames") -> List[str]:
+    """目的：按时间顺序列出目录下的录制文件（.bin 与 .bin.gz）。方法：文件名含 YYYYmmdd-HH，字典序即时间序"""
+    if not os.path.isdir(directory):
+        return []
+    names = [
+        n for n in os.listdir(directory)
+        if n.startswith(prefix + "-") and (n.endswith(".bin") or n.endswith(".bin.gz"))
+    ]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+
+def _iter_buffer(buf: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, bytes]]:
+    """
+    目的：在内存缓冲上解析记录
+    方法：遇到魔数则跳过文件头段（同一文件可能因重启追加多段）；末尾不完整的记录（写入中断）忽略
+    """
+    view = memoryview(buf)
+    n = len(view)
+    pos = 0
+    try:
+        while pos < n:
+            if n - pos >= _HEADER.size and bytes(view[pos:pos + 8]) == CAPTURE_MAGIC:
+                pos += _HEADER.size
+                continue
+            if n - pos < _RECORD.size:
+                break
+            length, recv_ns = _RECORD.unpack_from(view, pos)
+            pos += _RECORD.size
+            if pos + length > n:
+                break
+            yield recv_ns, bytes(view[pos:pos + length])
+            pos += length
+    finally:
+        view.release()
+
+
+def iter_frames(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    目的：按写入顺序读出录制文件中的 (recv_ns, raw) 记录
+    方法：.bin 用 mmap 只读映射（不把整个文件读入内存）；.gz 先解压到内存；空文件直接返回
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from _iter_buffer(f.read())
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _iter_buffer(mm)
+
+
+def consolidate_capture(paths: Union[str, List[str]], out_path: str) -> int:
+    """
+    目的：把多段录制（含 .gz）合并解压成单个未压缩 .bin，供多个回放进程各自 mmap 同一文件（共享页缓存，不再各自解压/读入）
+    方法：按顺序读出全部记录，写入一个文件头 + 原记录（保留 recv_ns）；先写临时文件再原子替换
+    返回：写入的帧数
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    tmp = out_path + ".tmp"
+    count = 0
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(CAPTURE_MAGIC, time.time_ns(), time.monotonic_ns()))
+        for path in paths:
+            for recv_ns, raw in iter_frames(path):
+                out.write(_RECORD.pack(len(raw), recv_ns))
+                out.write(raw)
+                count += 1
+    os.replace(tmp, out_path)
+    return count
+
+
+def replay_into_store(
+    paths: Union[str, List[str]],
+    store: OrderBookStore,
+    on_frame: Optional[Callable[[int, list], None]] = None,
+    before_frame: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    目的：把录制的帧按顺序回放到 OrderBookStore，重建当时的订单簿
+    方法：逐帧 decode_frame + apply_batch；before_frame(recv_ns) 在写入前调用（供回测推进模拟时钟，使 store 记录的更新时间为录制时间），
+         on_frame(recv_ns, msgs) 在每帧写入后调用，供回测/统计挂接
+    返回：回放的帧数
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    count = 0
+    for path in paths:
+        for recv_ns, raw in iter_frames(path):
+            if before_frame is not None:
+                before_frame(recv_ns)
+            msgs = decode_frame(raw)
+            if msgs:
+                store.apply_batch(msgs)
+            count += 1
+            if on_frame is not None:
+                on_frame(recv_ns, msgs)
+    return count
+
+
+MARKETS_FILE = "markets.json"
+
+
+def save_markets(directory: str, markets: List[Dict[str, Any]]) -> str:
+    """
+    目的：把监控市场列表（condition_id 与 YES/NO token 对应关系）存到录制目录，回放时无需再请求 Gamma
+    方法：与已有 markets.json 按 condition_id 合并（刷新后旧市场的录制仍可回放），写临时文件后原子替换
+    返回：文件路径
+    """
+    path = os.path.join(directory, MARKETS_FILE)
+    merged: Dict[str, Dict[str, Any]] = {m["condition_id"]: m for m in load_markets(directory) if m.get("condition_id")}
+    for m in markets:
+        cid = m.get("condition_id")
+        if cid and m.get("token_id_yes") and m.get("token_id_no"):
+            merged[cid] = {k: m.get(k) for k in ("condition_id", "token_id_yes", "token_id_no", "question")}
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(list(merged.values()), f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_markets(directory: str) -> List[Dict[str, Any]]:
+    """目的：读取 save_markets 写入的市场列表；文件不存在或损坏时返回空列表"""
+    path = os.path.join(directory, MARKETS_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [m for m in data if isinstance(m, dict)] if isinstance(data, list) else []
+
+
+def record_live(
+    directory: str,
+    markets: List[Dict[str, Any]],
+    seconds: float,
+    num_connections: int = 1,
+    prefix: str = "frames",
+) -> int:
+    """
+    目的：不启动主程序，直接从实时行情录制一段数据（供回测/参数扫描使用）
+    方法：保存 markets.json 后用 AsyncMarketIngest 订阅全部 YES/NO token 并挂接 FrameRecorder，seconds 秒后取消并关闭录制
+    返回：录制的帧数
+    """
+    import asyncio
+
+    from src.ws_async import AsyncMarketIngest
+
+    save_markets(directory, markets)
+    ids: List[str] = []
+    for m in markets:
+        if m.get("token_id_yes") and m.get("token_id_no"):
+            ids.extend([str(m["token_id_yes"]), str(m["token_id_no"])])
+    recorder = FrameRecorder(directory, prefix=prefix)
+    engine = AsyncMarketIngest(OrderBookStore(), list(dict.fromkeys(ids)), num_connections=num_connections, recorder=recorder)
+
+    async def _run() -> None:
+        try:
+            await asyncio.wait_for(engine.run(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    try:
+        asyncio.run(_run())
+    finally:
+        recorder.close()
+    return recorder.frames_written
@@ -11,11 +11,14 @@ DEFAULTS: Dict[str, Any] = {
     "sports_tag_id": None,
     "events_limit": 50,
     "events_offset": 0,
-    "default_size": 5.0,
-    "max_position_per_market": 50.0,
-    "min_book_depth": 10.0,
+    "default_size": 5.0,  # 深度未知（只有最优价）时及 Maker 单的每腿下单量（shares）
+    "max_order_size": 0.0,  # 单笔每腿下单量上限（shares）；0 表示不限，按深度定量时只受可获利深度与剩余仓位约束
+    "max_position_per_market": 50.0,  # 单市场每腿最大持仓；套利数量按剩余额度封顶
+    "min_book_depth": 10.0,  # 两腿边际利润仍达标的可成交深度（shares）低于此值的市场不出套利信号
+    "max_quote_age_sec": 300.0,  # 任一腿超过 N 秒未更新的市场不做套利检测（陈旧报价易导致坏成交）；0 表示不检查
     "volatility_enabled": False,
     "volatility_deviation_pct": 0.05,
+    "volatility_window_size": 20,  # 波动策略计算均值的 mid 价窗口长度（条）
     "max_markets_monitor": 100,  # 监控 N 个市场（live_sports + top10_by_volume 合并去重，或 monitor_condition_ids）
     "live_sports_enabled": True,  # Live 体育市场监控：同时监控 live sports 和 top10_by_volume，合并去重
     "merge_arb_enabled": True,  # 启用 Merge 套利（Taker：买入 YES+NO，等待结算或合并成 USDC）
@@ -24,11 +27,35 @@ DEFAULTS: Dict[str, Any] = {
     "maker_arb_enabled": False,  # 启用 Maker 套利（在 YES 和 NO 两边挂 Maker 买单，等待成交，可能获得返佣）
     "maker_bid_spread": 0.01,  # Maker 买单价格低于 best ask 的价差（例如 0.01 = 1 cent）
     "maker_order_timeout_sec": 300.0,  # Maker 订单超时时间（秒），超时后考虑撤单或转为 Taker
+    "neg_risk_arb_enabled": False,  # 启用多结果（negRisk）事件套利：买齐同一事件所有结果的 YES（或 NO），N 腿一起下单
+    "neg_risk_max_events": 20,  # 最多监控的多结果事件数（每个事件的全部结果市场整组并入订阅）
+    "neg_risk_yes_basket_enabled": True,  # YES 篮子：sum(ask_yes) < 1 - min_profit
+    "neg_risk_no_basket_enabled": True,  # NO 篮子：sum(ask_no) < (N-1) - min_profit
+    "opportunity_cooldown_sec": 30.0,  # 同一机会持续存在时，距上次成功下单至少 N 秒才再次执行（下单失败不开始冷却）
+    "opportunity_min_edge_change": 0.005,  # 冷却期内每份利润较上次执行变化超过该值也再次执行
+    "opportunity_debounce_sec": 5.0,  # 机会消失后 N 秒内再次出现视为同一机会（报价抖动不重复推送）
+    "ws_engine": "thread",  # 行情接入引擎："thread"（每连接一个线程）或 "asyncio"（单事件循环复用多连接）
+    "ws_num_shards": 1,  # WebSocket 分片连接数；>1 时按 asset_id 哈希分到 N 条连接，各自重连
+    "market_ws_url": "",  # 行情 WebSocket 地址；空为 CLOB 官方地址，可指向 scripts/mock_clob_server.py 做离线压测
+    "ingest_process_enabled": False,  # 行情解码与订单簿维护放到独立进程，经共享内存报价表供主进程读取，避免与检测争 GIL
+    "shm_capacity": 8192,  # 共享报价表的 token 槽位数
+    "shm_depth": 5,  # 共享报价表每边保留的档位数（get_depth 最多返回该档数）
+    "capture_dir": "",  # 非空时把原始行情帧录制到该目录（按小时轮转并 gzip），供回放与回测
+    "latency_metrics_enabled": True,  # 记录行情单向延迟与解码/写入/检测耗时直方图，状态日志输出 p50/p99/p999
+    "metrics_port": 0,  # 非 0 时在该端口提供 HTTP /metrics（Prometheus 文本格式）
+    "book_resync_enabled": True,  # 订单簿失步（断线窗口、增量缺档、哈希不符）后经 REST /books 批量重同步
+    "book_resync_interval_sec": 1.0,  # 重同步检查间隔
+    "book_resync_grace_sec": 2.0,  # 失步超过 N 秒仍未收到 WS 快照才走 REST
+    "verify_book_hash": False,  # 校验 book 消息自带的 hash；服务端哈希算法变化会误报，默认关闭
+    "event_driven_detection": True,  # 订单簿更新即只检测受影响市场；false 时退回每 poll_interval 全量扫描
     "top10_min_prob": 0.01,
     "top10_max_prob": 0.99,
     "status_log_interval_sec": 60.0,  # 每 N 秒在 Deploy Logs 输出任务状态与 Workbook
     "refresh_markets_interval_sec": 1800.0,  # 未指定 monitor_condition_ids 时，每 N 秒刷新一次市场
     "heartbeat_interval_sec": 3600.0,  # 每小时推送 Telegram 心跳「策略正在 Railway 运行中」
+    "telegram_queue_size": 100,  # 待推送队列上限，满时丢弃最旧的消息
+    "telegram_digest_window_sec": 2.0,  # 收到推送后再等 N 秒，把同一突发内的消息合并为一条摘要
+    "telegram_min_interval_sec": 1.0,  # 两次发送的最小间隔（Telegram 单聊约 1 条/秒）
     # 为空则同时监控 live_sports 和 top10_by_volume（合并去重）；非空则只监控这些 condition_id
     "monitor_condition_ids": [],
 }
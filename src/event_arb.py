@@ -0,0 +1,238 @@
+# 目的：多结果（negRisk）事件套利：同一事件的 N 个结果互斥且恰有一个结算为 YES，
+#       买齐所有结果的 YES 到期价值 $1，买齐所有结果的 NO 到期价值 $(N-1)
+# 方法：EventIndex 按 event_id 把市场分组（只收结果齐全的组），并建 condition_id -> 事件 反向索引，
+#       任一结果市场被标记为脏时只重新评估它所在的事件；检测对每组读各腿快照，
+#       YES 篮子：sum(ask_yes) < 1 - min_profit；NO 篮子：sum(ask_no) < (N-1) - min_profit（即 YES bid 之和 > 1 的可执行形式，
+#       只用买单、无需先持有库存）；传入深度时沿 N 腿订单簿同步定量（src.arbitrage.walk_legs）
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.arbitrage import Levels, size_cap, size_from_depth
+
+
+@dataclass
+class EventGroup:
+    """目的：一个多结果事件的全部结果市场。方法：markets 每项含 condition_id、token_id_yes、token_id_no、question"""
+    event_id: str
+    title: str
+    markets: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class EventLeg:
+    """
+    目的：事件套利信号中的一腿
+    方法：token_id 为本腿买入的 token（YES 篮子为 token_id_yes，NO 篮子为 token_id_no），price 为下单限价；
+         seq_yes/seq_no 为检测所用快照中该市场两腿的更新序号，下单前逐腿校验；tick_size 为该市场的价格精度（下单签名用）
+    """
+    condition_id: str
+    token_id: str
+    price: float
+    token_id_yes: str
+    token_id_no: str
+    question: str = ""
+    seq_yes: int = 0
+    seq_no: int = 0
+    tick_size: str = "0.01"
+
+
+@dataclass
+class EventArbitrageSignal:
+    """
+    目的：表示一次多结果事件套利机会（每个结果各买 size 份同一方向的 token，持有到结算）
+    方法：basket 为 "yes"（到期价值 payout=1）或 "no"（payout=N-1）；expected_profit 为按真实数量逐档累计的利润
+    """
+    event_id: str
+    basket: str
+    legs: List[EventLeg]
+    payout: float
+    size: float
+    expected_profit: float
+    title: str = ""
+    arb_type: str = "event"
+
+    @property
+    def cost(self) -> float:
+        """目的：每份篮子按下单限价计算的成本上限"""
+        return sum(leg.price for leg in self.legs)
+
+
+class EventIndex:
+    """
+    目的：事件级索引：event_id -> EventGroup，condition_id -> 所属事件，供增量检测
+    方法：只收带 event_id 且 neg_risk 的市场；组内市场数不等于 event_outcomes（部分结果未被监控）的事件不成组，
+         因为缺腿时买齐剩余结果并不保证到期价值
+    """
+
+    def __init__(self, markets: Iterable[Dict[str, Any]] = ()) -> None:
+        by_event: Dict[str, EventGroup] = {}
+        expected: Dict[str, int] = {}
+        for m in markets:
+            eid = m.get("event_id")
+            if not eid or not m.get("neg_risk") or not m.get("condition_id"):
+                continue
+            g = by_event.setdefault(str(eid), EventGroup(str(eid), m.get("event_title") or ""))
+            if all(x["condition_id"] != m["condition_id"] for x in g.markets):
+                g.markets.append(m)
+            expected[str(eid)] = int(m.get("event_outcomes") or 0)
+        self.groups: Dict[str, EventGroup] = {
+            eid: g for eid, g in by_event.items() if len(g.markets) >= 2 and len(g.markets) == expected[eid]
+        }
+        self._by_market: Dict[str, List[str]] = {}
+        for eid, g in self.groups.items():
+            for m in g.markets:
+                self._by_market.setdefault(m["condition_id"], []).append(eid)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def groups_for(self, condition_ids: Iterable[str]) -> List[EventGroup]:
+        """目的：取出包含任一给定市场的事件（去重、按首次出现顺序），供脏市场增量检测"""
+        seen: Dict[str, EventGroup] = {}
+        for cid in condition_ids:
+            for eid in self._by_market.get(cid, ()):
+                if eid not in seen:
+                    seen[eid] = self.groups[eid]
+        return list(seen.values())
+
+
+def check_event_arbitrage(
+    group: EventGroup,
+    snapshots: List[Any],
+    basket: str = "yes",
+    min_profit: float = 0.005,
+    fee_bps: float = 0.0,
+    default_size: float = 5.0,
+    get_asks: Optional[Callable[[str], Levels]] = None,
+    min_book_depth: float = 0.0,
+    max_size: Optional[float] = None,
+    max_order_size: Optional[float] = None,
+) -> Optional[EventArbitrageSignal]:
+    """
+    目的：判断买齐一个事件所有结果的同方向 token 是否有利可图
+    方法：snapshots 与 group.markets 一一对应（MarketSnapshot）；YES 篮子取各腿 ask_yes、到期价值 1，
+         NO 篮子取各腿 ask_no、到期价值 N-1；每份利润 = 价值 - 成本 - fee（fee 与 check_arbitrage 相同，按每份篮子扣一次）。
+         get_asks 非空时沿 N 腿 asks 同步定量（同 check_arbitrage），数量 = min(可获利深度, max_size, max_order_size)，
+         否则用 default_size 按同样上限封顶；max_size 为该事件剩余可加仓数量，max_order_size 为可选的单笔上限
+    """
+    if basket not in ("yes", "no"):
+        raise ValueError("basket 应为 yes 或 no: %r" % (basket,))
+    n = len(group.markets)
+    if n < 2 or len(snapshots) != n:
+        return None
+    is_yes = basket == "yes"
+    prices = [s.ask_yes if is_yes else s.ask_no for s in snapshots]
+    if any(p is None or p <= 0 for p in prices):
+        return None
+    fee = fee_bps / 10000.0 if fee_bps else 0.0
+    payout = 1.0 if is_yes else float(n - 1)
+    net_profit = payout - sum(prices) - fee
+    if net_profit < min_profit:
+        return None
+    if max_size is not None and max_size <= 0:
+        return None
+
+    tokens = [m["token_id_yes" if is_yes else "token_id_no"] for m in group.markets]
+    cap = size_cap(max_size, max_order_size)
+    size, profit = default_size if cap is None else min(default_size, cap), None
+    if get_asks is not None:
+        fill = size_from_depth(
+            [get_asks(t) for t in tokens], lambda p: payout - sum(p) - fee, min_profit, min_book_depth, cap,
+        )
+        if fill is None:
+            return None
+        if fill.depth >= 0:
+            size, profit, prices = fill.size, fill.profit, list(fill.worst)
+
+    legs = [
+        EventLeg(
+            condition_id=m["condition_id"],
+            token_id=tid,
+            price=price,
+            token_id_yes=m["token_id_yes"],
+            token_id_no=m["token_id_no"],
+            question=m.get("question", ""),
+            seq_yes=snap.seq_yes,
+            seq_no=snap.seq_no,
+            tick_size=m.get("tick_size") or "0.01",
+        )
+        for m, tid, price, snap in zip(group.markets, tokens, prices, snapshots)
+    ]
+    return EventArbitrageSignal(
+        event_id=group.event_id,
+        basket=basket,
+        legs=legs,
+        payout=payout,
+        size=size,
+        expected_profit=net_profit * size if profit is None else profit,
+        title=group.title,
+    )
+
+
+def scan_event_groups(
+    groups: List[EventGroup],
+    get_snapshot: Callable[[str, str], Any],
+    min_profit: float = 0.005,
+    fee_bps: float = 0.0,
+    default_size: float = 5.0,
+    yes_enabled: bool = True,
+    no_enabled: bool = True,
+    max_quote_age_sec: Optional[float] = None,
+    with_depth: bool = False,
+    min_book_depth: float = 0.0,
+    max_position: Optional[float] = None,
+    get_position: Optional[Callable[[str], float]] = None,
+    max_order_size: Optional[float] = None,
+) -> List[EventArbitrageSignal]:
+    """
+    目的：对一批事件做 YES/NO 篮子检测，供 main 在脏市场批次上增量调用
+    方法：每个结果市场读一次 get_snapshot（各市场内两腿一致；跨市场不是同一时刻，下单前逐腿校验序号）；
+         任一腿失步或超过 max_quote_age_sec 的事件整体跳过；max_position 以 event_id 计剩余仓位（get_position(event_id)），
+         max_order_size 为可选的单笔上限（见 check_event_arbitrage）。
+         with_depth 时最优价命中的事件再逐市场读 get_snapshot(ty, tn, with_depth=True)，在这组快照上重新检测并按深度定量，
+         每腿的价格、序号与深度出自同一次读取
+    """
+    signals: List[EventArbitrageSignal] = []
+    for g in groups:
+        snaps = [get_snapshot(m["token_id_yes"], m["token_id_no"]) for m in g.markets]
+        if not all(s.valid for s in snaps):
+            continue
+        if max_quote_age_sec is not None:
+            ages = [s.max_age() for s in snaps]
+            if any(a is None or a > max_quote_age_sec for a in ages):
+                continue
+        max_size = None
+        if max_position is not None:
+            max_size = max_position - (get_position(g.event_id) if get_position is not None else 0.0)
+        deep: Optional[List[Any]] = None
+        depth: Dict[str, Levels] = {}
+        for basket, enabled in (("yes", yes_enabled), ("no", no_enabled)):
+            if not enabled:
+                continue
+            sig = check_event_arbitrage(
+                g, snaps, basket, min_profit, fee_bps, default_size, max_size=max_size, max_order_size=max_order_size,
+            )
+            if sig is not None and with_depth:
+                if deep is None:
+                    deep = [get_snapshot(m["token_id_yes"], m["token_id_no"], with_depth=True) for m in g.markets]
+                    for s in deep:
+                        depth[s.token_id_yes] = s.depth_yes["asks"]
+                        depth[s.token_id_no] = s.depth_no["asks"]
+                if not all(s.valid for s in deep):
+                    break
+                sig = check_event_arbitrage(
+                    g, deep, basket, min_profit, fee_bps, default_size,
+                    get_asks=depth.__getitem__, min_book_depth=min_book_depth, max_size=max_size,
+                    max_order_size=max_order_size,
+                )
+            if sig is not None:
+                signals.append(sig)
+    return signals
+
+
+def is_event_signal_current(store: Any, signal: EventArbitrageSignal) -> bool:
+    """目的：下单前校验每个结果市场自检测快照以来均无更新且未失步。方法：逐腿调用 store.is_pair_current"""
+    return all(
+        store.is_pair_current(leg.token_id_yes, leg.token_id_no, leg.seq_yes, leg.seq_no) for leg in signal.legs
+    )
@@ -1,30 +1,59 @@
 # 目的：价差套利下单——同时买 YES 和 NO，用信号中的 best ask 作为限价，到期任一侧得 $1
 # 方法：两腿同 size，价格取检测时的 price_yes/price_no（即 orderbook best ask）；优先批量 post_orders 减滑点
 # Split 套利：用 USDC 拆分成 YES+NO，然后卖出给市场上的 bid
+# 事件套利：多结果（negRisk）事件的 N 腿买单按 post_orders 单次上限分批一起提交
 
 import logging
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from src.arbitrage import ArbitrageSignal, SplitArbitrageSignal, MakerArbitrageSignal
+from src.event_arb import EventArbitrageSignal
 
 logger = logging.getLogger(__name__)
 
+# CLOB 批量下单接口单次最多提交的订单数
+MAX_BATCH_ORDERS = 15
+
 # Maker 订单跟踪：用于监控订单状态和部分成交
 _maker_orders: Dict[str, Dict[str, Any]] = {}  # order_id -> {signal, created_at, status, filled_yes, filled_no}
 
 
+def _order_options(options_cls: Any, tick_size: str, neg_risk: bool) -> Any:
+    """目的：构造 create_order 的市场选项。方法：negRisk 市场必须按 negRisk 交易合约签名，tick_size 决定价格精度"""
+    return options_cls(tick_size=tick_size, neg_risk=bool(neg_risk))
+
+
+def _quote_moved(signal: Any, is_current: Optional[Callable[[Any], bool]]) -> bool:
+    """
+    目的：下单前确认检测所用的两腿报价仍为最新，避免用已变化的报价下单
+    方法：is_current 为 None 时不校验；否则调用 is_current(signal)，返回 False 则打 log 并视为报价已变化
+    """
+    if is_current is None or is_current(signal):
+        return False
+    logger.info(
+        "报价已变化，放弃本次下单: token_yes=%s token_no=%s seq_yes=%s seq_no=%s",
+        signal.token_id_yes, signal.token_id_no, signal.seq_yes, signal.seq_no,
+    )
+    return True
+
+
 def execute_arbitrage(
     signal: ArbitrageSignal,
     client: Optional[Any] = None,
     paper: bool = True,
     tick_size: str = "0.01",
     neg_risk: bool = False,
+    is_current: Optional[Callable[[Any], bool]] = None,
 ) -> List[Any]:
     """
     目的：对一次 YES/NO 套利信号执行下单（或 paper 时仅打 log）
-    方法：paper 为 True 时只记录拟下单的 token_id、price、size；否则用 client 创建并提交两腿买单（批量或两次 post_order）
+    方法：paper 为 True 时只记录拟下单的 token_id、price、size；否则用 client 创建并提交两腿买单（批量或两次 post_order）；
+    tick_size/neg_risk 取自该市场（gamma 市场字典的 tick_size、neg_risk），negRisk 市场按 negRisk 签名
+    若传入 is_current（如基于 OrderBookStore.is_pair_current），两腿报价自检测后已变化则不下单，返回 []
     """
+    if _quote_moved(signal, is_current):
+        return []
     if paper:
         logger.info(
             "[PAPER] 套利机会: token_yes=%s price_yes=%s token_no=%s price_no=%s size=%s expected_profit=%s",
@@ -42,13 +71,13 @@ def execute_arbitrage(
         return []
 
     try:
-        from py_clob_client.clob_types import OrderArgs, OrderType
+        from py_clob_client.clob_types import OrderArgs, OrderType, PartialCreateOrderOptions
         from py_clob_client.order_builder.constants import BUY
     except ImportError:
         logger.error("py_clob_client 未安装，无法下单")
         return []
 
-    market_opts = {"tick_size": tick_size, "neg_risk": neg_risk}
+    options = _order_options(PartialCreateOrderOptions, tick_size, neg_risk)
     orders_created: List[Any] = []
 
     # 方法：先创建 YES 腿与 NO 腿的订单参数，再尝试批量提交；若无 batch 则分别 post_order
@@ -65,8 +94,8 @@ def execute_arbitrage(
         token_id=signal.token_id_no,
     )
 
-    signed_yes = client.create_order(order_yes)
-    signed_no = client.create_order(order_no)
+    signed_yes = client.create_order(order_yes, options)
+    signed_no = client.create_order(order_no, options)
 
     # 方法：优先批量提交以减少腿间滑点；若 client 无 post_orders 则两次 post_order
     if hasattr(client, "post_orders") and callable(getattr(client, "post_orders")):
@@ -92,6 +121,7 @@ def execute_split_arbitrage(
     paper: bool = True,
     tick_size: str = "0.01",
     neg_risk: bool = False,
+    is_current: Optional[Callable[[Any], bool]] = None,
 ) -> List[Any]:
     """
     目的：对一次 Split 套利信号执行操作（用 USDC 拆分成 YES+NO，然后卖出）
@@ -100,7 +130,10 @@ def execute_split_arbitrage(
          2. 创建两笔卖单：SELL YES 和 SELL NO，价格分别为 bid_yes 和 bid_no
          3. 批量提交卖单
     注意：CTF Split 操作需要链上交易，当前先实现检测和日志，CTF 操作后续补充
+    is_current、tick_size、neg_risk 同 execute_arbitrage：报价已变化则不执行
     """
+    if _quote_moved(signal, is_current):
+        return []
     if paper:
         logger.info(
             "[PAPER] Split 套利机会: token_yes=%s bid_yes=%s token_no=%s bid_no=%s size=%s expected_profit=%s",
@@ -126,12 +159,13 @@ def execute_split_arbitrage(
         return []
 
     try:
-        from py_clob_client.clob_types import OrderArgs, OrderType
+        from py_clob_client.clob_types import OrderArgs, OrderType, PartialCreateOrderOptions
         from py_clob_client.order_builder.constants import SELL
     except ImportError:
         logger.error("py_clob_client 未安装，无法执行 Split 套利")
         return []
 
+    options = _order_options(PartialCreateOrderOptions, tick_size, neg_risk)
     orders_created: List[Any] = []
 
     # TODO: 实现 CTF Split 操作
@@ -159,8 +193,8 @@ def execute_split_arbitrage(
         token_id=signal.token_id_no,
     )
 
-    signed_yes = client.create_order(order_yes)
-    signed_no = client.create_order(order_no)
+    signed_yes = client.create_order(order_yes, options)
+    signed_no = client.create_order(order_no, options)
 
     # 批量提交卖单
     if hasattr(client, "post_orders") and callable(getattr(client, "post_orders")):
@@ -187,6 +221,7 @@ def execute_maker_arbitrage(
     tick_size: str = "0.01",
     neg_risk: bool = False,
     order_timeout_sec: float = 300.0,  # 5 分钟超时
+    is_current: Optional[Callable[[Any], bool]] = None,
 ) -> List[Any]:
     """
     目的：对一次 Maker 套利信号执行操作（在 YES 和 NO 两边挂 Maker 买单）
@@ -195,7 +230,10 @@ def execute_maker_arbitrage(
          2. 提交订单并跟踪订单状态
          3. 监控部分成交情况
     注意：Maker 策略需要等待成交，可能只成交一边，需要处理部分成交的情况
+    is_current、tick_size、neg_risk 同 execute_arbitrage：报价已变化则不挂单
     """
+    if _quote_moved(signal, is_current):
+        return []
     if paper:
         logger.info(
             "[PAPER] Maker 套利机会: token_yes=%s maker_bid_yes=%.4f (best_ask=%.4f) "
@@ -221,12 +259,13 @@ def execute_maker_arbitrage(
         return []
 
     try:
-        from py_clob_client.clob_types import OrderArgs, OrderType
+        from py_clob_client.clob_types import OrderArgs, OrderType, PartialCreateOrderOptions
         from py_clob_client.order_builder.constants import BUY
     except ImportError:
         logger.error("py_clob_client 未安装，无法执行 Maker 套利")
         return []
 
+    options = _order_options(PartialCreateOrderOptions, tick_size, neg_risk)
     orders_created: List[Any] = []
 
     # 创建两笔 Maker 买单：价格略低于 best ask，确保成为 Maker
@@ -243,8 +282,8 @@ def execute_maker_arbitrage(
         token_id=signal.token_id_no,
     )
 
-    signed_yes = client.create_order(order_yes)
-    signed_no = client.create_order(order_no)
+    signed_yes = client.create_order(order_yes, options)
+    signed_no = client.create_order(order_no, options)
 
     # 提交订单
     if hasattr(client, "post_orders") and callable(getattr(client, "post_orders")):
@@ -281,6 +320,70 @@ def execute_maker_arbitrage(
     return orders_created
 
 
+def execute_event_arbitrage(
+    signal: EventArbitrageSignal,
+    client: Optional[Any] = None,
+    paper: bool = True,
+    is_current: Optional[Callable[[Any], bool]] = None,
+) -> List[Any]:
+    """
+    目的：对一次多结果事件套利信号下单：每个结果各买 size 份（YES 篮子买 YES，NO 篮子买 NO）
+    方法：paper 为 True 时逐腿打 log；否则先为全部腿签名（negRisk 市场签名，各腿按自身 tick_size），再按 MAX_BATCH_ORDERS 分批 post_orders，
+         尽量让 N 腿在同一时刻到达撮合；无 post_orders 时逐腿 post_order。
+         is_current（如 src.event_arb.is_event_signal_current）返回 False 时任一腿报价已变化，整组不下单
+    """
+    if is_current is not None and not is_current(signal):
+        logger.info("事件报价已变化，放弃本次下单: event_id=%s basket=%s", signal.event_id, signal.basket)
+        return []
+    if paper:
+        logger.info(
+            "[PAPER] 事件套利机会: event_id=%s basket=%s legs=%d cost=%.4f payout=%.0f size=%s expected_profit=%s",
+            signal.event_id,
+            signal.basket,
+            len(signal.legs),
+            signal.cost,
+            signal.payout,
+            signal.size,
+            signal.expected_profit,
+        )
+        for leg in signal.legs:
+            logger.info("[PAPER]   BUY token=%s price=%s size=%s (%s)", leg.token_id, leg.price, signal.size, leg.question[:60])
+        return []
+
+    if client is None:
+        logger.warning("实盘模式但未提供 client，跳过事件套利下单")
+        return []
+
+    try:
+        from py_clob_client.clob_types import OrderArgs, OrderType, PartialCreateOrderOptions
+        from py_clob_client.order_builder.constants import BUY
+    except ImportError:
+        logger.error("py_clob_client 未安装，无法下单")
+        return []
+
+    signed = [
+        client.create_order(
+            OrderArgs(price=leg.price, size=signal.size, side=BUY, token_id=leg.token_id),
+            _order_options(PartialCreateOrderOptions, leg.tick_size, True),
+        )
+        for leg in signal.legs
+    ]
+    orders_created: List[Any] = []
+    if hasattr(client, "post_orders") and callable(getattr(client, "post_orders")):
+        for i in range(0, len(signed), MAX_BATCH_ORDERS):
+            resp = client.post_orders(signed[i:i + MAX_BATCH_ORDERS], OrderType.GTC)
+            if isinstance(resp, list):
+                orders_created.extend(resp)
+            else:
+                orders_created.append(resp)
+    else:
+        for order in signed:
+            r = client.post_order(order, OrderType.GTC)
+            if r is not None:
+                orders_created.append(r)
+    return orders_created
+
+
 def check_maker_orders_status(
     client: Optional[Any],
     timeout_sec: float = 300.0,
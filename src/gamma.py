@@ -1,5 +1,7 @@
 # 目的：为套利与 WebSocket 提供可交易的体育市场列表（condition_id、YES/NO token_id）
 # 方法：请求 Gamma API events（可选 tag_id 过滤体育），解析 markets，过滤未结束且含二元 outcome 的市场
+# 多结果（negRisk）事件：events_to_neg_risk_markets 把同一事件下全部未结算的结果市场整组取出，带上 event_id 与结果数，
+#       供 src.event_arb 按事件分组检测「买齐所有结果」的套利
 
 import time
 from typing import Any, Dict, List, Optional
@@ -83,6 +85,7 @@ def event_to_binary_markets(event: Dict[str, Any]) -> List[Dict[str, Any]]:
             "token_id_no": tokens["no"],
             "event_slug": event.get("slug") or event.get("id") or "",
             "question": m.get("question") or m.get("title") or "",
+            **_order_fields(m, event),
         })
     return out
 
@@ -156,6 +159,27 @@ def _parse_market_tokens(market: Dict[str, Any]) -> Optional[Dict[str, str]]:
     return None
 
 
+def _tick_size(value: Any, default: str = "0.01") -> str:
+    """目的：把 Gamma 的 orderPriceMinTickSize（如 0.01、0.001）转为下单选项用的字符串；缺失或非法时用 default"""
+    try:
+        tick = float(value)
+    except (TypeError, ValueError):
+        return default
+    return str(tick) if tick > 0 else default
+
+
+def _order_fields(market: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    目的：下单签名需要的市场字段
+    方法：market 或 event 的 negRisk 为真即为多结果（negRisk）市场，下单时需按 negRisk 签名；tick_size 取 orderPriceMinTickSize
+    """
+    return {
+        "neg_risk": bool(market.get("negRisk") or event.get("negRisk")),
+        "neg_risk_market_id": str(market.get("negRiskMarketID") or event.get("negRiskMarketID") or ""),
+        "tick_size": _tick_size(market.get("orderPriceMinTickSize")),
+    }
+
+
 def _is_market_ended(market: Dict[str, Any], event: Dict[str, Any]) -> bool:
     """目的：判断市场是否已结束，避免对已结算市场下单。方法：endDate 或 end_date 已过则视为结束"""
     end = market.get("endDate") or market.get("end_date") or event.get("endDate") or event.get("end_date")
@@ -195,7 +219,86 @@ def events_to_binary_markets(events: List[Dict[str, Any]]) -> List[Dict[str, Any
                 "token_id_no": tokens["no"],
                 "event_slug": ev.get("slug") or ev.get("id") or "",
                 "question": m.get("question") or m.get("title") or "",
+                **_order_fields(m, ev),
+            })
+    return out
+
+
+def _is_outcome_resolved(market: Dict[str, Any]) -> bool:
+    """目的：判断多结果事件中的单个结果市场是否已关闭或已结算。方法：closed 为 True 或 umaResolutionStatus 为 resolved"""
+    return market.get("closed") is True or str(market.get("umaResolutionStatus") or "").lower() == "resolved"
+
+
+def events_to_neg_risk_markets(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    目的：取出多结果（negRisk）事件的全部结果市场，同一事件的各结果互斥且恰有一个结算为 YES
+    方法：只保留 negRisk 且非 augmented（augmented 事件还有未列出的占位结果，买齐列出的结果并不覆盖全部情形）的事件；
+         已关闭或已结算的结果市场（已结算为 NO）不计入；任一未结算的结果无法解析出 token 或暂不可交易（active 为 False）
+         则整个事件跳过（缺一腿就不是无风险组合）。
+         每个市场额外带 event_id（negRiskMarketID，缺省为 slug）、event_title 与 event_outcomes（本组结果数）
+    """
+    out: List[Dict[str, Any]] = []
+    for ev in events:
+        if not ev.get("negRisk") or ev.get("negRiskAugmented") or _is_market_ended({}, ev):
+            continue
+        markets = ev.get("markets") or []
+        if not isinstance(markets, list):
+            continue
+        legs: List[Dict[str, Any]] = []
+        for m in markets:
+            if not isinstance(m, dict) or _is_outcome_resolved(m):
+                continue
+            tokens = _parse_market_tokens(m)
+            condition_id = m.get("conditionId") or m.get("condition_id") or ""
+            if not tokens or not condition_id or m.get("active") is False:
+                legs = []
+                break
+            legs.append({
+                "condition_id": condition_id,
+                "token_id_yes": tokens["yes"],
+                "token_id_no": tokens["no"],
+                "event_slug": ev.get("slug") or ev.get("id") or "",
+                "question": m.get("question") or m.get("title") or "",
+                **_order_fields(m, ev),
             })
+        if len(legs) < 2:
+            continue
+        event_id = str(ev.get("negRiskMarketID") or ev.get("slug") or ev.get("id") or "")
+        for leg in legs:
+            leg["neg_risk"] = True
+            leg["event_id"] = event_id
+            leg["event_title"] = ev.get("title") or ""
+            leg["event_outcomes"] = len(legs)
+        out.extend(legs)
+    return out
+
+
+def fetch_neg_risk_markets(
+    tag_slug: Optional[str] = "sports",
+    tag_id: Optional[int] = None,
+    limit: int = 200,
+    offset: int = 0,
+    max_events: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    目的：拉取多结果（negRisk）事件的全部结果市场，供事件级套利监控
+    方法：fetch_events 后 events_to_neg_risk_markets；max_events 限制事件数（整组保留，不截断单个事件的结果）
+    """
+    if tag_slug:
+        events = fetch_events(tag_slug=tag_slug, closed=False, limit=limit, offset=offset)
+    else:
+        events = fetch_events(tag_id=tag_id, closed=False, limit=limit, offset=offset)
+    legs = events_to_neg_risk_markets(events)
+    if max_events is None:
+        return legs
+    kept: Dict[str, None] = {}
+    out: List[Dict[str, Any]] = []
+    for leg in legs:
+        if leg["event_id"] not in kept:
+            if len(kept) >= max_events:
+                continue
+            kept[leg["event_id"]] = None
+        out.append(leg)
     return out
 
 
@@ -266,6 +369,7 @@ def fetch_live_sports_binary_markets(
                 "token_id_no": tokens["no"],
                 "event_slug": ev.get("slug") or ev.get("id") or "",
                 "question": m.get("question") or m.get("title") or "",
+                **_order_fields(m, ev),
             })
     return out
 
@@ -13,25 +13,44 @@ from typing import Any, Dict, List, Optional
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config_loader import load_config
-from src.gamma import fetch_sports_binary_markets, fetch_top10_binary_markets_by_volume, fetch_live_sports_binary_markets
-from src.orderbook import OrderBookStore, run_websocket_loop
-from src.arbitrage import (
-    scan_markets_for_arbitrage,
-    ArbitrageSignal,
-    scan_markets_for_split_arbitrage,
-    SplitArbitrageSignal,
-    scan_markets_for_maker_arbitrage,
-    MakerArbitrageSignal,
+from src.gamma import (
+    fetch_live_sports_binary_markets,
+    fetch_neg_risk_markets,
+    fetch_sports_binary_markets,
+    fetch_top10_binary_markets_by_volume,
 )
+from src.orderbook import (
+    WSS_MARKET_URL,
+    OrderBookStore,
+    ShardStats,
+    run_websocket_loop,
+    start_sharded_websocket_loops,
+)
+from src.ws_async import AsyncMarketIngest, run_async_ingest
+from src.capture import FrameRecorder, save_markets
+from src.metrics import MetricsRegistry, start_metrics_server
+from src.resync import BookResyncer
+from src.shm_store import SharedMemoryQuoteStore
+from src.arbitrage import DetectionResult, scan_markets_all_strategies
+from src.event_arb import EventIndex, is_event_signal_current, scan_event_groups
+from src.opportunity import OpportunityTracker
 from src.volatility import scan_markets_for_volatility
 from src.volatility import VolatilityDetector
-from src.execution import execute_arbitrage, execute_split_arbitrage, execute_maker_arbitrage, check_maker_orders_status
+from src.execution import (
+    check_maker_orders_status,
+    execute_arbitrage,
+    execute_event_arbitrage,
+    execute_maker_arbitrage,
+    execute_split_arbitrage,
+)
 from src.telegram_notify import (
     notify_arb_opportunity,
     notify_split_arb_opportunity,
     notify_maker_arb_opportunity,
     notify_startup,
     notify_heartbeat,
+    start_notifier,
+    stop_notifier,
 )
 
 logging.basicConfig(
@@ -81,6 +100,32 @@ def log_task_status_and_workbook(
     logger.info("【Workbook】活跃市场 %d 个（共监控 %d 个，已过滤不活跃 %d 个）", active_count, len(markets), len(markets) - active_count)
 
 
+def log_shard_stats(shard_stats: List[ShardStats]) -> None:
+    """目的：在 Deploy Logs 中输出每个 WebSocket 分片的健康状况。方法：逐分片打印连接状态、消息数、最近消息距今秒数与最近错误"""
+    now = time.monotonic()
+    for st in shard_stats:
+        age = "%.1fs" % (now - st.last_message_at) if st.last_message_at is not None else "-"
+        logger.info(
+            "【WS 分片 %d】connected=%s assets=%d 连接=%d 断线=%d 消息=%d 最近消息=%s 错误=%d %s",
+            st.shard_id, st.connected, st.asset_count, st.connects, st.disconnects,
+            st.messages, age, st.errors, st.last_error,
+        )
+
+
+def log_quote_freshness(store: OrderBookStore, asset_ids: List[str], max_age_sec: Optional[float]) -> None:
+    """目的：在 Deploy Logs 中输出监控 token 的报价新鲜度（最旧/中位年龄、超龄数量），接入中断时可从日志直接看出"""
+    fr = store.get_freshness(asset_ids, max_age_sec=max_age_sec)
+    if fr.oldest_age_sec is None:
+        logger.info("【报价新鲜度】监控 %d 个 token，尚无任何更新", fr.asset_count)
+        return
+    level = logging.WARNING if fr.stale_count else logging.INFO
+    logger.log(
+        level,
+        "【报价新鲜度】监控 %d 个 token，最旧 %.1fs（%s），中位 %.1fs，超龄(>%ss) %d 个",
+        fr.asset_count, fr.oldest_age_sec, fr.oldest_asset_id, fr.median_age_sec, max_age_sec, fr.stale_count,
+    )
+
+
 def run_once(
     config: Dict[str, Any],
     store: OrderBookStore,
@@ -88,74 +133,135 @@ def run_once(
     paper: bool,
     client: Optional[Any],
     volatility_detectors: Dict[str, Any],
-) -> None:
+    metrics: Optional[MetricsRegistry] = None,
+    positions: Optional[Dict[str, float]] = None,
+    event_index: Optional[EventIndex] = None,
+    tracker: Optional[OpportunityTracker] = None,
+) -> DetectionResult:
     """
     目的：执行一轮检测与执行（套利 + 可选波动），供主循环调用
-    方法：用 store 的 get_best_ask 扫描套利；若开启波动则扫描波动；对每个信号调用 execute_arbitrage
+    方法：scan_markets_all_strategies 单次遍历：每个市场只读一次两腿快照并运行所有已启用的套利策略；
+         命中的市场按两腿深度定量（min_book_depth 过滤，max_position_per_market 减去 positions 中已持仓量封顶，
+         可选 max_order_size 限制单笔数量）；
+         波动策略复用同一轮读到的报价；对每个信号调用对应 execute_*；传入 metrics 时记录检测耗时（detect）；
+         positions 为 condition_id -> 已下单的每腿数量，Merge/Split/Maker 实盘下单成功后累加；
+         传入 event_index 且启用 neg_risk_arb_enabled 时，对本批市场所在的多结果事件做 YES/NO 篮子检测并整组下单（仓位按 event_id 计）；
+         传入 tracker 时按 (策略, condition_id/event_id) 跟踪机会生命周期，持续存在的机会只在新开、冷却期满或利润明显变化时
+         才再次执行与推送；冷却只在下单成功后（tracker.mark_acted）开始，下单失败的机会下一轮仍会重试
+    返回：本轮 DetectionResult（含各策略命中数）
     """
+    def is_current(sig: Any) -> bool:
+        # 两腿自检测快照以来均无更新才下单，避免用撕裂或过期报价成交
+        return store.is_pair_current(sig.token_id_yes, sig.token_id_no, sig.seq_yes, sig.seq_no)
+
+    by_cid = {m.get("condition_id", ""): m for m in markets}
+
+    def order_opts(sig: Any) -> Dict[str, Any]:
+        # 下单签名所需的市场字段：negRisk 结果市场（含多结果事件的各腿）必须按 negRisk 签名，价格精度按市场 tick_size
+        m = by_cid.get(sig.condition_id, {})
+        return {"tick_size": m.get("tick_size") or "0.01", "neg_risk": bool(m.get("neg_risk"))}
+
+    merge_arb_enabled = config.get("merge_arb_enabled", True)
+    split_arb_enabled = config.get("split_arb_enabled", True)
+    maker_arb_enabled = config.get("maker_arb_enabled", False)
+    t_detect = time.perf_counter()
+    detection = scan_markets_all_strategies(
+        markets,
+        get_snapshot=store.get_market_snapshot,
+        min_profit=config.get("min_profit", 0.005),
+        fee_bps=config.get("fee_bps", 0),
+        default_size=config.get("default_size", 5.0),
+        maker_bid_spread=config.get("maker_bid_spread", 0.01),
+        merge_enabled=merge_arb_enabled,
+        split_enabled=split_arb_enabled,
+        maker_enabled=maker_arb_enabled,
+        max_quote_age_sec=config.get("max_quote_age_sec") or None,
+        with_depth=True,
+        min_book_depth=float(config.get("min_book_depth", 0.0) or 0.0),
+        max_position=config.get("max_position_per_market"),
+        get_position=(lambda cid: positions.get(cid, 0.0)) if positions is not None else None,
+        max_order_size=config.get("max_order_size") or None,
+    )
+    if metrics is not None:
+        metrics.histogram("detect").record(time.perf_counter() - t_detect)
+    if detection.invalid_skipped:
+        logger.debug("本轮跳过 %d 个订单簿失步的市场（等待重同步）", detection.invalid_skipped)
+    if detection.stale_skipped:
+        logger.debug("本轮跳过 %d 个报价超龄的市场（max_quote_age_sec=%s）", detection.stale_skipped, config.get("max_quote_age_sec"))
+    if detection.merge or detection.split or detection.maker:
+        logger.debug(
+            "本轮检测 %d 个市场，命中 merge=%d split=%d maker=%d",
+            detection.markets_scanned,
+            detection.hit_counts["merge"],
+            detection.hit_counts["split"],
+            detection.hit_counts["maker"],
+        )
+
+    def edge(sig: Any) -> float:
+        return sig.expected_profit / sig.size if sig.size else 0.0
+
+    def gate(strategy: str, signals: List[Any], evaluated: List[str], key: str = "condition_id") -> List[Any]:
+        # 机会去重：未传 tracker 时全部放行；否则只放行 tracker 判定可执行的候选 key
+        if tracker is None:
+            return signals
+        hits = {getattr(s, key): edge(s) for s in signals}
+        act = set(tracker.update(strategy, evaluated, hits))
+        suppressed = len(signals) - sum(1 for s in signals if getattr(s, key) in act)
+        if suppressed:
+            logger.debug("%s: %d 个持续中的机会未达冷却/利润变化条件，本轮不重复执行", strategy, suppressed)
+        return [s for s in signals if getattr(s, key) in act]
+
+    def acted(strategy: str, sig: Any, ok: bool, key: str = "condition_id") -> None:
+        # 只有下单成功（paper 下为报价未变、已记录拟下单）才开始冷却；失败的执行下一轮仍可重试
+        if tracker is not None and ok:
+            tracker.mark_acted(strategy, getattr(sig, key), edge(sig))
+
+    # 本轮实际完成检测（未因失步/超龄跳过）的市场；只对这些市场关闭消失的机会
+    scanned = [m.get("condition_id", "") for m in markets if m.get("token_id_yes") in detection.quotes]
+
     def get_ask(asset_id: str) -> Optional[float]:
-        return store.get_best_ask(asset_id)
+        return detection.quotes.get(asset_id, (None, None))[1]
 
     def get_bid(asset_id: str) -> Optional[float]:
-        return store.get_best_bid(asset_id)
+        return detection.quotes.get(asset_id, (None, None))[0]
 
-    # Merge 套利检测：YES/NO 买价之和 < 1 - fee - min_profit（买入 YES+NO，等待结算或合并）
-    merge_arb_enabled = config.get("merge_arb_enabled", True)
+    # Merge 套利：YES/NO 买价之和 < 1 - fee - min_profit（买入 YES+NO，等待结算或合并）
     if merge_arb_enabled:
-        arb_signals = scan_markets_for_arbitrage(
-            markets,
-            get_best_ask=get_ask,
-            min_profit=config.get("min_profit", 0.005),
-            fee_bps=config.get("fee_bps", 0),
-            default_size=config.get("default_size", 5.0),
-        )
-        for sig in arb_signals:
+        for sig in gate("merge", detection.merge, scanned):
             # 1. Deploy Log 醒目显示套利机会
             logger.info(
                 "【Merge 套利机会】%s | YES=%.3f NO=%.3f 合计=%.3f | 预期利润=%.2f",
                 (sig.question or "套利")[:60], sig.price_yes, sig.price_no, sig.price_yes + sig.price_no, sig.expected_profit,
             )
             # 2. 执行层（paper 时只打 [PAPER] 明细）
-            execute_arbitrage(sig, client=client, paper=paper)
+            placed = execute_arbitrage(sig, client=client, paper=paper, is_current=is_current, **order_opts(sig))
+            if placed and positions is not None:
+                positions[sig.condition_id] = positions.get(sig.condition_id, 0.0) + sig.size
+            acted("merge", sig, bool(placed) or (paper and is_current(sig)))
             # 3. 套利机会推送到 Telegram
             if notify_arb_opportunity(sig):
                 logger.info("Merge 套利机会已推送 Telegram")
 
-    # Split 套利检测：YES/NO 卖价（bid）之和 > 1 + min_profit（拆分 USDC 成 YES+NO，然后卖出）
-    split_arb_enabled = config.get("split_arb_enabled", True)
+    # Split 套利：YES/NO 卖价（bid）之和 > 1 + min_profit（拆分 USDC 成 YES+NO，然后卖出）
     if split_arb_enabled:
-        split_signals = scan_markets_for_split_arbitrage(
-            markets,
-            get_best_bid=get_bid,
-            min_profit=config.get("min_profit", 0.005),
-            fee_bps=config.get("fee_bps", 0),
-            default_size=config.get("default_size", 5.0),
-        )
-        for sig in split_signals:
+        for sig in gate("split", detection.split, scanned):
             # 1. Deploy Log 醒目显示 Split 套利机会
             logger.info(
                 "【Split 套利机会】%s | YES bid=%.3f NO bid=%.3f 合计=%.3f | 预期利润=%.2f",
                 (sig.question or "套利")[:60], sig.bid_yes, sig.bid_no, sig.bid_yes + sig.bid_no, sig.expected_profit,
             )
             # 2. 执行层（paper 时只打 [PAPER] 明细）
-            execute_split_arbitrage(sig, client=client, paper=paper)
+            placed = execute_split_arbitrage(sig, client=client, paper=paper, is_current=is_current, **order_opts(sig))
+            if placed and positions is not None:
+                positions[sig.condition_id] = positions.get(sig.condition_id, 0.0) + sig.size
+            acted("split", sig, bool(placed) or (paper and is_current(sig)))
             # 3. Split 套利机会推送到 Telegram
             if notify_split_arb_opportunity(sig):
                 logger.info("Split 套利机会已推送 Telegram")
 
-    # Maker 套利检测：在 YES 和 NO 两边挂 Maker 买单，等待成交（与 Taker 策略分离）
-    maker_arb_enabled = config.get("maker_arb_enabled", False)
+    # Maker 套利：在 YES 和 NO 两边挂 Maker 买单，等待成交（与 Taker 策略分离）
     if maker_arb_enabled:
-        maker_signals = scan_markets_for_maker_arbitrage(
-            markets,
-            get_best_ask=get_ask,
-            get_best_bid=get_bid,
-            min_profit=config.get("min_profit", 0.005),
-            maker_bid_spread=config.get("maker_bid_spread", 0.01),
-            fee_bps=config.get("fee_bps", 0),
-            default_size=config.get("default_size", 5.0),
-        )
-        for sig in maker_signals:
+        for sig in gate("maker", detection.maker, scanned):
             # 1. Deploy Log 醒目显示 Maker 套利机会
             logger.info(
                 "【Maker 套利机会】%s | YES maker_bid=%.4f (ask=%.4f) NO maker_bid=%.4f (ask=%.4f) 合计=%.4f | 预期利润=%.2f",
@@ -168,12 +274,17 @@ def run_once(
                 sig.expected_profit,
             )
             # 2. 执行层（paper 时只打 [PAPER] 明细）
-            execute_maker_arbitrage(
+            placed = execute_maker_arbitrage(
                 sig,
                 client=client,
                 paper=paper,
                 order_timeout_sec=config.get("maker_order_timeout_sec", 300.0),
+                is_current=is_current,
+                **order_opts(sig),
             )
+            if placed and positions is not None:
+                positions[sig.condition_id] = positions.get(sig.condition_id, 0.0) + sig.size
+            acted("maker", sig, bool(placed) or (paper and is_current(sig)))
             # Maker 套利机会推送到 Telegram
             if notify_maker_arb_opportunity(sig):
                 logger.info("Maker 套利机会已推送 Telegram")
@@ -196,6 +307,43 @@ def run_once(
                     maker_stats["timeout"],
                 )
 
+    # 多结果（negRisk）事件套利：只评估本批市场所在的事件，任一结果更新即重新检测整组
+    if event_index is not None and len(event_index) and config.get("neg_risk_arb_enabled", False):
+        groups = event_index.groups_for(m.get("condition_id", "") for m in markets)
+        event_signals = scan_event_groups(
+            groups,
+            get_snapshot=store.get_market_snapshot,
+            min_profit=config.get("min_profit", 0.005),
+            fee_bps=config.get("fee_bps", 0),
+            default_size=config.get("default_size", 5.0),
+            yes_enabled=bool(config.get("neg_risk_yes_basket_enabled", True)),
+            no_enabled=bool(config.get("neg_risk_no_basket_enabled", True)),
+            max_quote_age_sec=config.get("max_quote_age_sec") or None,
+            with_depth=True,
+            min_book_depth=float(config.get("min_book_depth", 0.0) or 0.0),
+            max_position=config.get("max_position_per_market"),
+            get_position=(lambda eid: positions.get(eid, 0.0)) if positions is not None else None,
+            max_order_size=config.get("max_order_size") or None,
+        )
+        group_ids = [g.event_id for g in groups]
+        gated = [
+            sig
+            for basket in ("yes", "no")
+            for sig in gate("event_" + basket, [s for s in event_signals if s.basket == basket], group_ids, "event_id")
+        ]
+        for sig in gated:
+            logger.info(
+                "【事件套利机会】%s | %s 篮子 %d 腿 成本=%.3f 价值=%.0f | 数量=%.2f 预期利润=%.2f",
+                (sig.title or sig.event_id)[:60], sig.basket.upper(), len(sig.legs), sig.cost, sig.payout,
+                sig.size, sig.expected_profit,
+            )
+            placed = execute_event_arbitrage(
+                sig, client=client, paper=paper, is_current=lambda s: is_event_signal_current(store, s),
+            )
+            if placed and positions is not None:
+                positions[sig.event_id] = positions.get(sig.event_id, 0.0) + sig.size
+            acted("event_" + sig.basket, sig, bool(placed) or (paper and is_event_signal_current(store, sig)), "event_id")
+
     # 波动策略（可选）
     if config.get("volatility_enabled"):
         vol_signals = scan_markets_for_volatility(
@@ -206,6 +354,7 @@ def run_once(
             deviation_pct=config.get("volatility_deviation_pct", 0.05),
             default_size=config.get("default_size", 5.0),
             max_position=config.get("max_position_per_market", 50.0),
+            window_size=int(config.get("volatility_window_size", 20)),
         )
         for sig in vol_signals:
             logger.info(
@@ -213,6 +362,77 @@ def run_once(
                 sig.token_id, sig.side, sig.price, sig.size, sig.deviation_pct,
             )
             # 波动策略单腿下单可在此扩展 execution 层
+    return detection
+
+
+def _with_neg_risk_markets(config: Dict[str, Any], markets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    目的：启用多结果事件套利时，把 negRisk 事件的全部结果市场并入监控列表
+    方法：fetch_neg_risk_markets 按事件整组取回（不受 max_markets_monitor 截断，缺腿的事件不能套利）；
+         已在列表中的市场用带 event_id 的版本替换，其余追加；拉取失败时原样返回
+    """
+    if not config.get("neg_risk_arb_enabled", False):
+        return markets
+    try:
+        legs = fetch_neg_risk_markets(
+            tag_slug="sports",
+            tag_id=config.get("sports_tag_id"),
+            limit=config.get("events_limit", 200),
+            offset=config.get("events_offset", 0),
+            max_events=int(config.get("neg_risk_max_events", 20)),
+        )
+    except Exception as e:
+        logger.exception("拉取多结果事件失败: %s", e)
+        return markets
+    out = list(markets)
+    pos = {m.get("condition_id"): i for i, m in enumerate(out)}
+    for leg in legs:
+        i = pos.get(leg["condition_id"])
+        if i is None:
+            pos[leg["condition_id"]] = len(out)
+            out.append(leg)
+        else:
+            out[i] = leg
+    logger.info("多结果事件: %d 个事件共 %d 个结果市场并入监控", len({leg["event_id"] for leg in legs}), len(legs))
+    return out
+
+
+def _markets_by_condition(markets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """目的：condition_id -> market 映射，供事件驱动检测把脏 condition_id 还原为市场。方法：同 id 保留首个"""
+    out: Dict[str, Dict[str, Any]] = {}
+    for m in markets:
+        cid = m.get("condition_id")
+        if cid and cid not in out:
+            out[cid] = m
+    return out
+
+
+def run_dirty_markets(
+    config: Dict[str, Any],
+    store: OrderBookStore,
+    markets_by_cid: Dict[str, Dict[str, Any]],
+    paper: bool,
+    client: Optional[Any],
+    volatility_detectors: Dict[str, Any],
+    timeout: Optional[float] = None,
+    metrics: Optional[MetricsRegistry] = None,
+    positions: Optional[Dict[str, float]] = None,
+    event_index: Optional[EventIndex] = None,
+    tracker: Optional[OpportunityTracker] = None,
+) -> int:
+    """
+    目的：事件驱动检测阶段：等待订单簿更新唤醒，只对受影响的市场执行一轮检测，替代固定间隔全量轮询
+    方法：store.wait_dirty_markets 阻塞至任一被监控 token 更新或超时；把脏 condition_id 映射回市场后调用 run_once。
+         检测落后时同一市场的多次更新已在 store 内合并为一个标记，本轮读到的是最新状态；传入 metrics 时记录交接深度与等待时间
+    返回：本次评估的市场数量（超时无更新时为 0）
+    """
+    dirty = store.wait_dirty_markets(timeout=timeout)
+    if metrics is not None and dirty:
+        metrics.observe_handoff(store.get_handoff_stats(), len(dirty))
+    batch = [markets_by_cid[cid] for cid in dirty if cid in markets_by_cid]
+    if batch:
+        run_once(config, store, batch, paper, client, volatility_detectors, metrics, positions, event_index, tracker)
+    return len(batch)
 
 
 def main(
@@ -313,12 +533,25 @@ def main(
             max_markets,
         )
 
+    markets = _with_neg_risk_markets(config, markets)
     if not markets:
         logger.warning("当前无监控市场，将空跑主循环（可清空 monitor_condition_ids 用按成交量 top）")
 
-    store = OrderBookStore()
-    # 使用可变列表，便于定期刷新时更新（orderbook 通过 getter 读取，重连时拿到最新 asset_ids）
+    # 进程外接入时主进程只持有共享内存报价表的读取端，读取接口与 OrderBookStore 相同
+    ingest_process = bool(config.get("ingest_process_enabled", False))
+    store: Any
+    if ingest_process:
+        store = SharedMemoryQuoteStore(
+            capacity=int(config.get("shm_capacity", 8192)), depth=int(config.get("shm_depth", 5)),
+        )
+    else:
+        store = OrderBookStore(verify_hash=bool(config.get("verify_book_hash", False)))
+    # 使用可变列表，便于定期刷新时更新（orderbook 通过 getter 定期读取，在现有连接上增量订阅/退订）
     current_markets: List[Dict[str, Any]] = list(markets)
+    # 事件驱动检测：store 按 token -> market 反向索引标记脏市场，主循环只评估受影响的 condition_id
+    store.set_markets(current_markets)
+    markets_by_cid = _markets_by_condition(current_markets)
+    event_index = EventIndex(current_markets)
     current_asset_ids: List[str] = []
     for m in current_markets:
         current_asset_ids.append(m["token_id_yes"])
@@ -346,17 +579,81 @@ def main(
         logger.info("Telegram 已配置，已发送启动测试消息")
     else:
         logger.info("Telegram 未配置或发送失败（检查 TELEGRAM_BOT_TOKEN、TELEGRAM_CHAT_ID）")
+    # 之后的推送只入队，由后台线程合并、限速发送，避免 Telegram 延迟或限流阻塞检测与下单
+    notifier = start_notifier(
+        max_queue=int(config.get("telegram_queue_size", 100)),
+        digest_window_sec=float(config.get("telegram_digest_window_sec", 2.0)),
+        min_interval_sec=float(config.get("telegram_min_interval_sec", 1.0)),
+    )
 
-    # 启动 WebSocket 线程，持续接收订单簿并更新 store；传入 getter 以便定期刷新后重连时订阅新 asset_ids
+    # 启动 WebSocket 线程，持续接收订单簿并更新 store；传入 getter 以便定期刷新后增量订阅新 asset_ids
+    shard_stats: List[ShardStats] = []
+    # 可选：录制原始行情帧（按小时轮转压缩），供离线回放、回测与检测器回归
+    recorder: Optional[FrameRecorder] = None
+    # 行情延迟与各阶段耗时直方图：状态日志输出 p50/p99/p999，metrics_port 非 0 时经 HTTP /metrics 暴露
+    metrics: Optional[MetricsRegistry] = None
+    if config.get("latency_metrics_enabled", True):
+        metrics = MetricsRegistry()
+        port = int(config.get("metrics_port") or 0)
+        if port > 0:
+            start_metrics_server(metrics, port)
+            logger.info("延迟指标已暴露: http://0.0.0.0:%d/metrics", port)
+    if config.get("capture_dir"):
+        # 进程外接入时由接入进程录制，主进程只维护 markets.json
+        if not ingest_process:
+            recorder = FrameRecorder(str(config["capture_dir"]))
+        save_markets(str(config["capture_dir"]), current_markets)
+        logger.info("行情录制已开启，目录: %s", config["capture_dir"])
     if current_asset_ids:
-        ws_thread = threading.Thread(
-            target=run_websocket_loop,
-            args=(store, get_asset_ids),
-            daemon=True,
-            name="orderbook-ws",
-        )
-        ws_thread.start()
-        logger.info("已启动 orderbook WebSocket，订阅 %d 个 asset_ids", len(current_asset_ids))
+        num_shards = int(config.get("ws_num_shards", 1))
+        ws_url = str(config.get("market_ws_url") or WSS_MARKET_URL)
+        if ingest_process:
+            # 解码、订单簿维护、录制与 REST 重同步均在接入进程内，主进程经共享内存读取报价
+            store.start(
+                get_asset_ids,
+                url=ws_url,
+                num_connections=num_shards,
+                verify_hash=bool(config.get("verify_book_hash", False)),
+                capture_dir=str(config.get("capture_dir") or ""),
+                resync_enabled=bool(config.get("book_resync_enabled", True)),
+                resync_interval_sec=float(config.get("book_resync_interval_sec", 1.0)),
+                resync_grace_sec=float(config.get("book_resync_grace_sec", 2.0)),
+                latency_metrics=bool(config.get("latency_metrics_enabled", True)),
+            )
+            shard_stats = store.shard_stats
+            logger.info(
+                "已启动进程外行情接入 %d 路连接，订阅 %d 个 asset_ids（共享内存报价表）", num_shards, len(current_asset_ids),
+            )
+        elif config.get("ws_engine", "thread") == "asyncio":
+            # asyncio 引擎：所有分片复用一个事件循环，PING 保活，指数退避 + 抖动重连
+            engine = AsyncMarketIngest(
+                store, get_asset_ids, url=ws_url, num_connections=num_shards, recorder=recorder, metrics=metrics,
+            )
+            shard_stats = engine.stats
+            threading.Thread(
+                target=run_async_ingest, args=(engine,), daemon=True, name="orderbook-ws-async",
+            ).start()
+            logger.info(
+                "已启动 asyncio orderbook 引擎 %d 路连接，订阅 %d 个 asset_ids", num_shards, len(current_asset_ids),
+            )
+        elif num_shards > 1:
+            # 分片模式：N 条连接按 asset_id 哈希分摊，单路断线只影响该分片
+            shard_stats = start_sharded_websocket_loops(
+                store, get_asset_ids, num_shards, url=ws_url, recorder=recorder, metrics=metrics,
+            )
+            logger.info(
+                "已启动 orderbook WebSocket 分片 %d 路，订阅 %d 个 asset_ids", num_shards, len(current_asset_ids),
+            )
+        else:
+            ws_thread = threading.Thread(
+                target=run_websocket_loop,
+                args=(store, get_asset_ids, ws_url),
+                kwargs={"recorder": recorder, "metrics": metrics},
+                daemon=True,
+                name="orderbook-ws",
+            )
+            ws_thread.start()
+            logger.info("已启动 orderbook WebSocket，订阅 %d 个 asset_ids", len(current_asset_ids))
         time.sleep(3)
         if monitor_set:
             top_label = None
@@ -368,8 +665,25 @@ def main(
             store, current_markets, status="首批订单簿已就绪，Workbook 快照", top_n_label=top_label,
         )
 
+    # 失步（断线窗口、增量缺档、哈希不符）的 asset 经 REST /books 批量重同步，恢复前检测层跳过
+    resyncer: Optional[BookResyncer] = None
+    if current_asset_ids and not ingest_process and config.get("book_resync_enabled", True):
+        resyncer = BookResyncer(store, grace_sec=float(config.get("book_resync_grace_sec", 2.0)))
+        resyncer.start(interval_sec=float(config.get("book_resync_interval_sec", 1.0)))
+
     volatility_detectors: Dict[str, VolatilityDetector] = {}
-    logger.info("主循环启动，paper=%s，poll_interval=%.1fs", paper, poll_interval_sec)
+    # condition_id -> 本进程已下单的每腿数量，套利定量时扣除，避免单市场超过 max_position_per_market
+    arb_positions: Dict[str, float] = {}
+    # 机会生命周期：同一机会持续期间不每轮重复下单/推送
+    tracker = OpportunityTracker(
+        cooldown_sec=float(config.get("opportunity_cooldown_sec", 30.0)),
+        min_edge_change=float(config.get("opportunity_min_edge_change", 0.005)),
+        debounce_sec=float(config.get("opportunity_debounce_sec", 5.0)),
+    )
+    event_driven = bool(config.get("event_driven_detection", True))
+    logger.info(
+        "主循环启动，paper=%s，poll_interval=%.1fs，event_driven=%s", paper, poll_interval_sec, event_driven,
+    )
     last_status_log = time.monotonic()
     last_refresh = time.monotonic()
     last_heartbeat = time.monotonic()
@@ -378,7 +692,18 @@ def main(
     heartbeat_interval = float(config.get("heartbeat_interval_sec", 3600.0))  # 每小时推送一次策略运行中
     try:
         while True:
-            run_once(config, store, current_markets, paper, client, volatility_detectors)
+            if event_driven:
+                # 订单簿更新即唤醒；poll_interval_sec 仅作为心跳/状态/刷新等周期任务的最长等待
+                run_dirty_markets(
+                    config, store, markets_by_cid, paper, client, volatility_detectors,
+                    timeout=poll_interval_sec, metrics=metrics, positions=arb_positions, event_index=event_index,
+                    tracker=tracker,
+                )
+            else:
+                run_once(
+                    config, store, current_markets, paper, client, volatility_detectors, metrics, arb_positions,
+                    event_index, tracker,
+                )
             now = time.monotonic()
             if now - last_heartbeat >= heartbeat_interval:
                 if notify_heartbeat():
@@ -394,6 +719,43 @@ def main(
                 log_task_status_and_workbook(
                     store, current_markets, status="主循环运行中", top_n_label=top_label,
                 )
+                log_shard_stats(shard_stats)
+                log_quote_freshness(store, current_asset_ids, config.get("max_quote_age_sec") or None)
+                if metrics is not None:
+                    logger.info("【延迟】%s", metrics.format_status())
+                if notifier is not None:
+                    ns = notifier.get_stats()
+                    logger.info(
+                        "【推送】入队 %d 已发 %d（摘要 %d） 排队 %d 丢弃 %d 限流 %d 失败 %d",
+                        ns.enqueued, ns.sent, ns.digests, ns.queued, ns.dropped, ns.rate_limited, ns.failed,
+                    )
+                if event_driven:
+                    ho = store.get_handoff_stats()
+                    logger.info(
+                        "【检测交接】待处理=%d 标记=%d 合并=%d 已检测=%d 批数=%d 最大批=%d 最大等待=%.1fms",
+                        ho.pending, ho.marked, ho.conflated, ho.delivered, ho.batches, ho.max_batch, ho.max_wait_sec * 1e3,
+                    )
+                tracker.expire()
+                opp = tracker.get_stats()
+                if opp.opened:
+                    logger.info(
+                        "【机会】进行中=%d 累计开启=%d 已结束=%d 执行=%d 去重=%d 持续中位数=%s 最长=%s",
+                        opp.open, opp.opened, opp.closed, opp.actions, opp.suppressed,
+                        "-" if opp.median_duration_sec is None else "%.1fs" % opp.median_duration_sec,
+                        "-" if opp.max_duration_sec is None else "%.1fs" % opp.max_duration_sec,
+                    )
+                if ingest_process:
+                    if not store.is_alive():
+                        logger.error("接入进程已退出，报价不再更新（超龄市场将被检测跳过）")
+                    if store.remote_metrics and metrics is not None:
+                        logger.info("【接入进程延迟】%s", metrics.format_status(store.remote_metrics))
+                invalid = store.get_invalid_assets()
+                if invalid or store.desync_counts:
+                    logger.info(
+                        "【订单簿失步】当前 %d 个，累计 %s，REST 重同步 %s",
+                        len(invalid), store.desync_counts,
+                        resyncer.stats if resyncer is not None else (store.resync_stats if ingest_process else "未启用"),
+                    )
                 last_status_log = now
             # 未指定 monitor_condition_ids 时，定期刷新市场并更新 current_markets / current_asset_ids
             if not monitor_set and now - last_refresh >= refresh_interval:
@@ -433,6 +795,7 @@ def main(
                     new_markets = list(all_new_markets_dict.values())
                     if len(new_markets) > max_markets:
                         new_markets = new_markets[:max_markets]
+                    new_markets = _with_neg_risk_markets(config, new_markets)
                     
                     if new_markets:
                         current_markets.clear()
@@ -442,8 +805,14 @@ def main(
                             new_ids.append(m["token_id_yes"])
                             new_ids.append(m["token_id_no"])
                         current_asset_ids[:] = list(dict.fromkeys(new_ids))
+                        store.set_markets(current_markets)
+                        markets_by_cid = _markets_by_condition(current_markets)
+                        event_index = EventIndex(current_markets)
+                        if config.get("capture_dir"):
+                            # 进程外接入时 recorder 为 None，markets.json 仍由主进程维护
+                            save_markets(str(config["capture_dir"]), current_markets)
                         logger.info(
-                            "已刷新监控市场为 %d 个（Live Sports: %d, Top10: %d, 去重后: %d），下次 WS 重连将订阅新 asset_ids",
+                            "已刷新监控市场为 %d 个（Live Sports: %d, Top10: %d, 去重后: %d），WS 将在现有连接上增量订阅/退订",
                             len(current_markets),
                             len(new_live_sports),
                             len(new_top10),
@@ -452,9 +821,16 @@ def main(
                 except Exception as e:
                     logger.exception("刷新市场失败: %s", e)
                 last_refresh = now
-            time.sleep(poll_interval_sec)
+            if not event_driven:
+                time.sleep(poll_interval_sec)
     except KeyboardInterrupt:
         logger.info("用户中断退出")
+    finally:
+        stop_notifier()
+        if recorder is not None:
+            recorder.close()
+        if ingest_process:
+            store.stop()
 
 
 if __name__ == "__main__":
@@ -462,7 +838,7 @@ if __name__ == "__main__":
     parser.add_argument("--paper", action="store_true", help="纸面模式，不下单")
     parser.add_argument("--live", action="store_true", help="实盘模式（需配置 .env）")
     parser.add_argument("--config", type=str, default=None, help="配置文件路径")
-    parser.add_argument("--poll", type=float, default=2.0, help="轮询间隔秒")
+    parser.add_argument("--poll", type=float, default=2.0, help="轮询间隔秒（事件驱动模式下为周期任务的最长等待）")
     args = parser.parse_args()
     paper = None
     if args.live:
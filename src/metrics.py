@@ -0,0 +1,218 @@
+# 目的：行情链路延迟度量：单向延迟（本地接收墙钟 - 帧内交易所时间戳）与各阶段处理耗时（解码、写入、检测），
+#       用于判断漏掉的套利来自网络延迟、与主循环的 GIL 竞争，还是检测本身太慢
+# 方法：对数分桶直方图（每个 2 的幂区间再分 16 个子桶，相对误差约 3%），记录只做一次 frexp 与一次列表自增；
+#       MetricsRegistry 按名字管理直方图与数值指标（gauge，如接入 -> 检测交接的积压与合并次数），输出 p50/p99/p999 到状态日志，
+#       并可选以 Prometheus 文本格式经 HTTP 暴露
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from src.orderbook import HandoffStats, _parse_exchange_ts
+
+# 每个 2 的幂区间的子桶数；64 个指数区间足以覆盖 1µs 到数小时
+_SUB_BUCKETS = 16
+_MAX_EXP = 64
+_QUANTILES = (0.5, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """
+    目的：低开销、线程安全的延迟直方图
+    方法：值以微秒记录；小于 1µs 记入 0 号桶；frexp 得到 (mantissa, exp)，桶号 = exp*16 + 子桶；
+         负值（如两端时钟偏差导致的负单向延迟）记为 0 并单独计数
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: List[int] = [0] * (_MAX_EXP * _SUB_BUCKETS)
+        self.count = 0
+        self.negative = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _index(us: float) -> int:
+        if us < 1.0:
+            return 0
+        mant, exp = math.frexp(us)
+        return min(exp * _SUB_BUCKETS + int((mant - 0.5) * 2 * _SUB_BUCKETS), _MAX_EXP * _SUB_BUCKETS - 1)
+
+    @staticmethod
+    def _upper(index: int) -> float:
+        """目的：桶的上界（微秒），作为该桶的代表值，分位数因此偏保守"""
+        if index == 0:
+            return 1.0
+        exp, sub = divmod(index, _SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2.0 * _SUB_BUCKETS), exp)
+
+    def record(self, seconds: float) -> None:
+        """目的：记录一次耗时/延迟（秒）"""
+        negative = seconds < 0
+        if negative:
+            seconds = 0.0
+        idx = self._index(seconds * 1e6)
+        with self._lock:
+            self._counts[idx] += 1
+            self.count += 1
+            self.total += seconds
+            if negative:
+                self.negative += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """目的：返回第 q 分位（秒）；无样本返回 None"""
+        with self._lock:
+            return self._quantile_locked(q)
+
+    def _quantile_locked(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        target = max(1, math.ceil(q * self.count))
+        seen = 0
+        for idx, c in enumerate(self._counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    return min(self._upper(idx) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """目的：一次持锁读出 count/mean/max/p50/p99/p999（秒）；reset=True 时读完清零，便于按状态日志周期统计"""
+        with self._lock:
+            out: Dict[str, Any] = {
+                "count": self.count,
+                "negative": self.negative,
+                "mean": self.total / self.count if self.count else None,
+                "max": self.max if self.count else None,
+            }
+            for q in _QUANTILES:
+                out["p%s" % ("%g" % (q * 100)).replace(".", "")] = self._quantile_locked(q)
+            if reset:
+                self._counts = [0] * len(self._counts)
+                self.count = 0
+                self.negative = 0
+                self.total = 0.0
+                self.max = 0.0
+        return out
+
+
+class MetricsRegistry:
+    """
+    目的：按名字管理直方图，供接入层与主循环共享
+    方法：常用名字：feed_latency（单向延迟）、decode、apply、detect；observe_frame 一次记录一帧的延迟与解码/写入耗时
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hists: Dict[str, LatencyHistogram] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """目的：取或创建名为 name 的直方图"""
+        h = self._hists.get(name)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(name, LatencyHistogram())
+        return h
+
+    def observe_frame(
+        self, msgs: List[Dict[str, Any]], recv_wall: float, decode_sec: float, apply_sec: float,
+    ) -> None:
+        """
+        目的：记录一帧：单向延迟 = 接收墙钟 - 帧内最新的交易所时间戳（不带时间戳的帧不计延迟），以及解码、写入耗时
+        方法：帧内多条消息取最大时间戳，即离接收最近的一条，得到的是延迟的下界
+        """
+        ts: Optional[float] = None
+        for m in msgs:
+            t = _parse_exchange_ts(m.get("timestamp"))
+            if t is not None and (ts is None or t > ts):
+                ts = t
+        if ts is not None:
+            self.histogram("feed_latency").record(recv_wall - ts)
+        self.histogram("decode").record(decode_sec)
+        self.histogram("apply").record(apply_sec)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """目的：设置一个数值指标（当前值或累计计数），随 /metrics 输出"""
+        self._gauges[name] = float(value)
+
+    def gauges(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._gauges)
+
+    def observe_handoff(self, stats: HandoffStats, batch: int) -> None:
+        """
+        目的：记录一次接入 -> 检测交接：本批市场数（取走时的积压深度）、最早标记到取走的等待时间，以及累计合并次数
+        方法：等待时间进 handoff_wait 直方图；深度与累计计数写为 gauge
+        """
+        if stats.last_wait_sec is not None:
+            self.histogram("handoff_wait").record(stats.last_wait_sec)
+        self.set_gauge("handoff_depth", batch)
+        self.set_gauge("handoff_max_depth", stats.max_batch)
+        self.set_gauge("handoff_marked_total", stats.marked)
+        self.set_gauge("handoff_conflated_total", stats.conflated)
+        self.set_gauge("handoff_delivered_total", stats.delivered)
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = sorted(self._hists)
+        return {name: self._hists[name].snapshot(reset=reset) for name in names}
+
+    def format_status(self, snapshot: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """目的：状态日志用的一行摘要：每个直方图的 n/p50/p99/p999（毫秒）"""
+        snap = snapshot if snapshot is not None else self.snapshot()
+        parts = []
+        for name, s in snap.items():
+            if not s["count"]:
+                continue
+            parts.append("%s n=%d p50=%.2fms p99=%.2fms p999=%.2fms max=%.2fms" % (
+                name, s["count"], s["p50"] * 1e3, s["p99"] * 1e3, s["p999"] * 1e3, s["max"] * 1e3,
+            ))
+        return " | ".join(parts) if parts else "无样本"
+
+    def render_prometheus(self, prefix: str = "polyarb") -> str:
+        """目的：以 Prometheus 文本格式输出（summary 类型，单位秒），供外部抓取"""
+        lines: List[str] = []
+        for name, s in self.snapshot().items():
+            metric = "%s_%s_seconds" % (prefix, name)
+            lines.append("# TYPE %s summary" % metric)
+            for q in _QUANTILES:
+                key = "p%s" % ("%g" % (q * 100)).replace(".", "")
+                value = s[key]
+                lines.append('%s{quantile="%g"} %s' % (metric, q, "NaN" if value is None else repr(value)))
+            lines.append("%s_count %d" % (metric, s["count"]))
+            lines.append("%s_sum %r" % (metric, (s["mean"] or 0.0) * s["count"]))
+        for name, value in sorted(self.gauges().items()):
+            metric = "%s_%s" % (prefix, name)
+            lines.append("# TYPE %s gauge" % metric)
+            lines.append("%s %r" % (metric, value))
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    目的：在后台线程提供 GET /metrics（Prometheus 文本格式），不影响主循环
+    方法：标准库 ThreadingHTTPServer + daemon 线程；其他路径返回 404；port=0 时由系统分配端口（server.server_port）
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - BaseHTTPRequestHandler 约定的方法名
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
@@ -0,0 +1,476 @@
+# 目的：本地模拟 CLOB market channel 的 WebSocket 服务端，离线压测接入层（run_websocket_loop / AsyncMarketIngest 以 url= 指向它）
+# 方法：SyntheticFlow 按固定种子生成二元市场的订单簿与 book、price_change（新格式，带 best_bid/best_ask）、last_trade_price、
+#       tick_size_change 消息，可按突发曲线调节速率并周期性注入 YES+NO 卖价合计低于 1 的套利窗口；
+#       MockClobServer 用 websockets 提供服务：订阅后先推 book 快照再推增量，应答 PING，支持增量 subscribe/unsubscribe；
+#       也可把录制文件（src.capture）按原始帧间隔（可加速）回放给所有连接
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from src.capture import iter_frames
+
+logger = logging.getLogger(__name__)
+
+# 价格以「分」（tick=0.01）为整数单位维护，避免浮点误差导致 best_bid/best_ask 与客户端本地簿不一致
+_TICKS = 100
+
+
+def _fmt(ticks: int) -> str:
+    return "%.2f" % (ticks / _TICKS)
+
+
+@dataclass
+class BurstProfile:
+    """
+    目的：描述消息速率随时间的变化，模拟开赛、进球时的突发
+    方法：每 period_sec 秒中的前 duration_sec 秒速率乘以 multiplier；period_sec<=0 表示恒定速率
+    """
+    period_sec: float = 0.0
+    duration_sec: float = 0.0
+    multiplier: float = 1.0
+
+    def factor(self, t: float) -> float:
+        """目的：返回启动后第 t 秒的速率倍数"""
+        if self.period_sec <= 0 or self.duration_sec <= 0:
+            return 1.0
+        return self.multiplier if (t % self.period_sec) < self.duration_sec else 1.0
+
+
+def parse_profile(spec: str) -> BurstProfile:
+    """
+    目的：解析命令行的突发曲线描述
+    方法："steady" 为恒定速率；"burst:周期:持续:倍数"，如 "burst:10:2:10" 表示每 10 秒有 2 秒 10 倍速率
+    """
+    if not spec or spec == "steady":
+        return BurstProfile()
+    parts = spec.split(":")
+    if parts[0] != "burst" or len(parts) != 4:
+        raise ValueError("无法识别的突发曲线: %r（应为 steady 或 burst:周期:持续:倍数）" % spec)
+    return BurstProfile(float(parts[1]), float(parts[2]), float(parts[3]))
+
+
+class _Book:
+    """目的：单个 token 的模拟订单簿。方法：bids/asks 为 {价格tick: 数量}，best 随改动即时计算"""
+
+    __slots__ = ("asset_id", "market", "bids", "asks")
+
+    def __init__(self, asset_id: str, market: str) -> None:
+        self.asset_id = asset_id
+        self.market = market
+        self.bids: Dict[int, float] = {}
+        self.asks: Dict[int, float] = {}
+
+    def best_bid(self) -> int:
+        return max(self.bids) if self.bids else 0
+
+    def best_ask(self) -> int:
+        return min(self.asks) if self.asks else 0
+
+
+class SyntheticFlow:
+    """
+    目的：生成可复现的合成行情，供模拟服务端推送，也可直接用于单元测试
+    方法：每个市场一对 YES/NO 订单簿，由 YES 的买价 tick 决定：YES 卖价 = 买价 + spread，NO 簿为 YES 的镜像（合计略高于 1，无套利）；
+         套利窗口期间把 NO 簿整体下移，使 YES 卖价 + NO 卖价 = 1 - arb_edge；每次改档生成一条 price_change，
+         best_bid/best_ask 为该档应用后的最优价，与客户端按序应用后的本地簿一致，不会触发失步
+    """
+
+    def __init__(
+        self,
+        num_markets: int = 10,
+        markets: Optional[List[Dict[str, Any]]] = None,
+        depth: int = 5,
+        spread_ticks: int = 2,
+        seed: int = 0,
+        arb_every_sec: float = 0.0,
+        arb_duration_sec: float = 2.0,
+        arb_edge: float = 0.03,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.depth = max(1, int(depth))
+        self.spread_ticks = max(1, int(spread_ticks))
+        self.arb_every_sec = arb_every_sec
+        self.arb_duration_sec = arb_duration_sec
+        self.arb_edge_ticks = max(1, int(round(arb_edge * _TICKS)))
+        if markets is None:
+            markets = [
+                {
+                    "condition_id": "0xmock%04d" % i,
+                    "token_id_yes": "mock-%04d-yes" % i,
+                    "token_id_no": "mock-%04d-no" % i,
+                    "question": "Mock market %d" % i,
+                }
+                for i in range(num_markets)
+            ]
+        self.markets = [m for m in markets if m.get("token_id_yes") and m.get("token_id_no")]
+        self.books: Dict[str, _Book] = {}
+        # 市场序号 -> YES 买价 tick
+        self._yes_bid: List[int] = []
+        # 市场序号 -> 套利窗口结束时间（None 表示不在窗口内）
+        self._arb_until: Dict[int, float] = {}
+        self._next_arb_at = arb_every_sec if arb_every_sec > 0 else None
+        self.arb_windows_opened = 0
+        for i, m in enumerate(self.markets):
+            cid = str(m["condition_id"])
+            self.books[str(m["token_id_yes"])] = _Book(str(m["token_id_yes"]), cid)
+            self.books[str(m["token_id_no"])] = _Book(str(m["token_id_no"]), cid)
+            self._yes_bid.append(self.rng.randint(10, 90 - self.spread_ticks))
+            self._reshape(i, emit=False)
+
+    @property
+    def asset_ids(self) -> List[str]:
+        return list(self.books)
+
+    def _targets(self, index: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """目的：市场 index 的目标最优价 ((yes_bid, yes_ask), (no_bid, no_ask))，单位 tick"""
+        yb = self._yes_bid[index]
+        ya = yb + self.spread_ticks
+        if index in self._arb_until:
+            na = max(1 + self.spread_ticks, _TICKS - ya - self.arb_edge_ticks)
+            nb = na - self.spread_ticks
+        else:
+            nb, na = _TICKS - ya, _TICKS - yb
+        return (yb, ya), (nb, na)
+
+    def _set_level(self, book: _Book, side: str, price: int, size: float, changes: List[Dict[str, Any]]) -> None:
+        levels = book.bids if side == "BUY" else book.asks
+        if size > 0:
+            levels[price] = size
+        elif price in levels:
+            del levels[price]
+        else:
+            return
+        changes.append({
+            "asset_id": book.asset_id,
+            "price": _fmt(price),
+            "size": "%g" % size,
+            "side": side,
+            "hash": "",
+            "best_bid": _fmt(book.best_bid()),
+            "best_ask": _fmt(book.best_ask()),
+        })
+
+    def _reshape_book(self, book: _Book, bid: int, ask: int, changes: List[Dict[str, Any]]) -> None:
+        """目的：把 book 调整为以 (bid, ask) 为最优价、各 depth 档的形状。方法：先删越界档再补新档，途中不出现交叉"""
+        want_bids = {p for p in range(bid, bid - self.depth, -1) if p >= 1}
+        want_asks = {p for p in range(ask, ask + self.depth) if p <= _TICKS - 1}
+        for p in sorted(p for p in book.bids if p not in want_bids):
+            self._set_level(book, "BUY", p, 0, changes)
+        for p in sorted(p for p in book.asks if p not in want_asks):
+            self._set_level(book, "SELL", p, 0, changes)
+        for p in sorted(want_bids - set(book.bids)):
+            self._set_level(book, "BUY", p, float(self.rng.randint(10, 500)), changes)
+        for p in sorted(want_asks - set(book.asks)):
+            self._set_level(book, "SELL", p, float(self.rng.randint(10, 500)), changes)
+
+    def _reshape(self, index: int, emit: bool = True) -> List[Dict[str, Any]]:
+        m = self.markets[index]
+        (yb, ya), (nb, na) = self._targets(index)
+        changes: List[Dict[str, Any]] = []
+        self._reshape_book(self.books[str(m["token_id_yes"])], yb, ya, changes)
+        self._reshape_book(self.books[str(m["token_id_no"])], nb, na, changes)
+        if not emit or not changes:
+            return []
+        return [self._price_change(str(m["condition_id"]), changes)]
+
+    @staticmethod
+    def _price_change(market: str, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "event_type": "price_change",
+            "market": market,
+            "price_changes": changes,
+            "timestamp": str(int(time.time() * 1000)),
+        }
+
+    def snapshot(self, asset_id: str) -> Optional[Dict[str, Any]]:
+        """目的：生成 asset 的 book 全量快照消息；未知 asset 返回 None"""
+        book = self.books.get(asset_id)
+        if book is None:
+            return None
+        return {
+            "event_type": "book",
+            "asset_id": book.asset_id,
+            "market": book.market,
+            "bids": [{"price": _fmt(p), "size": "%g" % book.bids[p]} for p in sorted(book.bids)],
+            "asks": [{"price": _fmt(p), "size": "%g" % book.asks[p]} for p in sorted(book.asks, reverse=True)],
+            "timestamp": str(int(time.time() * 1000)),
+            "hash": "",
+        }
+
+    def _random_event(self) -> Dict[str, Any]:
+        """
+        目的：生成一条随机增量
+        方法：约 75% 改一档数量（可能删档再补回）、10% 中间价移动一个 tick、14% 成交价、1% tick_size_change（仅通知，不改簿）
+        """
+        rng = self.rng
+        index = rng.randrange(len(self.markets))
+        m = self.markets[index]
+        roll = rng.random()
+        if roll < 0.10:
+            step = rng.choice((-1, 1))
+            lo, hi = 2, _TICKS - 2 - self.spread_ticks
+            self._yes_bid[index] = min(hi, max(lo, self._yes_bid[index] + step))
+            msgs = self._reshape(index)
+            if msgs:
+                return msgs[0]
+            roll = 0.5
+        token = str(m["token_id_yes"] if rng.random() < 0.5 else m["token_id_no"])
+        book = self.books[token]
+        if roll < 0.85:
+            side = rng.choice(("BUY", "SELL"))
+            levels = book.bids if side == "BUY" else book.asks
+            changes: List[Dict[str, Any]] = []
+            price = rng.choice(sorted(levels))
+            # 非最优档偶尔删除后立即补回，覆盖 size=0 的删除路径
+            best = book.best_bid() if side == "BUY" else book.best_ask()
+            if price != best and rng.random() < 0.2:
+                self._set_level(book, side, price, 0, changes)
+            self._set_level(book, side, price, float(rng.randint(1, 500)), changes)
+            return self._price_change(book.market, changes)
+        if roll < 0.99:
+            return {
+                "event_type": "last_trade_price",
+                "asset_id": token,
+                "market": book.market,
+                "price": _fmt(book.best_ask() if rng.random() < 0.5 else book.best_bid()),
+                "size": "%g" % rng.randint(1, 100),
+                "side": rng.choice(("BUY", "SELL")),
+                "fee_rate_bps": "0",
+                "timestamp": str(int(time.time() * 1000)),
+            }
+        return {
+            "event_type": "tick_size_change",
+            "asset_id": token,
+            "market": book.market,
+            "old_tick_size": "0.01",
+            "new_tick_size": "0.01",
+            "timestamp": str(int(time.time() * 1000)),
+        }
+
+    def _arb_transitions(self, now: float) -> List[Dict[str, Any]]:
+        """目的：按时间开启/关闭套利窗口。方法：到期的窗口恢复镜像簿；到 _next_arb_at 时随机选一个市场开启窗口"""
+        msgs: List[Dict[str, Any]] = []
+        for index in [i for i, until in self._arb_until.items() if until <= now]:
+            del self._arb_until[index]
+            msgs.extend(self._reshape(index))
+        if self._next_arb_at is not None and now >= self._next_arb_at and self.markets:
+            self._next_arb_at = now + self.arb_every_sec
+            index = self.rng.randrange(len(self.markets))
+            if index not in self._arb_until:
+                self._arb_until[index] = now + self.arb_duration_sec
+                self.arb_windows_opened += 1
+                msgs.extend(self._reshape(index))
+        return msgs
+
+    def step(self, now: float, count: int) -> List[Dict[str, Any]]:
+        """
+        目的：推进到启动后第 now 秒并生成 count 条随机增量（另加套利窗口开关产生的消息）
+        返回：按生成顺序的消息列表
+        """
+        if not self.markets:
+            return []
+        msgs = self._arb_transitions(now)
+        for _ in range(count):
+            msgs.append(self._random_event())
+        return msgs
+
+    def arb_markets(self) -> List[str]:
+        """目的：当前处于套利窗口的 condition_id，供测试与日志核对"""
+        return [str(self.markets[i]["condition_id"]) for i in sorted(self._arb_until)]
+
+
+def message_asset_ids(msg: Dict[str, Any]) -> Set[str]:
+    """目的：消息涉及的 asset_id 集合，用于按连接的订阅过滤。方法：顶层 asset_id 加上 price_changes 各项的 asset_id"""
+    ids = set()
+    if msg.get("asset_id"):
+        ids.add(str(msg["asset_id"]))
+    for ch in msg.get("price_changes") or ():
+        if isinstance(ch, dict) and ch.get("asset_id"):
+            ids.add(str(ch["asset_id"]))
+    return ids
+
+
+def iter_replay(paths: Union[str, List[str]], speed: float = 1.0) -> Iterator[Tuple[float, bytes]]:
+    """
+    目的：按录制时的帧间隔读出回放序列
+    方法：相邻帧 recv_ns 之差除以 speed 作为发送前等待秒数；speed<=0 表示不等待（尽快发送）
+    返回：(等待秒数, 原始帧) 迭代器
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    prev: Optional[int] = None
+    for path in paths:
+        for recv_ns, raw in iter_frames(path):
+            wait = 0.0
+            if prev is not None and speed > 0:
+                wait = max(0.0, (recv_ns - prev) / 1e9 / speed)
+            prev = recv_ns
+            yield wait, raw
+
+
+class _Client:
+    __slots__ = ("ws", "assets", "queue")
+
+    def __init__(self, ws: Any) -> None:
+        self.ws = ws
+        self.assets: Set[str] = set()
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+
+
+class MockClobServer:
+    """
+    目的：本地 WebSocket 服务端，协议与 CLOB market channel 一致（订阅帧、增量订阅帧、PING/PONG、list 或 dict 消息帧）
+    方法：合成模式下后台协程按 rate * profile.factor(t) 每 tick_sec 生成一批消息，按各连接的订阅过滤后入队；
+         回放模式下首个连接订阅后开始按录制间隔广播原始帧（不过滤）；每个连接一个发送协程，慢连接只积压自己的队列
+    """
+
+    def __init__(
+        self,
+        flow: Optional[SyntheticFlow] = None,
+        replay_paths: Optional[Union[str, List[str]]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate: float = 100.0,
+        profile: Optional[BurstProfile] = None,
+        speed: float = 1.0,
+        loop_replay: bool = False,
+        batch: bool = False,
+        tick_sec: float = 0.01,
+    ) -> None:
+        if flow is None and not replay_paths:
+            flow = SyntheticFlow()
+        self.flow = flow
+        self.replay_paths = replay_paths
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.profile = profile or BurstProfile()
+        self.speed = speed
+        self.loop_replay = loop_replay
+        self.batch = batch
+        self.tick_sec = tick_sec
+        self.messages_sent = 0
+        self.frames_sent = 0
+        self._clients: List[_Client] = []
+        self._server: Any = None
+        self._producer: Optional["asyncio.Task[None]"] = None
+        self._subscribed = asyncio.Event()
+
+    @property
+    def url(self) -> str:
+        return "ws://%s:%d" % (self.host, self.port)
+
+    async def start(self) -> str:
+        """目的：开始监听并启动生成/回放协程。返回：服务端 url（port=0 时为系统分配的端口）"""
+        import websockets
+
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=None, ping_interval=None)
+        self.port = list(self._server.sockets)[0].getsockname()[1]
+        produce = self._replay_loop() if self.replay_paths else self._synthetic_loop()
+        self._producer = asyncio.ensure_future(produce)
+        logger.info("模拟 CLOB 服务端已启动: %s", self.url)
+        return self.url
+
+    async def stop(self) -> None:
+        if self._producer is not None:
+            self._producer.cancel()
+            try:
+                await self._producer
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, ws: Any, *args: Any) -> None:
+        """目的：单个连接：收订阅/PING，另起协程发送队列中的帧"""
+        client = _Client(ws)
+        self._clients.append(client)
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            async for raw in ws:
+                if raw == "PING":
+                    await client.queue.put("PONG")
+                    continue
+                try:
+                    req = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(req, dict):
+                    self._on_request(client, req)
+        except Exception as e:
+            logger.debug("模拟服务端连接结束: %s", e)
+        finally:
+            sender.cancel()
+            self._clients.remove(client)
+
+    def _on_request(self, client: _Client, req: Dict[str, Any]) -> None:
+        """目的：处理订阅（type=MARKET）与增量 subscribe/unsubscribe；新订阅的 asset 先推 book 快照"""
+        ids = [str(a) for a in req.get("assets_ids") or []]
+        if req.get("operation") == "unsubscribe":
+            client.assets.difference_update(ids)
+            return
+        new = [a for a in ids if a not in client.assets]
+        client.assets.update(ids)
+        self._subscribed.set()
+        if self.flow is not None:
+            books = [b for b in (self.flow.snapshot(a) for a in new) if b is not None]
+            if books:
+                client.queue.put_nowait(json.dumps(books))
+
+    async def _send_loop(self, client: _Client) -> None:
+        while True:
+            frame = await client.queue.get()
+            await client.ws.send(frame)
+            self.frames_sent += 1
+
+    def _dispatch(self, msgs: List[Dict[str, Any]]) -> None:
+        """目的：按订阅把一批消息分发到各连接队列。方法：batch=True 时每个连接每批一帧（list），否则每条消息一帧"""
+        for client in self._clients:
+            if not client.assets:
+                continue
+            mine = [m for m in msgs if message_asset_ids(m) & client.assets]
+            if not mine:
+                continue
+            self.messages_sent += len(mine)
+            if self.batch:
+                client.queue.put_nowait(json.dumps(mine))
+            else:
+                for m in mine:
+                    client.queue.put_nowait(json.dumps(m))
+
+    async def _synthetic_loop(self) -> None:
+        """目的：按速率曲线生成合成消息。方法：每 tick 累积 rate*factor*dt 条额度，取整数部分生成，余数留到下一 tick"""
+        loop = asyncio.get_running_loop()
+        start = last = loop.time()
+        budget = 0.0
+        while True:
+            await asyncio.sleep(self.tick_sec)
+            now = loop.time()
+            budget += self.rate * self.profile.factor(now - start) * (now - last)
+            last = now
+            count = int(budget)
+            budget -= count
+            msgs = self.flow.step(now - start, count)
+            if msgs:
+                self._dispatch(msgs)
+
+    async def _replay_loop(self) -> None:
+        """目的：首个订阅到达后按录制间隔向所有已订阅连接广播原始帧；loop_replay 时循环播放"""
+        await self._subscribed.wait()
+        while True:
+            for wait, raw in iter_replay(self.replay_paths, self.speed):
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                frame = raw.decode("utf-8", errors="replace")
+                for client in self._clients:
+                    if client.assets:
+                        client.queue.put_nowait(frame)
+                        self.messages_sent += 1
+            if not self.loop_replay:
+                return
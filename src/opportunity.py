@@ -0,0 +1,169 @@
+# 目的：套利机会生命周期跟踪：同一机会持续存在时不每轮重复下单与推送
+# 方法：按 (策略, key) 记录 open / update / close 三种转换，保存首次/最近出现时间与峰值边际利润；
+#       命中时只有新开、距上次执行超过 cooldown_sec、或每份利润较上次执行变化超过 min_edge_change 才放行执行；
+#       放行只是候选，下单成功后由调用方 mark_acted 记录执行，失败的执行不开始冷却、下一轮仍可重试；
+#       消失后在 debounce_sec 内再次出现视为同一机会（报价抖动不重开、不重复推送），超过后才结束并写入历史
+
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class Opportunity:
+    """
+    目的：一次持续的套利机会
+    方法：edge 为每份利润（expected_profit / size）；acted_at/acted_edge 为最近一次成功执行（mark_acted）时的时间与利润；
+         closed_at 非空表示已消失、处于 debounce 窗口内，窗口内再次命中则清空继续
+    """
+    strategy: str
+    key: str
+    opened_at: float
+    last_seen: float
+    edge: float
+    peak_edge: float
+    acted_at: Optional[float] = None
+    acted_edge: Optional[float] = None
+    updates: int = 0
+    actions: int = 0
+    closed_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        """目的：机会持续秒数；未结束时算到最近一次出现"""
+        return (self.closed_at if self.closed_at is not None else self.last_seen) - self.opened_at
+
+
+@dataclass
+class OpportunityStats:
+    """目的：跟踪器概览，供状态日志。方法：durations 取自最近 history_size 条已结束机会"""
+    open: int = 0
+    opened: int = 0
+    closed: int = 0
+    actions: int = 0
+    suppressed: int = 0
+    median_duration_sec: Optional[float] = None
+    max_duration_sec: Optional[float] = None
+
+
+class OpportunityTracker:
+    """
+    目的：在检测与执行之间去重：持续存在的机会只在开启、冷却期满或利润明显变化时再次执行
+    方法：update(strategy, evaluated, hits) 每轮调用一次，evaluated 为本轮实际评估过的 key（未评估的机会保持原状，
+         适配事件驱动只评估脏市场），hits 为命中的 key -> 每份利润；返回本轮可执行的候选 key，实际下单成功后再调用
+         mark_acted 开始冷却。非线程安全，由主循环单线程调用
+    """
+
+    def __init__(
+        self,
+        cooldown_sec: float = 30.0,
+        min_edge_change: float = 0.005,
+        debounce_sec: float = 5.0,
+        history_size: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.cooldown_sec = cooldown_sec
+        self.min_edge_change = min_edge_change
+        self.debounce_sec = debounce_sec
+        self._clock = clock
+        self._open: Dict[Tuple[str, str], Opportunity] = {}
+        self.history: Deque[Opportunity] = deque(maxlen=max(1, int(history_size)))
+        self.opened = 0
+        self.closed = 0
+        self.actions = 0
+        self.suppressed = 0
+
+    def get(self, strategy: str, key: str) -> Optional[Opportunity]:
+        return self._open.get((strategy, key))
+
+    def open_opportunities(self) -> List[Opportunity]:
+        """目的：当前未结束的机会（含 debounce 窗口内的）"""
+        return list(self._open.values())
+
+    def _should_act(self, opp: Opportunity, now: float) -> bool:
+        if opp.acted_at is None or now - opp.acted_at >= self.cooldown_sec:
+            return True
+        return opp.acted_edge is not None and abs(opp.edge - opp.acted_edge) >= self.min_edge_change
+
+    def _finish(self, k: Tuple[str, str]) -> None:
+        opp = self._open.pop(k)
+        self.history.append(opp)
+        self.closed += 1
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """目的：把 debounce 窗口已过的消失机会结束并写入历史。返回：本次结束的数量"""
+        now = self._clock() if now is None else now
+        done = [k for k, o in self._open.items() if o.closed_at is not None and now - o.closed_at >= self.debounce_sec]
+        for k in done:
+            self._finish(k)
+        return len(done)
+
+    def update(
+        self,
+        strategy: str,
+        evaluated: Iterable[str],
+        hits: Dict[str, float],
+        now: Optional[float] = None,
+    ) -> List[str]:
+        """
+        目的：记录一轮检测结果并决定哪些命中可以执行；只做决定，不记录执行
+        方法：hits 中的 key：无记录则 open（可执行）；有记录则 update（debounce 窗口内的重新出现也算 update），
+             从未成功执行、冷却期满或利润变化才可执行；evaluated 中未命中的已开机会标记 closed_at，debounce 后由 expire 结束
+        返回：候选 key 列表（顺序同 hits）
+        """
+        now = self._clock() if now is None else now
+        self.expire(now)
+        act: List[str] = []
+        for key, edge in hits.items():
+            k = (strategy, key)
+            opp = self._open.get(k)
+            if opp is None:
+                opp = Opportunity(strategy, key, opened_at=now, last_seen=now, edge=edge, peak_edge=edge)
+                self._open[k] = opp
+                self.opened += 1
+            else:
+                opp.closed_at = None
+                opp.last_seen = now
+                opp.edge = edge
+                opp.peak_edge = max(opp.peak_edge, edge)
+                opp.updates += 1
+            if self._should_act(opp, now):
+                act.append(key)
+            else:
+                self.suppressed += 1
+        for key in evaluated:
+            opp = self._open.get((strategy, key))
+            if opp is not None and key not in hits and opp.closed_at is None:
+                opp.closed_at = now
+                if self.debounce_sec <= 0:
+                    self._finish((strategy, key))
+        return act
+
+    def mark_acted(self, strategy: str, key: str, edge: float, now: Optional[float] = None) -> bool:
+        """
+        目的：记录一次成功执行，从此刻开始冷却、并以 edge 作为后续利润变化的比较基准
+        方法：只对仍在跟踪的机会生效（update 之后、同一轮内调用）
+        返回：是否找到该机会并记录
+        """
+        opp = self._open.get((strategy, key))
+        if opp is None:
+            return False
+        opp.acted_at = self._clock() if now is None else now
+        opp.acted_edge = edge
+        opp.actions += 1
+        self.actions += 1
+        return True
+
+    def get_stats(self) -> OpportunityStats:
+        durations = [o.duration for o in self.history]
+        return OpportunityStats(
+            open=sum(1 for o in self._open.values() if o.closed_at is None),
+            opened=self.opened,
+            closed=self.closed,
+            actions=self.actions,
+            suppressed=self.suppressed,
+            median_duration_sec=statistics.median(durations) if durations else None,
+            max_duration_sec=max(durations) if durations else None,
+        )
@@ -1,14 +1,44 @@
 # 目的：为套利与波动策略提供实时买卖价（best bid/ask）
-# 方法：连接 CLOB WebSocket market channel，订阅 asset_ids，按 book/price_change 消息更新内存中的订单簿快照
+# 方法：连接 CLOB WebSocket market channel，订阅 asset_ids，book 消息全量替换、price_change 逐档增量，维护内存中的 L2 订单簿
 
+import hashlib
 import json
+import statistics
 import threading
-from typing import Any, Callable, Dict, List, Optional, Union
+import time
+import zlib
+from bisect import bisect_left, insort
+from dataclasses import dataclass, replace
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# 可选加速：安装 orjson 时用其解码 WebSocket 帧，否则退回标准库 json
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
 # CLOB WebSocket 市场通道地址，用于订阅订单簿与价格
 WSS_MARKET_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
 
 
+def decode_frame(raw: Union[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    目的：把一帧 WebSocket 原文解码为消息列表，供 apply_batch 一次性写入
+    方法：优先 orjson.loads，未安装时用 json.loads；dict 包成单元素列表，list 只保留 dict 元素；
+         非 JSON（如 "PONG"）或其他类型返回空列表
+    """
+    try:
+        decoded = _orjson.loads(raw) if _orjson is not None else json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    if isinstance(decoded, dict):
+        return [decoded]
+    if isinstance(decoded, list):
+        return [m for m in decoded if isinstance(m, dict)]
+    return []
+
+
 def _parse_price(value: Any) -> Optional[float]:
     """目的：将 API 返回的价格转为 float，便于套利计算。方法：支持数字或字符串"""
     if value is None:
@@ -19,84 +49,874 @@ def _parse_price(value: Any) -> Optional[float]:
         return None
 
 
-class OrderBookStore:
+def _parse_exchange_ts(value: Any) -> Optional[float]:
+    """
+    目的：解析消息中的交易所时间戳（CLOB 为毫秒字符串，如 "1757908892351"），统一为秒
+    方法：大于 1e11 视为毫秒并除以 1000；缺失或非法返回 None
+    """
+    ts = _parse_price(value)
+    if ts is None or ts <= 0:
+        return None
+    return ts / 1000.0 if ts > 1e11 else ts
+
+
+def compute_book_hash(msg: Dict[str, Any]) -> str:
+    """
+    目的：计算 book 快照的内容哈希，与消息自带的 hash 比对以发现损坏/不一致的快照
+    方法：按 CLOB 客户端 orderbook summary 哈希的做法：market、asset_id、timestamp、hash 置空、bids、asks（每档 price/size 字符串）
+         组成紧凑 JSON 后取 sha1 十六进制；服务端算法若有变化会导致误报，因此由配置 verify_book_hash 显式开启
+    """
+    def _levels(levels: Any) -> List[Dict[str, str]]:
+        out: List[Dict[str, str]] = []
+        for lv in levels or []:
+            if isinstance(lv, dict):
+                out.append({"price": str(lv.get("price")), "size": str(lv.get("size"))})
+            elif isinstance(lv, (list, tuple)) and len(lv) >= 2:
+                out.append({"price": str(lv[0]), "size": str(lv[1])})
+        return out
+
+    summary = {
+        "market": msg.get("market", ""),
+        "asset_id": msg.get("asset_id") or msg.get("assetId") or "",
+        "timestamp": str(msg.get("timestamp", "")),
+        "hash": "",
+        "bids": _levels(msg.get("bids")),
+        "asks": _levels(msg.get("asks")),
+    }
+    return hashlib.sha1(json.dumps(summary, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _parse_level(level: Any) -> Optional[Tuple[float, float]]:
+    """目的：把 book 消息中的单档（[price, size] 或 {"price", "size"}）转为 (price, size)。方法：缺 size 视为 0"""
+    if isinstance(level, (list, tuple)) and len(level) >= 1:
+        price = _parse_price(level[0])
+        size = _parse_price(level[1]) if len(level) >= 2 else None
+    elif isinstance(level, dict):
+        price = _parse_price(level.get("price"))
+        size = _parse_price(level.get("size"))
+    else:
+        return None
+    if price is None:
+        return None
+    return price, (size if size is not None else 0.0)
+
+
+class BookSide:
+    """
+    目的：维护订单簿单边（bids 或 asks）的全部价位与数量，支持快照替换与逐档增量
+    方法：价格升序 list + price->size dict；best 取 list 首/尾为 O(1)，覆盖已有价位只改 dict 为 O(1)；
+         新增/删除价位用 bisect 定位 O(log n)，但 list 插入/删除需移动元素，整体为 O(n)。
+         Polymarket 价格在 tick 网格上（每边至多约 1000 档），移动是一次 memmove，常数远小于平衡树或堆 + 惰性删除
+    """
+
+    __slots__ = ("is_bid", "_prices", "_sizes")
+
+    def __init__(self, is_bid: bool) -> None:
+        self.is_bid = is_bid
+        self._prices: List[float] = []
+        self._sizes: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def best(self) -> Optional[float]:
+        """目的：返回最优价。方法：bids 取最高价（尾部），asks 取最低价（首部）"""
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.is_bid else self._prices[0]
+
+    def best_size(self) -> Optional[float]:
+        """目的：返回最优价位上的挂单数量"""
+        best = self.best()
+        return None if best is None else self._sizes[best]
+
+    def set_level(self, price: float, size: float) -> bool:
+        """
+        目的：应用 price_change 的单档增量
+        方法：size<=0 删除该价位，否则新增或覆盖；返回该价位在更新前是否存在（供上层判断增量是否与本地簿一致）
+        """
+        existed = price in self._sizes
+        if size <= 0:
+            if existed:
+                del self._sizes[price]
+                del self._prices[bisect_left(self._prices, price)]
+            return existed
+        if not existed:
+            insort(self._prices, price)
+        self._sizes[price] = size
+        return existed
+
+    def replace(self, levels: List[Tuple[float, float]]) -> None:
+        """目的：应用 book 全量快照。方法：清空后按价格排序重建；同价位以后出现者为准"""
+        self._sizes = {price: size for price, size in levels}
+        self._prices = sorted(self._sizes)
+
+    def clear(self) -> None:
+        self._prices = []
+        self._sizes = {}
+
+    def iter_levels(self) -> Iterator[Tuple[float, float]]:
+        """目的：从最优档开始逐档产出 (price, size)，供深度遍历时不复制整边。方法：bids 逆序遍历，asks 顺序遍历"""
+        sizes = self._sizes
+        for price in (reversed(self._prices) if self.is_bid else self._prices):
+            yield price, sizes[price]
+
+    def levels(self, depth: Optional[int] = None) -> List[Tuple[float, float]]:
+        """目的：按从优到劣顺序返回前 depth 档 (price, size)"""
+        if depth is None:
+            return list(self.iter_levels())
+        return list(islice(self.iter_levels(), depth))
+
+
+@dataclass
+class FillEstimate:
+    """
+    目的：按订单簿深度估算一笔吃单的真实成本，代替只看最优价
+    方法：filled 为可成交数量，cost 为成交金额（sum price*size），worst_price 为吃到的最差一档，levels 为吃到的档数；
+         requested 为请求数量（None 表示不限量，仅受限价约束）
+    """
+    requested: Optional[float]
+    filled: float = 0.0
+    cost: float = 0.0
+    worst_price: Optional[float] = None
+    levels: int = 0
+
+    @property
+    def vwap(self) -> Optional[float]:
+        """目的：成交量加权均价；无成交为 None"""
+        return self.cost / self.filled if self.filled > 0 else None
+
+    @property
+    def complete(self) -> bool:
+        """目的：请求数量是否能全部成交（不限量时恒为 True）"""
+        return self.requested is None or self.filled >= self.requested - 1e-9
+
+
+def _side_is_buy(side: str) -> bool:
+    """目的：吃单方向：BUY 吃 asks，SELL 吃 bids。方法：大小写不敏感，其他取值抛 ValueError"""
+    s = str(side or "").upper()
+    if s == "BUY":
+        return True
+    if s == "SELL":
+        return False
+    raise ValueError("side 应为 BUY 或 SELL: %r" % (side,))
+
+
+def walk_levels(
+    levels: Iterable[Tuple[float, float]],
+    size: Optional[float] = None,
+    limit_price: Optional[float] = None,
+    is_buy: bool = True,
+) -> FillEstimate:
+    """
+    目的：从最优档开始逐档吃单，直到数量用完或价格越过限价（买入不高于、卖出不低于）
+    方法：levels 按从优到劣排序；size 与 limit_price 都为 None 时吃完整边
+    """
+    est = FillEstimate(requested=size)
+    for price, avail in levels:
+        if size is not None and est.filled >= size - 1e-12:
+            break
+        if limit_price is not None and (price > limit_price + 1e-12 if is_buy else price < limit_price - 1e-12):
+            break
+        take = avail if size is None else min(avail, size - est.filled)
+        if take <= 0:
+            continue
+        est.filled += take
+        est.cost += take * price
+        est.worst_price = price
+        est.levels += 1
+    return est
+
+
+class L2Book:
+    """
+    目的：单个 asset 的完整 L2 订单簿（bids + asks）
+    方法：两个 BookSide；side 参数兼容 CLOB 的 BUY/SELL 与 bid/ask 写法
+    """
+
+    __slots__ = ("bids", "asks")
+
+    def __init__(self) -> None:
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+
+    def side(self, side: str) -> Optional[BookSide]:
+        """目的：把消息中的 side 映射到对应一边。方法：BUY/BID -> bids，SELL/ASK -> asks，其他返回 None"""
+        s = str(side or "").upper()
+        if s in ("BUY", "BID", "BIDS"):
+            return self.bids
+        if s in ("SELL", "ASK", "ASKS"):
+            return self.asks
+        return None
+
+
+# price_change 中可映射到订单簿一边的 side 取值，同 L2Book.side
+_LEVEL_SIDES = frozenset(("BUY", "BID", "BIDS", "SELL", "ASK", "ASKS"))
+
+
+def _is_level_change(change: Dict[str, Any]) -> bool:
+    """目的：判断一条增量是否真的会改某一档（side 可识别且 price 可解析）；不改簿的条目不递增序号、不标脏"""
+    return str(change.get("side") or "").upper() in _LEVEL_SIDES and _parse_price(change.get("price")) is not None
+
+
+@dataclass
+class MarketSnapshot:
     """
-    目的：维护每个 asset_id（token_id）的 best bid/ask，供套利与波动策略读取
-    方法：线程安全 dict，key=asset_id，value={"bid": float, "ask": float}；由 WebSocket 消息更新
+    目的：同一市场 YES/NO 两腿在同一时刻的报价，避免两次分别取锁读到从未同时存在的报价（撕裂报价）
+    方法：由 OrderBookStore.get_market_snapshot 在一次持锁内生成；seq_* 为读取时两腿各自的更新序号，
+         下单前可用 is_pair_current 校验两腿自快照后是否有更新
     """
+    token_id_yes: str
+    token_id_no: str
+    bid_yes: Optional[float]
+    ask_yes: Optional[float]
+    bid_no: Optional[float]
+    ask_no: Optional[float]
+    seq_yes: int = 0
+    seq_no: int = 0
+    # 两腿距上次更新的秒数（单调时钟）；从未更新为 None
+    age_yes: Optional[float] = None
+    age_no: Optional[float] = None
+    # 两腿订单簿均未被标记为失步（断线窗口、增量缺档、哈希不符）；失步的腿需等新的全量快照后才恢复
+    valid: bool = True
+    # get_market_snapshot(with_depth=True) 时为两腿的 {"bids": [...], "asks": [...]}（同 get_depth），与上面的报价同一次持锁读取
+    depth_yes: Optional[Dict[str, List[Tuple[float, float]]]] = None
+    depth_no: Optional[Dict[str, List[Tuple[float, float]]]] = None
+
+    def max_age(self) -> Optional[float]:
+        """目的：两腿中较旧一腿的报价年龄；任一腿未知时返回 None"""
+        if self.age_yes is None or self.age_no is None:
+            return None
+        return max(self.age_yes, self.age_no)
+
+
+def _book_depth(book: Optional["L2Book"]) -> Dict[str, List[Tuple[float, float]]]:
+    """目的：复制一本簿的全部档位，格式同 get_depth。注意：调用方需持有 store 的锁"""
+    if book is None:
+        return {"bids": [], "asks": []}
+    return {"bids": book.bids.levels(), "asks": book.asks.levels()}
+
+
+@dataclass
+class QuoteFreshness:
+    """
+    目的：全 store 的报价新鲜度概览，供状态日志发现「某些 token 很久没有更新」（如接入线程已停止）
+    方法：ages 取自各 asset 最近一次更新的单调时间；stale_count 为超过 max_age_sec 的 asset 数（未给阈值时为 0）
+    """
+    asset_count: int = 0
+    oldest_age_sec: Optional[float] = None
+    median_age_sec: Optional[float] = None
+    oldest_asset_id: Optional[str] = None
+    stale_count: int = 0
+
+
+@dataclass
+class HandoffStats:
+    """
+    目的：接入 -> 检测交接的累计统计，供状态日志与 /metrics 判断检测是否跟不上行情
+    方法：marked 为脏标记总次数；conflated 为落在已有待处理标记上的次数（被合并的中间状态）；delivered/batches 为交给检测的
+         市场数与批数；wait 为一批中最早的标记到被取走的秒数，即检测看到最新状态的最长滞后
+    """
+    pending: int = 0
+    marked: int = 0
+    conflated: int = 0
+    delivered: int = 0
+    batches: int = 0
+    max_batch: int = 0
+    last_wait_sec: Optional[float] = None
+    max_wait_sec: float = 0.0
+
+
+class ConflatingHandoff:
+    """
+    目的：接入线程与检测线程之间的合并式交接：每个市场最多一个待处理标记，检测落后时只处理各市场的最新状态，积压有上界（监控市场数）
+    方法：pending 为 condition_id -> 自上次取走以来的合并更新数（dict 保持插入顺序）；标记已存在时只累加计数；
+         drain 一次取走全部并更新 HandoffStats。本类不加锁，由所属 store 在自己的锁内调用
+    """
+
+    __slots__ = ("pending", "stats", "_since")
 
     def __init__(self) -> None:
+        self.pending: Dict[str, int] = {}
+        self.stats = HandoffStats()
+        self._since: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def mark(self, cid: str, now: float) -> None:
+        n = self.pending.get(cid)
+        if n is None:
+            if not self.pending:
+                self._since = now
+            self.pending[cid] = 1
+        else:
+            self.pending[cid] = n + 1
+            self.stats.conflated += 1
+        self.stats.marked += 1
+
+    def retain(self, live: Any) -> None:
+        """目的：市场刷新后丢弃不再监控的市场的待处理标记"""
+        self.pending = {cid: n for cid, n in self.pending.items() if cid in live}
+        if not self.pending:
+            self._since = None
+
+    def drain(self, now: float) -> List[str]:
+        """目的：取走全部待处理市场（按首次标记顺序）并记录批大小与等待时间"""
+        if not self.pending:
+            return []
+        out = list(self.pending)
+        st = self.stats
+        st.delivered += len(out)
+        st.batches += 1
+        st.max_batch = max(st.max_batch, len(out))
+        if self._since is not None:
+            st.last_wait_sec = max(0.0, now - self._since)
+            st.max_wait_sec = max(st.max_wait_sec, st.last_wait_sec)
+        self.pending = {}
+        self._since = None
+        return out
+
+    def snapshot(self) -> HandoffStats:
+        """目的：复制一份统计（pending 为当前待处理市场数）"""
+        return replace(self.stats, pending=len(self.pending))
+
+
+class OrderBookStore:
+    """
+    目的：维护每个 asset_id（token_id）的完整 L2 订单簿，供套利与波动策略读取 best bid/ask 与深度
+    方法：线程安全 dict，key=asset_id，value=L2Book；book 消息全量替换，price_change 逐档增量，
+         旧格式的平铺 bid/ask 字段视为仅含一档的快照；每个 asset 记录最近更新的单调时间（clock，可注入模拟时钟）
+         与消息中的交易所时间戳
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, verify_hash: bool = False) -> None:
+        self._clock = clock
+        self.verify_hash = verify_hash
         self._lock = threading.Lock()
-        # asset_id -> {"bid": best_bid, "ask": best_ask}
-        self._books: Dict[str, Dict[str, Optional[float]]] = {}
+        # 目的：检测阶段等待「有市场变脏」；与 _lock 共用同一把锁，写入与通知原子
+        self._dirty_cond = threading.Condition(self._lock)
+        # asset_id -> L2Book
+        self._books: Dict[str, L2Book] = {}
+        # 反向索引 token_id -> condition_id 列表，由 set_markets 建立
+        self._markets_by_token: Dict[str, List[str]] = {}
+        # 自上次取走以来有 token 更新过的 condition_id，每个市场最多一个标记（合并式交接）
+        self._dirty = ConflatingHandoff()
+        # asset_id -> 单调递增的更新序号，每条写入该 asset 的消息 +1，供快照一致性校验
+        self._seq: Dict[str, int] = {}
+        # asset_id -> 最近一次写入时的 clock() 值，供新鲜度检查
+        self._updated_at: Dict[str, float] = {}
+        # asset_id -> 最近一条消息的交易所时间戳（秒）；消息不带时间戳时不更新
+        self._exchange_ts: Dict[str, float] = {}
+        # 失步的 asset_id -> (原因, 标记时的 clock())；收到全量快照（WS book 或 REST /books）后移除
+        self._invalid: Dict[str, Tuple[str, float]] = {}
+        # 失步原因 -> 累计次数，供状态日志
+        self.desync_counts: Dict[str, int] = {}
+
+    def _book(self, asset_id: str, now: float, exchange_ts: Optional[float] = None) -> L2Book:
+        """
+        目的：取或创建 asset 的订单簿，供写入路径在确实要写入档位或快照时使用
+        方法：同时递增序号、记录更新时间，并把该 token 所属市场标记为脏，供事件驱动检测只评估受影响市场；
+             不改簿的消息不得调用，否则陈旧的簿会显得新鲜、is_pair_current 无故失效。注意：调用方需持有 _lock
+        """
+        book = self._books.get(asset_id)
+        if book is None:
+            book = L2Book()
+            self._books[asset_id] = book
+        self._seq[asset_id] = self._seq.get(asset_id, 0) + 1
+        self._updated_at[asset_id] = now
+        if exchange_ts is not None:
+            self._exchange_ts[asset_id] = exchange_ts
+        for cid in self._markets_by_token.get(asset_id, ()):
+            self._dirty.mark(cid, now)
+        return book
+
+    def set_markets(self, markets: List[Dict[str, Any]]) -> None:
+        """
+        目的：建立 token -> market 反向索引，使任一腿更新即可定位到需重新检测的 condition_id
+        方法：遍历 markets 的 token_id_yes/token_id_no；市场刷新后重新调用即可，旧的脏标记中不再监控的市场被丢弃
+        """
+        index: Dict[str, List[str]] = {}
+        for m in markets:
+            cid = m.get("condition_id")
+            if not cid:
+                continue
+            for key in ("token_id_yes", "token_id_no"):
+                tid = m.get(key)
+                if tid:
+                    index.setdefault(str(tid), []).append(cid)
+        with self._lock:
+            self._markets_by_token = index
+            self._dirty.retain({cid for cids in index.values() for cid in cids})
+
+    def pop_dirty_markets(self) -> List[str]:
+        """目的：取出并清空当前脏市场列表，不阻塞"""
+        with self._lock:
+            return self._dirty.drain(self._clock())
+
+    def wait_dirty_markets(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        目的：检测阶段阻塞等待订单簿更新，醒来后只处理受影响的 condition_id
+        方法：Condition.wait 直到有脏市场或超时；返回并清空脏列表，超时返回空列表。
+             检测落后期间同一市场的多次更新只保留一个标记，醒来后读到的是各市场的最新状态
+        """
+        with self._dirty_cond:
+            if not self._dirty:
+                self._dirty_cond.wait(timeout)
+            return self._dirty.drain(self._clock())
+
+    def get_handoff_stats(self) -> HandoffStats:
+        """目的：读取接入 -> 检测交接的统计（待处理深度、合并次数、批大小、等待时间）"""
+        with self._lock:
+            return self._dirty.snapshot()
 
     def update_from_message(self, msg: Dict[str, Any]) -> None:
         """
-        目的：根据 CLOB WebSocket 的 book 或 price_change 消息更新订单簿快照
-        方法：若消息含 asset_id 及 price/bid/ask 等字段，则更新对应 asset 的 best bid/ask
+        目的：根据 CLOB WebSocket 的 book 或 price_change 消息更新订单簿
+        方法：
+        1. 含 bids/asks 数组（book）：对应边全量替换
+        2. 含 price_changes（新格式，每项自带 asset_id）或 changes（旧格式）：逐档增量，size=0 删除价位
+        3. 仅含 bid/ask/best_bid/best_ask/price 平铺字段：视为该边只有一档的快照
+        last_trade_price、tick_size_change 等不影响订单簿的消息忽略
         """
         if not isinstance(msg, dict):
             return
-        # 方法：常见字段为 asset_id 或 assetId，price_change 可能含 price、bid、ask
+        with self._lock:
+            self._apply_message_locked(msg)
+            if self._dirty:
+                self._dirty_cond.notify_all()
+
+    def apply_batch(self, msgs: List[Dict[str, Any]]) -> None:
+        """
+        目的：一帧内的多条消息只取一次锁、只唤醒一次检测线程，降低开赛/进球等突发时的锁竞争
+        方法：持锁逐条 _apply_message_locked，结束后若有脏市场再 notify_all
+        """
+        with self._lock:
+            for msg in msgs:
+                if isinstance(msg, dict):
+                    self._apply_message_locked(msg)
+            if self._dirty:
+                self._dirty_cond.notify_all()
+
+    def _apply_message_locked(self, msg: Dict[str, Any]) -> None:
+        """
+        目的：update_from_message 的实际写入逻辑。注意：调用方需持有 _lock
+        方法：增量落在从未收到快照的 asset 上（本地尚无簿）说明漏收了 book，照常写入但标记 gap 失步，等待 WS 快照或 REST 重同步
+        """
+        event_type = msg.get("event_type")
+        if event_type in ("last_trade_price", "tick_size_change"):
+            return
+        # 方法：常见字段为 asset_id 或 assetId；新格式 price_change 的 asset_id 在每个 change 内
         asset_id = msg.get("asset_id") or msg.get("assetId")
+        now = self._clock()
+        exchange_ts = _parse_exchange_ts(msg.get("timestamp"))
+        price_changes = msg.get("price_changes")
+        if isinstance(price_changes, list):
+            for ch in price_changes:
+                if not isinstance(ch, dict):
+                    continue
+                aid = ch.get("asset_id") or ch.get("assetId") or asset_id
+                if not aid:
+                    continue
+                if not _is_level_change(ch):
+                    continue
+                aid = str(aid)
+                missed = aid not in self._books
+                book = self._book(aid, now, exchange_ts)
+                if not self._apply_change(book, ch) or missed:
+                    self._mark_invalid(aid, "gap", now)
+                elif not self._best_matches(book, ch):
+                    self._mark_invalid(aid, "best_mismatch", now)
+            return
+
         if not asset_id:
             return
-        asset_id = str(asset_id)
-
-        with self._lock:
-            if asset_id not in self._books:
-                self._books[asset_id] = {"bid": None, "ask": None}
-
-            bid = _parse_price(msg.get("bid") or msg.get("best_bid"))
-            ask = _parse_price(msg.get("ask") or msg.get("best_ask") or msg.get("price"))
-            if bid is not None:
-                self._books[asset_id]["bid"] = bid
-            if ask is not None:
-                self._books[asset_id]["ask"] = ask
-
-            # 方法：book 消息可能含 bids/asks 数组，取第一档
-            bids = msg.get("bids")
-            asks = msg.get("asks")
-            if isinstance(bids, list) and len(bids) > 0:
-                first = bids[0]
-                if isinstance(first, (list, tuple)) and len(first) >= 1:
-                    self._books[asset_id]["bid"] = _parse_price(first[0])
-                elif isinstance(first, dict):
-                    self._books[asset_id]["bid"] = _parse_price(first.get("price"))
-            if isinstance(asks, list) and len(asks) > 0:
-                first = asks[0]
-                if isinstance(first, (list, tuple)) and len(first) >= 1:
-                    self._books[asset_id]["ask"] = _parse_price(first[0])
-                elif isinstance(first, dict):
-                    self._books[asset_id]["ask"] = _parse_price(first.get("price"))
+        missed = str(asset_id) not in self._books
+
+        bids = msg.get("bids")
+        if bids is None:
+            bids = msg.get("buys")
+        asks = msg.get("asks")
+        if asks is None:
+            asks = msg.get("sells")
+        if isinstance(bids, list) or isinstance(asks, list):
+            book = self._book(str(asset_id), now, exchange_ts)
+            if isinstance(bids, list):
+                book.bids.replace([lv for lv in map(_parse_level, bids) if lv is not None])
+            if isinstance(asks, list):
+                book.asks.replace([lv for lv in map(_parse_level, asks) if lv is not None])
+            # 两边都给出才是全量快照，可结束失步状态；开启校验且哈希不符时标记失步
+            if isinstance(bids, list) and isinstance(asks, list):
+                aid = str(asset_id)
+                if self.verify_hash and msg.get("hash") and compute_book_hash(msg) != msg.get("hash"):
+                    self._mark_invalid(aid, "hash", now)
+                else:
+                    self._invalid.pop(aid, None)
+            return
+
+        changes = msg.get("changes")
+        if isinstance(changes, list):
+            changes = [ch for ch in changes if isinstance(ch, dict) and _is_level_change(ch)]
+            if not changes:
+                return
+            book = self._book(str(asset_id), now, exchange_ts)
+            if missed:
+                self._mark_invalid(str(asset_id), "gap", now)
+            for ch in changes:
+                if not self._apply_change(book, ch):
+                    self._mark_invalid(str(asset_id), "gap", now)
+            return
+        if event_type == "price_change" and msg.get("side") is not None:
+            if not _is_level_change(msg):
+                return
+            book = self._book(str(asset_id), now, exchange_ts)
+            if not self._apply_change(book, msg) or missed:
+                self._mark_invalid(str(asset_id), "gap", now)
+            return
+
+        bid = _parse_price(msg.get("bid") or msg.get("best_bid"))
+        ask = _parse_price(msg.get("ask") or msg.get("best_ask") or msg.get("price"))
+        if bid is None and ask is None:
+            return
+        book = self._book(str(asset_id), now, exchange_ts)
+        if bid is not None:
+            book.bids.replace([(bid, _parse_price(msg.get("bid_size")) or 0.0)])
+        if ask is not None:
+            book.asks.replace([(ask, _parse_price(msg.get("ask_size")) or 0.0)])
+
+    @staticmethod
+    def _apply_change(book: L2Book, change: Dict[str, Any]) -> bool:
+        """
+        目的：应用一条 price_change 的单档增量。方法：按 side 定位 BookSide，size 缺失或 0 视为删除该价位
+        返回：是否与本地簿一致；删除一个本地不存在的价位说明此前漏收了消息，返回 False
+        """
+        side = book.side(change.get("side"))
+        price = _parse_price(change.get("price"))
+        if side is None or price is None:
+            return True
+        size = _parse_price(change.get("size")) or 0.0
+        existed = side.set_level(price, size)
+        return existed or size > 0
+
+    @staticmethod
+    def _best_matches(book: L2Book, change: Dict[str, Any]) -> bool:
+        """目的：新格式 change 自带应用后的 best_bid/best_ask，与本地最优价比对；字段缺失视为一致，0 表示该边为空"""
+        for key, side in (("best_bid", book.bids), ("best_ask", book.asks)):
+            expected = _parse_price(change.get(key))
+            if expected is None:
+                continue
+            best = side.best()
+            if expected <= 0:
+                if best is not None:
+                    return False
+            elif best is None or abs(best - expected) > 1e-9:
+                return False
+        return True
+
+    def _mark_invalid(self, asset_id: str, reason: str, now: float) -> None:
+        """目的：标记 asset 失步并计数；已失步的保留最初的标记时间。注意：调用方需持有 _lock"""
+        if asset_id not in self._invalid:
+            self._invalid[asset_id] = (reason, now)
+        self.desync_counts[reason] = self.desync_counts.get(reason, 0) + 1
+
+    def invalidate(self, asset_ids: List[str], reason: str) -> None:
+        """目的：外部（接入层断线、重连）标记一批 asset 失步，直到收到新的全量快照。方法：持锁逐个 _mark_invalid"""
+        with self._lock:
+            now = self._clock()
+            for aid in asset_ids:
+                self._mark_invalid(str(aid), reason, now)
+
+    def is_valid(self, asset_id: str) -> bool:
+        with self._lock:
+            return str(asset_id) not in self._invalid
+
+    def get_invalid_assets(self, older_than_sec: float = 0.0) -> Dict[str, str]:
+        """目的：列出失步已超过 older_than_sec 秒的 asset 及原因，供 REST 重同步（给 WS 快照留出到达时间）"""
+        with self._lock:
+            now = self._clock()
+            return {aid: reason for aid, (reason, since) in self._invalid.items() if now - since >= older_than_sec}
+
+    def apply_snapshot_if_invalid(self, msg: Dict[str, Any]) -> bool:
+        """
+        目的：应用 REST /books 返回的全量快照；仅当该 asset 仍处于失步状态时才应用，避免较旧的 REST 快照覆盖已由 WS 恢复的簿
+        方法：快照 timestamp 早于该 asset 最近一条 WS 消息的交易所时间时拒绝（fetch 与应用之间已有更新的增量到达），
+             保持失步等下一轮重新拉取；任一方缺少时间戳时无法比较，按原逻辑应用
+        返回：是否应用
+        """
+        aid = str(msg.get("asset_id") or msg.get("assetId") or "")
+        with self._lock:
+            if not aid or aid not in self._invalid:
+                return False
+            snap_ts = _parse_exchange_ts(msg.get("timestamp"))
+            last_ts = self._exchange_ts.get(aid)
+            if snap_ts is not None and last_ts is not None and snap_ts < last_ts:
+                return False
+            snap = dict(msg)
+            snap["event_type"] = "book"
+            snap.setdefault("bids", [])
+            snap.setdefault("asks", [])
+            self._apply_message_locked(snap)
+            if self._dirty:
+                self._dirty_cond.notify_all()
+            return aid not in self._invalid
 
     def get_best_bid(self, asset_id: str) -> Optional[float]:
-        """目的：供套利/波动逻辑读取某 token 的最优买价。方法：从快照中取 bid"""
+        """目的：供套利/波动逻辑读取某 token 的最优买价。方法：取 bids 最高价，O(1)"""
         with self._lock:
-            return (self._books.get(str(asset_id)) or {}).get("bid")
+            book = self._books.get(str(asset_id))
+            return book.bids.best() if book is not None else None
 
     def get_best_ask(self, asset_id: str) -> Optional[float]:
-        """目的：供套利逻辑读取「买该 token 的最优卖价」；Polymarket 无手续费，套利条件为 ask_yes + ask_no < 1。方法：从快照取 ask"""
+        """目的：供套利逻辑读取「买该 token 的最优卖价」；Polymarket 无手续费，套利条件为 ask_yes + ask_no < 1。方法：取 asks 最低价，O(1)"""
+        with self._lock:
+            book = self._books.get(str(asset_id))
+            return book.asks.best() if book is not None else None
+
+    def get_seq(self, asset_id: str) -> int:
+        """目的：读取某 asset 的更新序号；从未更新过为 0"""
+        with self._lock:
+            return self._seq.get(str(asset_id), 0)
+
+    def get_market_snapshot(self, token_id_yes: str, token_id_no: str, with_depth: bool = False) -> MarketSnapshot:
+        """
+        目的：一次持锁读取两腿 best bid/ask 与序号，保证检测用的是同一时刻共存的报价
+        方法：在 _lock 内依次读 YES、NO 的 L2Book 最优价、_seq 与距上次更新的秒数；with_depth 时同一次持锁复制两腿全部档位，
+             供按深度定量时数量与价格出自同一簿状态
+        """
+        ty, tn = str(token_id_yes), str(token_id_no)
+        with self._lock:
+            by = self._books.get(ty)
+            bn = self._books.get(tn)
+            now = self._clock()
+            uy = self._updated_at.get(ty)
+            un = self._updated_at.get(tn)
+            return MarketSnapshot(
+                token_id_yes=ty,
+                token_id_no=tn,
+                bid_yes=by.bids.best() if by is not None else None,
+                ask_yes=by.asks.best() if by is not None else None,
+                bid_no=bn.bids.best() if bn is not None else None,
+                ask_no=bn.asks.best() if bn is not None else None,
+                seq_yes=self._seq.get(ty, 0),
+                seq_no=self._seq.get(tn, 0),
+                age_yes=None if uy is None else now - uy,
+                age_no=None if un is None else now - un,
+                valid=ty not in self._invalid and tn not in self._invalid,
+                depth_yes=_book_depth(by) if with_depth else None,
+                depth_no=_book_depth(bn) if with_depth else None,
+            )
+
+    def is_pair_current(self, token_id_yes: str, token_id_no: str, seq_yes: int, seq_no: int) -> bool:
+        """目的：下单前校验两腿自快照以来均无更新且均未失步。方法：一次持锁比较两腿当前序号与失步集合"""
+        with self._lock:
+            return (
+                str(token_id_yes) not in self._invalid
+                and str(token_id_no) not in self._invalid
+                and self._seq.get(str(token_id_yes), 0) == seq_yes
+                and self._seq.get(str(token_id_no), 0) == seq_no
+            )
+
+    def get_depth(
+        self, asset_id: str, depth: Optional[int] = None
+    ) -> Dict[str, List[Tuple[float, float]]]:
+        """
+        目的：供下单量与滑点估算读取订单簿深度
+        方法：返回 {"bids": [(price, size), ...], "asks": [...]}，均按从优到劣排序；depth 为 None 时返回全部档位
+        """
+        with self._lock:
+            book = self._books.get(str(asset_id))
+            if book is None:
+                return {"bids": [], "asks": []}
+            return {"bids": book.bids.levels(depth), "asks": book.asks.levels(depth)}
+
+    def estimate_fill(
+        self, asset_id: str, side: str, size: Optional[float] = None, limit_price: Optional[float] = None,
+    ) -> FillEstimate:
+        """
+        目的：估算在某 token 上买入/卖出 size 份的真实成交：VWAP、最差价、可成交量
+        方法：BUY 沿 asks 从低到高、SELL 沿 bids 从高到低逐档累加（walk_levels），持锁遍历不复制整边；无订单簿时 filled=0
+        """
+        is_buy = _side_is_buy(side)
+        with self._lock:
+            book = self._books.get(str(asset_id))
+            if book is None:
+                return FillEstimate(requested=size)
+            return walk_levels((book.asks if is_buy else book.bids).iter_levels(), size, limit_price, is_buy)
+
+    def get_vwap(self, asset_id: str, side: str, size: float) -> Optional[float]:
+        """目的：买入/卖出 size 份的成交量加权均价；深度不足以全部成交时返回 None"""
+        est = self.estimate_fill(asset_id, side, size)
+        return est.vwap if est.complete else None
+
+    def get_worst_price(self, asset_id: str, side: str, size: float) -> Optional[float]:
+        """目的：买入/卖出 size 份需要吃到的最差价（即一次成交所需的限价）；深度不足时返回 None"""
+        est = self.estimate_fill(asset_id, side, size)
+        return est.worst_price if est.complete else None
+
+    def max_size_under_limit(self, asset_id: str, side: str, limit_price: float) -> float:
+        """目的：限价内（买入不高于、卖出不低于 limit_price）可成交的最大数量"""
+        return self.estimate_fill(asset_id, side, None, limit_price).filled
+
+    def remove_assets(self, asset_ids: List[str]) -> None:
+        """目的：退订 token 后丢弃其订单簿，避免对已不再更新的旧簿做检测。方法：从 _books 及各按 asset 的索引中删除"""
         with self._lock:
-            return (self._books.get(str(asset_id)) or {}).get("ask")
+            for aid in asset_ids:
+                self._books.pop(str(aid), None)
+                self._seq.pop(str(aid), None)
+                self._updated_at.pop(str(aid), None)
+                self._exchange_ts.pop(str(aid), None)
+                self._invalid.pop(str(aid), None)
 
     def get_all_asset_ids(self) -> List[str]:
         """目的：供主流程确认已订阅的 asset 列表。方法：返回当前有快照的 asset_id"""
         with self._lock:
             return list(self._books.keys())
 
+    def get_quote_age(self, asset_id: str) -> Optional[float]:
+        """目的：某 asset 距上次更新的秒数（单调时钟）；从未更新返回 None"""
+        with self._lock:
+            updated = self._updated_at.get(str(asset_id))
+            return None if updated is None else self._clock() - updated
+
+    def get_exchange_ts(self, asset_id: str) -> Optional[float]:
+        """目的：某 asset 最近一条消息的交易所时间戳（秒，墙钟）；消息未带时间戳时为 None"""
+        with self._lock:
+            return self._exchange_ts.get(str(asset_id))
+
+    def get_freshness(
+        self, asset_ids: Optional[List[str]] = None, max_age_sec: Optional[float] = None,
+    ) -> QuoteFreshness:
+        """
+        目的：全 store（或给定 asset 集合）的报价年龄概览：最旧、中位数、超龄数量
+        方法：一次持锁取各 asset 的更新时间，再由 summarize_freshness 汇总
+        """
+        with self._lock:
+            now = self._clock()
+            updated = dict(self._updated_at)
+        return summarize_freshness(now, updated, asset_ids, max_age_sec)
+
+    def export_quote(self, asset_id: str, depth: int) -> Optional[Dict[str, Any]]:
+        """
+        目的：一次持锁导出某 asset 的前 depth 档与元数据，供接入进程发布到共享内存报价表
+        方法：返回 bids/asks（从优到劣）、seq、updated_at、exchange_ts 与失步 (原因, 起始时间)；从未收到消息且未失步返回 None
+        """
+        aid = str(asset_id)
+        with self._lock:
+            book = self._books.get(aid)
+            if book is None and aid not in self._invalid:
+                return None
+            return {
+                "bids": book.bids.levels(depth) if book is not None else [],
+                "asks": book.asks.levels(depth) if book is not None else [],
+                "seq": self._seq.get(aid, 0),
+                "updated_at": self._updated_at.get(aid),
+                "exchange_ts": self._exchange_ts.get(aid),
+                "invalid": self._invalid.get(aid),
+            }
+
+
+def summarize_freshness(
+    now: float,
+    updated_at: Dict[str, float],
+    asset_ids: Optional[List[str]] = None,
+    max_age_sec: Optional[float] = None,
+) -> QuoteFreshness:
+    """
+    目的：由各 asset 的最近更新时间汇总 QuoteFreshness，供 OrderBookStore 与共享内存报价表共用
+    方法：asset_ids 中从未更新过的 token 视为无限旧（计入 stale_count，不参与中位数）
+    """
+    if asset_ids is None:
+        items = list(updated_at.items())
+        missing = 0
+    else:
+        ids = [str(a) for a in dict.fromkeys(asset_ids)]
+        items = [(a, updated_at[a]) for a in ids if a in updated_at]
+        missing = len(ids) - len(items)
+    out = QuoteFreshness(asset_count=len(items) + missing)
+    if max_age_sec is not None:
+        out.stale_count = missing
+    if not items:
+        return out
+    ages = [(now - ts, aid) for aid, ts in items]
+    oldest_age, oldest_id = max(ages)
+    out.oldest_age_sec = oldest_age
+    out.oldest_asset_id = oldest_id
+    out.median_age_sec = statistics.median(age for age, _ in ages)
+    if max_age_sec is not None:
+        out.stale_count += sum(1 for age, _ in ages if age > max_age_sec)
+    return out
+
+
+def shard_for_asset(asset_id: str, num_shards: int) -> int:
+    """
+    目的：把 asset_id 稳定地分配到某个 WebSocket 分片，市场刷新后同一 token 仍落在同一连接
+    方法：crc32(asset_id) % num_shards；不用内置 hash，因其在不同进程间随机化
+    """
+    if num_shards <= 1:
+        return 0
+    return zlib.crc32(str(asset_id).encode("utf-8")) % num_shards
+
+
+@dataclass
+class ShardStats:
+    """
+    目的：记录单条 WebSocket 连接（分片）的健康状况，供状态日志排查哪一路断线或无数据
+    方法：仅由该分片所在线程写入，主线程只读；时间为 time.monotonic()
+    """
+    shard_id: int = 0
+    asset_count: int = 0
+    connected: bool = False
+    connects: int = 0
+    disconnects: int = 0
+    messages: int = 0
+    errors: int = 0
+    last_error: str = ""
+    last_message_at: Optional[float] = None
+
+
+def ingest_frame(store: Any, raw: Union[str, bytes], metrics: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    目的：接入层处理一帧的公共路径：解码并一次性写入 store，返回消息列表供钩子使用
+    方法：decode_frame + apply_batch；传入 metrics 时额外取接收墙钟与两段 perf_counter，调用 metrics.observe_frame，
+         未传入时不做任何计时
+    """
+    if metrics is None:
+        msgs = decode_frame(raw)
+        if msgs:
+            store.apply_batch(msgs)
+        return msgs
+    recv_wall = time.time()
+    t0 = time.perf_counter()
+    msgs = decode_frame(raw)
+    t1 = time.perf_counter()
+    if msgs:
+        store.apply_batch(msgs)
+    t2 = time.perf_counter()
+    metrics.observe_frame(msgs, recv_wall, t1 - t0, t2 - t1)
+    return msgs
+
 
 def run_websocket_loop(
     store: OrderBookStore,
     asset_ids_or_getter: Union[List[str], Callable[[], List[str]]],
     url: str = WSS_MARKET_URL,
     reconnect_delay_sec: float = 5.0,
+    stats: Optional[ShardStats] = None,
+    resubscribe_check_sec: float = 1.0,
+    recorder: Optional[Any] = None,
+    metrics: Optional[Any] = None,
 ) -> None:
     """
     目的：在后台线程中连接 WebSocket 并持续接收消息，更新 store
-    方法：连接 url，发送订阅消息 {"assets_ids": asset_ids, "type": "MARKET"}，循环 recv 并 store.update_from_message；断线后等待 reconnect_delay_sec 再重连；若第二参为可调用对象则每次重连时调用以获取最新 asset_ids，实现定期刷新监控列表
+    方法：连接 url，发送订阅消息 {"assets_ids": asset_ids, "type": "MARKET"}，循环 recv 并 store.update_from_message；断线后等待 reconnect_delay_sec 再重连
+    若第二参为可调用对象，则每 resubscribe_check_sec 秒调用一次获取最新 asset_ids，在现有连接上增量 subscribe/unsubscribe（见 plan_resubscription），无需重连
+    若传入 stats，则记录连接次数、消息数与最近错误，供分片模式下的健康检查；断线时把本连接订阅的 asset 标记为失步
+    若传入 recorder（src.capture.FrameRecorder），每帧在解码前按接收时间原样录制，供离线回放
+    若传入 metrics（src.metrics.MetricsRegistry），每帧记录单向延迟与解码/写入耗时（见 ingest_frame）
     注意：需在单独线程中调用，否则会阻塞；主程序可用 store 读 best bid/ask
     """
+    if stats is None:
+        stats = ShardStats()
     try:
         import websocket
     except ImportError:
@@ -110,31 +930,127 @@ def run_websocket_loop(
 
     while True:
         current_ids = _current_ids()
+        stats.asset_count = len(current_ids)
         if not current_ids:
             time.sleep(reconnect_delay_sec)
             continue
+        ws = None
         try:
             ws = websocket.create_connection(url)
-            sub = {"assets_ids": [str(a) for a in current_ids], "type": "MARKET"}
+            subscribed = [str(a) for a in current_ids]
+            sub = {"assets_ids": subscribed, "type": "MARKET"}
             ws.send(json.dumps(sub))
+            stats.connected = True
+            stats.connects += 1
+            # recv 超时用于空闲时也能定期检查订阅差异
+            ws.settimeout(resubscribe_check_sec)
+            last_check = time.monotonic()
             while True:
-                raw = ws.recv()
+                if callable(asset_ids_or_getter) and time.monotonic() - last_check >= resubscribe_check_sec:
+                    last_check = time.monotonic()
+                    subscribed = _resubscribe(ws.send, store, subscribed, _current_ids(), stats)
+                try:
+                    raw = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    continue
                 if not raw:
                     break
-                try:
-                    msg = json.loads(raw)
-                    if isinstance(msg, dict):
-                        store.update_from_message(msg)
-                    elif isinstance(msg, list):
-                        for m in msg:
-                            if isinstance(m, dict):
-                                store.update_from_message(m)
-                except json.JSONDecodeError:
-                    pass
-        except Exception:
-            pass
+                if recorder is not None:
+                    recorder.record(raw)
+                stats.messages += 1
+                stats.last_message_at = time.monotonic()
+                ingest_frame(store, raw, metrics)
+        except Exception as e:
+            stats.errors += 1
+            stats.last_error = "%s: %s" % (type(e).__name__, e)
+        if stats.connected:
+            stats.connected = False
+            stats.disconnects += 1
+            # 断线窗口内的增量已丢失：本连接订阅的 asset 失步，直到重连后的 book 快照或 REST 重同步
+            store.invalidate(subscribed, "disconnect")
         try:
-            ws.close()
+            if ws is not None:
+                ws.close()
         except Exception:
             pass
         time.sleep(reconnect_delay_sec)
+
+
+def plan_resubscription(
+    subscribed: List[str], current: List[str]
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    目的：市场刷新后计算订阅差异，生成在现有连接上发送的增量订阅帧
+    方法：added = current - subscribed，removed = subscribed - current（均保持原顺序）；
+         帧格式为 {"assets_ids": [...], "operation": "subscribe"|"unsubscribe"}
+    返回：(added, removed, frames)，无差异时 frames 为空
+    """
+    current_set = set(current)
+    subscribed_set = set(subscribed)
+    added = [a for a in dict.fromkeys(current) if a not in subscribed_set]
+    removed = [a for a in subscribed if a not in current_set]
+    frames: List[str] = []
+    if added:
+        frames.append(json.dumps({"assets_ids": added, "operation": "subscribe"}))
+    if removed:
+        frames.append(json.dumps({"assets_ids": removed, "operation": "unsubscribe"}))
+    return added, removed, frames
+
+
+def _resubscribe(
+    send: Callable[[str], Any],
+    store: OrderBookStore,
+    subscribed: List[str],
+    current_ids: List[str],
+    stats: ShardStats,
+) -> List[str]:
+    """目的：线程版接入的增量订阅。方法：发送 plan_resubscription 的帧，丢弃已退订 token 的订单簿；返回新的已订阅列表"""
+    current = [str(a) for a in current_ids]
+    added, removed, frames = plan_resubscription(subscribed, current)
+    if not frames:
+        return subscribed
+    for frame in frames:
+        send(frame)
+    store.remove_assets(removed)
+    stats.asset_count = len(current)
+    return list(dict.fromkeys(current))
+
+
+def start_sharded_websocket_loops(
+    store: OrderBookStore,
+    asset_ids_or_getter: Union[List[str], Callable[[], List[str]]],
+    num_shards: int,
+    url: str = WSS_MARKET_URL,
+    reconnect_delay_sec: float = 5.0,
+    recorder: Optional[Any] = None,
+    metrics: Optional[Any] = None,
+) -> List[ShardStats]:
+    """
+    目的：分片订阅：开 num_shards 条 WebSocket 连接，分摊解码负载，且单路断线只影响该分片的市场
+    方法：每个分片一个 daemon 线程运行 run_websocket_loop，其 getter 只返回 shard_for_asset 落在本分片的 asset_id；
+         各分片独立重连、独立统计，全部写入同一个 store；recorder、metrics 为各分片共用
+    返回：各分片的 ShardStats，下标即 shard_id
+    """
+    num_shards = max(1, int(num_shards))
+
+    def _all_ids() -> List[str]:
+        if callable(asset_ids_or_getter):
+            return list(asset_ids_or_getter())
+        return list(asset_ids_or_getter)
+
+    def _shard_getter(shard_id: int) -> Callable[[], List[str]]:
+        def _ids() -> List[str]:
+            return [a for a in _all_ids() if shard_for_asset(a, num_shards) == shard_id]
+        return _ids
+
+    all_stats: List[ShardStats] = []
+    for shard_id in range(num_shards):
+        st = ShardStats(shard_id=shard_id)
+        all_stats.append(st)
+        threading.Thread(
+            target=run_websocket_loop,
+            args=(store, _shard_getter(shard_id), url, reconnect_delay_sec, st, 1.0, recorder, metrics),
+            daemon=True,
+            name="orderbook-ws-%d" % shard_id,
+        ).start()
+    return all_stats
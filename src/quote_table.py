@@ -0,0 +1,342 @@
+# 目的：紧凑的数组化报价表，作为 OrderBookStore 之外的可选存储：按整数槽位存每个 token 的最优价，整表可按向量扫描
+# 方法：订阅时为每个 token_id 分配整数槽位；bid/ask/size/更新时间/序号存为连续列（安装 NumPy 时为 ndarray，否则为 array）；
+#       token_id -> slot 只在订阅/按市场解析时查一次，此后检测按槽位下标直接读列
+
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.orderbook import MarketSnapshot, _parse_level, _parse_price
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_NAN = float("nan")
+
+
+def _new_column(capacity: int, fill: float, typecode: str = "d") -> Any:
+    """目的：创建一列定长数组。方法：有 NumPy 用 np.full，否则用 array 并预填充"""
+    if np is not None:
+        return np.full(capacity, fill, dtype=np.float64 if typecode == "d" else np.int64)
+    return array(typecode, [fill] * capacity)
+
+
+def _grow_column(col: Any, capacity: int, fill: float, typecode: str = "d") -> Any:
+    """目的：把列扩容到 capacity，已有数据保持不变"""
+    extra = capacity - len(col)
+    if extra <= 0:
+        return col
+    if np is not None:
+        return np.concatenate([col, _new_column(extra, fill, typecode)])
+    col.extend([fill] * extra)
+    return col
+
+
+def _opt(value: float) -> Optional[float]:
+    """目的：列中以 NaN 表示缺失，对外 API 转为 None 与 OrderBookStore 保持一致"""
+    return None if math.isnan(value) else float(value)
+
+
+class QuoteTable:
+    """
+    目的：以整数槽位 + 连续数组列保存所有订阅 token 的 top-of-book，降低每条报价的内存与查找开销
+    方法：
+    - subscribe 为新 token 分配槽位（只增不减，退订的槽位清空为 NaN 并回收复用）
+    - 列：bid、ask、bid_size、ask_size、updated_at（monotonic 秒）、seq；缺失值为 NaN
+    - 写入：book 消息取各边最优档；新格式 price_change 直接用其 best_bid/best_ask 字段；
+            旧格式 changes 只有增量而无全深度，若删除的正是当前最优档则该边置 NaN，等待下一条 book
+    - 读取 API 与 OrderBookStore 同名（get_best_bid/get_best_ask/get_market_snapshot），可替换使用
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        capacity = max(1, int(capacity))
+        self.bid = _new_column(capacity, _NAN)
+        self.ask = _new_column(capacity, _NAN)
+        self.bid_size = _new_column(capacity, _NAN)
+        self.ask_size = _new_column(capacity, _NAN)
+        self.updated_at = _new_column(capacity, _NAN)
+        self.seq = _new_column(capacity, 0, "q")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.bid)
+
+    def _ensure_capacity(self, needed: int) -> None:
+        """目的：槽位不足时按 2 倍扩容全部列。注意：调用方需持有 _lock"""
+        cap = self.capacity
+        if needed <= cap:
+            return
+        while cap < needed:
+            cap *= 2
+        self.bid = _grow_column(self.bid, cap, _NAN)
+        self.ask = _grow_column(self.ask, cap, _NAN)
+        self.bid_size = _grow_column(self.bid_size, cap, _NAN)
+        self.ask_size = _grow_column(self.ask_size, cap, _NAN)
+        self.updated_at = _grow_column(self.updated_at, cap, _NAN)
+        self.seq = _grow_column(self.seq, cap, 0, "q")
+
+    def subscribe(self, token_ids: List[str]) -> List[int]:
+        """目的：为 token 分配槽位（已分配则沿用），返回与入参顺序一致的槽位列表"""
+        out: List[int] = []
+        with self._lock:
+            for tid in token_ids:
+                tid = str(tid)
+                slot = self._slots.get(tid)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        slot = self._size
+                        self._size += 1
+                        self._ensure_capacity(self._size)
+                    self._slots[tid] = slot
+                out.append(slot)
+        return out
+
+    def unsubscribe(self, token_ids: List[str]) -> None:
+        """目的：退订 token，清空其槽位数据并回收槽位；seq 保留递增，避免复用槽位后旧快照误判为最新"""
+        with self._lock:
+            for tid in token_ids:
+                slot = self._slots.pop(str(tid), None)
+                if slot is None:
+                    continue
+                self._set_side(slot, True, _NAN, _NAN)
+                self._set_side(slot, False, _NAN, _NAN)
+                self.updated_at[slot] = _NAN
+                self._free.append(slot)
+
+    def remove_assets(self, asset_ids: List[str]) -> None:
+        """目的：与 OrderBookStore.remove_assets 同名，供接入层退订时调用"""
+        self.unsubscribe(asset_ids)
+
+    def slot_of(self, token_id: str) -> Optional[int]:
+        """目的：查询 token 的槽位；未订阅返回 None"""
+        return self._slots.get(str(token_id))
+
+    def resolve_markets(self, markets: List[Dict[str, Any]]) -> Tuple[List[int], List[int], List[int]]:
+        """
+        目的：按市场一次性解析 YES/NO 槽位，供后续按下标扫描，避免每次检测都对长 token_id 做哈希
+        方法：未订阅的 token 先 subscribe；缺 token 的市场跳过
+        返回：(market_indices, yes_slots, no_slots)，market_indices 为对应市场在 markets 中的下标
+        """
+        idx: List[int] = []
+        ty_list: List[str] = []
+        tn_list: List[str] = []
+        for i, m in enumerate(markets):
+            ty = m.get("token_id_yes")
+            tn = m.get("token_id_no")
+            if not ty or not tn:
+                continue
+            idx.append(i)
+            ty_list.append(str(ty))
+            tn_list.append(str(tn))
+        return idx, self.subscribe(ty_list), self.subscribe(tn_list)
+
+    def _set_side(self, slot: int, is_bid: bool, price: float, size: float) -> None:
+        """目的：写某槽位一边的最优价与数量。注意：调用方需持有 _lock"""
+        if is_bid:
+            self.bid[slot] = price
+            self.bid_size[slot] = size
+        else:
+            self.ask[slot] = price
+            self.ask_size[slot] = size
+
+    def _touch(self, slot: int) -> None:
+        self.updated_at[slot] = time.monotonic()
+        self.seq[slot] = int(self.seq[slot]) + 1
+
+    def update_from_message(self, msg: Dict[str, Any]) -> None:
+        """目的：与 OrderBookStore 相同的消息入口。方法：持锁调用 _apply_message_locked"""
+        if not isinstance(msg, dict):
+            return
+        with self._lock:
+            self._apply_message_locked(msg)
+
+    def apply_batch(self, msgs: List[Dict[str, Any]]) -> None:
+        """目的：一帧多条消息只取一次锁"""
+        with self._lock:
+            for msg in msgs:
+                if isinstance(msg, dict):
+                    self._apply_message_locked(msg)
+
+    def _apply_message_locked(self, msg: Dict[str, Any]) -> None:
+        """目的：按消息类型更新 top-of-book；未订阅 token 的消息忽略。注意：调用方需持有 _lock"""
+        event_type = msg.get("event_type")
+        if event_type in ("last_trade_price", "tick_size_change"):
+            return
+        asset_id = msg.get("asset_id") or msg.get("assetId")
+
+        price_changes = msg.get("price_changes")
+        if isinstance(price_changes, list):
+            for ch in price_changes:
+                if not isinstance(ch, dict):
+                    continue
+                slot = self._slots.get(str(ch.get("asset_id") or ch.get("assetId") or asset_id))
+                if slot is not None:
+                    self._apply_change(slot, ch)
+                    self._touch(slot)
+            return
+
+        slot = self._slots.get(str(asset_id)) if asset_id else None
+        if slot is None:
+            return
+
+        bids = msg.get("bids")
+        if bids is None:
+            bids = msg.get("buys")
+        asks = msg.get("asks")
+        if asks is None:
+            asks = msg.get("sells")
+        if isinstance(bids, list) or isinstance(asks, list):
+            if isinstance(bids, list):
+                levels = [lv for lv in map(_parse_level, bids) if lv is not None]
+                best = max(levels) if levels else (_NAN, _NAN)
+                self._set_side(slot, True, best[0], best[1])
+            if isinstance(asks, list):
+                levels = [lv for lv in map(_parse_level, asks) if lv is not None]
+                best = min(levels) if levels else (_NAN, _NAN)
+                self._set_side(slot, False, best[0], best[1])
+            self._touch(slot)
+            return
+
+        changes = msg.get("changes")
+        if isinstance(changes, list):
+            for ch in changes:
+                if isinstance(ch, dict):
+                    self._apply_change(slot, ch)
+            self._touch(slot)
+            return
+        if event_type == "price_change" and msg.get("side") is not None:
+            self._apply_change(slot, msg)
+            self._touch(slot)
+            return
+
+        bid = _parse_price(msg.get("bid") or msg.get("best_bid"))
+        ask = _parse_price(msg.get("ask") or msg.get("best_ask") or msg.get("price"))
+        if bid is not None:
+            self._set_side(slot, True, bid, _parse_price(msg.get("bid_size")) or 0.0)
+        if ask is not None:
+            self._set_side(slot, False, ask, _parse_price(msg.get("ask_size")) or 0.0)
+        if bid is not None or ask is not None:
+            self._touch(slot)
+
+    def _apply_change(self, slot: int, change: Dict[str, Any]) -> None:
+        """
+        目的：应用单档增量到 top-of-book
+        方法：change 带 best_bid/best_ask 时直接采用（<= 0 表示该边为空，存 NaN，与 OrderBookStore 的空边返回 None 一致）；
+             否则按价位与当前最优比较：更优或同价则覆盖，删除当前最优档则该边置 NaN（无深度无法得知下一档）
+        """
+        best_bid = _parse_price(change.get("best_bid"))
+        best_ask = _parse_price(change.get("best_ask"))
+        if best_bid is not None or best_ask is not None:
+            for is_bid, best in ((True, best_bid), (False, best_ask)):
+                if best is None:
+                    continue
+                if best <= 0:
+                    self._set_side(slot, is_bid, _NAN, _NAN)
+                    continue
+                cur, cur_size = (self.bid, self.bid_size) if is_bid else (self.ask, self.ask_size)
+                self._set_side(slot, is_bid, best, cur_size[slot] if cur[slot] == best else _NAN)
+        side = str(change.get("side") or "").upper()
+        price = _parse_price(change.get("price"))
+        if price is None or side not in ("BUY", "SELL"):
+            return
+        size = _parse_price(change.get("size")) or 0.0
+        is_bid = side == "BUY"
+        cur = self.bid[slot] if is_bid else self.ask[slot]
+        if size <= 0:
+            if cur == price:
+                self._set_side(slot, is_bid, _NAN, _NAN)
+            return
+        better = math.isnan(cur) or (price >= cur if is_bid else price <= cur)
+        if better:
+            self._set_side(slot, is_bid, price, size)
+
+    # 读取与 OrderBookStore 一样持锁：写入按槽位逐列更新 bid/ask/size，不持锁可能读到一半新一半旧的报价
+
+    def get_best_bid(self, asset_id: str) -> Optional[float]:
+        with self._lock:
+            slot = self._slots.get(str(asset_id))
+            return None if slot is None else _opt(self.bid[slot])
+
+    def get_best_ask(self, asset_id: str) -> Optional[float]:
+        with self._lock:
+            slot = self._slots.get(str(asset_id))
+            return None if slot is None else _opt(self.ask[slot])
+
+    def _seq_locked(self, asset_id: str) -> int:
+        """注意：调用方需持有 _lock"""
+        slot = self._slots.get(str(asset_id))
+        return 0 if slot is None else int(self.seq[slot])
+
+    def get_seq(self, asset_id: str) -> int:
+        with self._lock:
+            return self._seq_locked(asset_id)
+
+    def gather_slots(self, yes_slots: Any, no_slots: Any) -> Tuple[Any, Any, Any, Any, Any, Any]:
+        """
+        目的：一次持锁取出一组市场两腿的报价与序号，供向量扫描，保证各列来自同一时刻
+        方法：按槽位下标复制列（NumPy 时为 take，否则为列表），返回 (bid_yes, ask_yes, bid_no, ask_no, seq_yes, seq_no)
+        """
+        with self._lock:
+            if np is not None:
+                ys, ns = np.asarray(yes_slots, dtype=np.int64), np.asarray(no_slots, dtype=np.int64)
+                return (
+                    self.bid.take(ys), self.ask.take(ys), self.bid.take(ns), self.ask.take(ns),
+                    self.seq.take(ys), self.seq.take(ns),
+                )
+            ys, ns = [int(i) for i in yes_slots], [int(i) for i in no_slots]
+            return tuple([col[i] for i in slots] for col, slots in (
+                (self.bid, ys), (self.ask, ys), (self.bid, ns), (self.ask, ns), (self.seq, ys), (self.seq, ns),
+            ))
+
+    def _top_depth(self, slot: Optional[int]) -> Dict[str, List[Tuple[float, float]]]:
+        """目的：只有最优档时的深度视图（格式同 get_depth）；数量未知（NaN）记为 0，由检测视为深度未知。注意：调用方需持有 _lock"""
+        out: Dict[str, List[Tuple[float, float]]] = {"bids": [], "asks": []}
+        if slot is None:
+            return out
+        for key, price, size in (("bids", self.bid[slot], self.bid_size[slot]), ("asks", self.ask[slot], self.ask_size[slot])):
+            if not math.isnan(price):
+                out[key].append((float(price), 0.0 if math.isnan(size) else float(size)))
+        return out
+
+    def get_market_snapshot(self, token_id_yes: str, token_id_no: str, with_depth: bool = False) -> MarketSnapshot:
+        """目的：与 OrderBookStore.get_market_snapshot 相同语义，一次持锁读两腿；with_depth 时深度只有最优档"""
+        ty, tn = str(token_id_yes), str(token_id_no)
+        with self._lock:
+            sy = self._slots.get(ty)
+            sn = self._slots.get(tn)
+            now = time.monotonic()
+            return MarketSnapshot(
+                token_id_yes=ty,
+                token_id_no=tn,
+                bid_yes=None if sy is None else _opt(self.bid[sy]),
+                ask_yes=None if sy is None else _opt(self.ask[sy]),
+                bid_no=None if sn is None else _opt(self.bid[sn]),
+                ask_no=None if sn is None else _opt(self.ask[sn]),
+                seq_yes=0 if sy is None else int(self.seq[sy]),
+                seq_no=0 if sn is None else int(self.seq[sn]),
+                age_yes=None if sy is None else _opt(now - self.updated_at[sy]),
+                age_no=None if sn is None else _opt(now - self.updated_at[sn]),
+                depth_yes=self._top_depth(sy) if with_depth else None,
+                depth_no=self._top_depth(sn) if with_depth else None,
+            )
+
+    def is_pair_current(self, token_id_yes: str, token_id_no: str, seq_yes: int, seq_no: int) -> bool:
+        with self._lock:
+            return self._seq_locked(token_id_yes) == seq_yes and self._seq_locked(token_id_no) == seq_no
+
+    def get_all_asset_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._slots.keys())
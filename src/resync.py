@@ -0,0 +1,106 @@
+# 目的：订单簿失步后的 REST 重同步：断线窗口、增量缺档、哈希不符等被标记失步的 asset，批量调用 CLOB /books 拉全量快照恢复
+# 方法：BookResyncer 周期性取出失步超过 grace_sec 的 asset（先给 WS 重连后的 book 快照留出到达时间），按 batch_size 分批 POST /books，
+#       仅对仍处于失步状态的 asset 应用快照（store.apply_snapshot_if_invalid）；恢复前检测层会跳过这些市场
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+import requests
+
+from src.orderbook import OrderBookStore
+
+logger = logging.getLogger(__name__)
+
+# CLOB REST 基址
+CLOB_BASE = "https://clob.polymarket.com"
+
+
+def fetch_books(token_ids: List[str], timeout: float = 10.0, base_url: str = CLOB_BASE) -> List[Dict[str, Any]]:
+    """
+    目的：批量拉取多个 token 的订单簿全量快照
+    方法：POST {base_url}/books，body 为 [{"token_id": ...}, ...]；返回结构与 WS book 消息相同（asset_id、bids、asks、hash、timestamp）
+    """
+    resp = requests.post(
+        f"{base_url}/books",
+        json=[{"token_id": str(t)} for t in token_ids],
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    return [b for b in data if isinstance(b, dict)] if isinstance(data, list) else []
+
+
+@dataclass
+class ResyncStats:
+    """目的：重同步的累计统计，供状态日志。方法：requests 为 REST 调用次数，applied 为成功恢复的 asset 数"""
+    requests: int = 0
+    applied: int = 0
+    errors: int = 0
+    last_error: str = ""
+
+
+class BookResyncer:
+    """
+    目的：把失步的 asset 通过 REST 快照恢复为可交易
+    方法：resync_once 做一轮（供测试与主循环直接调用）；start 在后台线程按 interval_sec 循环
+    """
+
+    def __init__(
+        self,
+        store: OrderBookStore,
+        fetch: Callable[[List[str]], List[Dict[str, Any]]] = fetch_books,
+        batch_size: int = 50,
+        grace_sec: float = 2.0,
+    ) -> None:
+        self.store = store
+        self.fetch = fetch
+        self.batch_size = max(1, int(batch_size))
+        self.grace_sec = grace_sec
+        self.stats = ResyncStats()
+        self._stop = threading.Event()
+
+    def resync_once(self) -> int:
+        """
+        目的：对当前失步超过 grace_sec 的 asset 做一轮 REST 重同步
+        方法：分批 fetch；单批失败只记录并继续下一批，失步状态保留到下一轮
+        返回：本轮恢复的 asset 数
+        """
+        invalid = sorted(self.store.get_invalid_assets(older_than_sec=self.grace_sec))
+        applied = 0
+        for i in range(0, len(invalid), self.batch_size):
+            batch = invalid[i:i + self.batch_size]
+            self.stats.requests += 1
+            try:
+                books = self.fetch(batch)
+            except Exception as e:
+                self.stats.errors += 1
+                self.stats.last_error = "%s: %s" % (type(e).__name__, e)
+                logger.warning("REST 重同步失败（%d 个 asset）: %s", len(batch), self.stats.last_error)
+                continue
+            for book in books:
+                if self.store.apply_snapshot_if_invalid(book):
+                    applied += 1
+        if applied:
+            logger.info("REST 重同步恢复 %d 个 asset（失步 %d 个）", applied, len(invalid))
+        self.stats.applied += applied
+        return applied
+
+    def start(self, interval_sec: float = 1.0) -> threading.Thread:
+        """目的：后台线程中每 interval_sec 秒执行一轮 resync_once，直到 stop"""
+        def _loop() -> None:
+            while not self._stop.wait(interval_sec):
+                try:
+                    self.resync_once()
+                except Exception as e:
+                    self.stats.errors += 1
+                    self.stats.last_error = "%s: %s" % (type(e).__name__, e)
+                    logger.warning("重同步线程异常: %s", e)
+
+        t = threading.Thread(target=_loop, daemon=True, name="orderbook-resync")
+        t.start()
+        return t
+
+    def stop(self) -> None:
+        self._stop.set()
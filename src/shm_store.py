@@ -0,0 +1,643 @@
+# 目的：可选的进程外行情接入：WebSocket 解码与订单簿维护放到独立进程，主进程的检测循环不再与 JSON 解码争同一个 GIL
+# 方法：接入进程内照常运行 AsyncMarketIngest + OrderBookStore（含失步检测与 REST 重同步），每帧后把受影响 token 的前 K 档
+#       与元数据写入 multiprocessing.shared_memory 中的定长槽位；每个槽位带 seqlock（写前序号置奇数、写后置偶数，
+#       读方序号前后一致且为偶数才采用），主进程无锁读取；SharedMemoryQuoteStore 提供与 OrderBookStore 相同的读取接口，
+#       arbitrage / volatility 与主循环的检测逻辑无需改动。脏市场通知与统计经 Pipe 从接入进程发回主进程
+# 注意：seqlock 依赖写入按程序顺序对其他核可见（x86 的 TSO 满足）；token -> 槽位由主进程分配，每次分配带递增的 owner 编号，
+#       槽位被回收复用后旧 token 的残留数据因 owner 不符而被忽略
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from array import array
+from dataclasses import asdict, fields
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from src.orderbook import (
+    WSS_MARKET_URL,
+    ConflatingHandoff,
+    FillEstimate,
+    HandoffStats,
+    MarketSnapshot,
+    OrderBookStore,
+    QuoteFreshness,
+    ShardStats,
+    _side_is_buy,
+    summarize_freshness,
+    walk_levels,
+)
+
+logger = logging.getLogger(__name__)
+
+# 槽位布局（float64）：seq, owner, version, reason, updated_at, exchange_ts, invalid_since, n_bids, n_asks, 之后 bids、asks 各 depth 档 (price, size)
+_F_SEQ, _F_OWNER, _F_VERSION, _F_REASON, _F_UPDATED, _F_EXCHANGE_TS, _F_INVALID_SINCE, _F_NBIDS, _F_NASKS = range(9)
+_HEADER = 9
+# 失步原因编码；0 表示有效
+REASON_CODES = {"gap": 1, "best_mismatch": 2, "disconnect": 3, "hash": 4}
+_REASON_NAMES = {v: k for k, v in REASON_CODES.items()}
+_NAN = float("nan")
+
+
+class SharedQuoteTable:
+    """
+    目的：共享内存中的定长报价槽位表，单写（接入进程）多读（主进程）
+    方法：create=True 由主进程创建，接入进程按 name 以 create=False 附着；每槽 _HEADER + 4*depth 个 float64
+    """
+
+    def __init__(self, capacity: int, depth: int = 5, name: Optional[str] = None, create: bool = True) -> None:
+        self.capacity = max(1, int(capacity))
+        self.depth = max(1, int(depth))
+        self.stride = _HEADER + 4 * self.depth
+        size = self.capacity * self.stride * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.buf = self.shm.buf.cast("d")
+        if create:
+            self.buf[:] = array("d", bytes(size))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(
+        self,
+        slot: int,
+        owner: int,
+        version: int,
+        reason: int,
+        updated_at: Optional[float],
+        exchange_ts: Optional[float],
+        invalid_since: Optional[float],
+        bids: List[Tuple[float, float]],
+        asks: List[Tuple[float, float]],
+    ) -> None:
+        """目的：写一个槽位。方法：seq 先加一（奇数，读方重试），整行一次切片写入，再加一（偶数）"""
+        k = self.depth
+        bids = bids[:k]
+        asks = asks[:k]
+        row = array("d", (
+            owner, version, reason,
+            _NAN if updated_at is None else updated_at,
+            _NAN if exchange_ts is None else exchange_ts,
+            _NAN if invalid_since is None else invalid_since,
+            len(bids), len(asks),
+        ))
+        for levels in (bids, asks):
+            for price, size in levels:
+                row.append(price)
+                row.append(size)
+            row.extend((0.0, 0.0) * (k - len(levels)))
+        base = slot * self.stride
+        buf = self.buf
+        seq = buf[base] + 1.0
+        buf[base] = seq
+        buf[base + 1:base + self.stride] = row
+        buf[base] = seq + 1.0
+
+    def read(self, slot: int, retries: int = 1000) -> Optional[List[float]]:
+        """
+        目的：无锁读取一个槽位，与写方并发时重试
+        返回：整行（按 _F_* 下标取字段，档位从 _HEADER 开始）；重试耗尽返回 None
+        """
+        base = slot * self.stride
+        buf = self.buf
+        for _ in range(retries):
+            s1 = buf[base]
+            if int(s1) & 1:
+                continue
+            row = buf[base:base + self.stride].tolist()
+            if buf[base] == s1:
+                return row
+        return None
+
+    def close(self) -> None:
+        self.buf.release()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+def _levels(row: List[float], offset: int, n: int, depth: Optional[int] = None) -> List[Tuple[float, float]]:
+    if depth is not None:
+        n = min(n, depth)
+    base = _HEADER + offset
+    return [(row[base + 2 * i], row[base + 2 * i + 1]) for i in range(n)]
+
+
+def _opt(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+class _IngestWorker:
+    """
+    目的：接入进程内的发布逻辑：AsyncMarketIngest 写本进程 OrderBookStore，每帧后发布受影响 token 到共享表
+    方法：帧钩子发布消息涉及的 token 并发送脏槽位；后台协程每 housekeeping_sec 处理订阅命令、发布失步状态变化的 token、
+         每秒发送一次统计（分片状态、失步计数、重同步统计、延迟直方图）
+    """
+
+    def __init__(self, table: SharedQuoteTable, cmd_conn: Any, evt_conn: Any, owned: Dict[str, List[int]], options: Dict[str, Any]) -> None:
+        from src.capture import FrameRecorder
+        from src.metrics import MetricsRegistry
+        from src.resync import BookResyncer
+        from src.ws_async import AsyncMarketIngest
+
+        self.table = table
+        self.cmd_conn = cmd_conn
+        self.evt_conn = evt_conn
+        self.store = OrderBookStore(verify_hash=bool(options.get("verify_hash", False)))
+        # token -> [槽位, owner]
+        self.owned: Dict[str, List[int]] = {str(k): v for k, v in owned.items()}
+        # token -> 已发布的失步原因编码
+        self._published_reason: Dict[str, int] = {}
+        self.recorder = FrameRecorder(options["capture_dir"]) if options.get("capture_dir") else None
+        self.metrics = MetricsRegistry() if options.get("latency_metrics", True) else None
+        self.engine = AsyncMarketIngest(
+            self.store,
+            lambda: list(self.owned),
+            url=options.get("url") or WSS_MARKET_URL,
+            num_connections=int(options.get("num_connections", 1)),
+            resubscribe_check_sec=float(options.get("resubscribe_check_sec", 1.0)),
+            recorder=self.recorder,
+            metrics=self.metrics,
+        )
+        self.engine.add_hook(self._on_frame)
+        self.resyncer = None
+        if options.get("resync_enabled", True):
+            self.resyncer = BookResyncer(self.store, grace_sec=float(options.get("resync_grace_sec", 2.0)))
+            self.resyncer.start(interval_sec=float(options.get("resync_interval_sec", 1.0)))
+        self.housekeeping_sec = float(options.get("housekeeping_sec", 0.05))
+        for tid in self.owned:
+            self._publish(tid)
+
+    def _publish(self, tid: str) -> Optional[int]:
+        """目的：把 token 的当前状态写入其槽位。返回：槽位；未订阅返回 None"""
+        entry = self.owned.get(tid)
+        if entry is None:
+            return None
+        slot, owner = entry
+        q = self.store.export_quote(tid, self.table.depth)
+        if q is None:
+            self.table.write(slot, owner, 0, 0, None, None, None, [], [])
+            self._published_reason[tid] = 0
+            return slot
+        invalid = q["invalid"]
+        reason = REASON_CODES.get(invalid[0], 1) if invalid else 0
+        self.table.write(
+            slot, owner, q["seq"], reason, q["updated_at"], q["exchange_ts"],
+            invalid[1] if invalid else None, q["bids"], q["asks"],
+        )
+        self._published_reason[tid] = reason
+        return slot
+
+    def _send_dirty(self, slots: List[int]) -> None:
+        if slots:
+            self.evt_conn.send_bytes(b"D" + array("i", slots).tobytes())
+
+    async def _on_frame(self, msgs: List[Dict[str, Any]]) -> None:
+        touched: Dict[str, None] = {}
+        for m in msgs:
+            if m.get("event_type") in ("last_trade_price", "tick_size_change"):
+                continue
+            aid = m.get("asset_id") or m.get("assetId")
+            if aid:
+                touched[str(aid)] = None
+            for ch in m.get("price_changes") or ():
+                if isinstance(ch, dict) and ch.get("asset_id"):
+                    touched[str(ch["asset_id"])] = None
+        slots = [s for s in (self._publish(t) for t in touched) if s is not None]
+        self._send_dirty(slots)
+
+    def _handle_command(self, cmd: Dict[str, Any]) -> bool:
+        """目的：处理主进程命令。返回：False 表示应退出"""
+        op = cmd.get("op")
+        if op == "stop":
+            return False
+        if op == "unsub":
+            for tid in cmd.get("ids", []):
+                self.owned.pop(str(tid), None)
+                self._published_reason.pop(str(tid), None)
+        elif op == "sub":
+            for tid, entry in cmd.get("slots", {}).items():
+                self.owned[str(tid)] = list(entry)
+                self._publish(str(tid))
+        return True
+
+    def _stats(self) -> Dict[str, Any]:
+        return {
+            "shards": [asdict(s) for s in self.engine.stats],
+            "desync_counts": dict(self.store.desync_counts),
+            "resync": asdict(self.resyncer.stats) if self.resyncer is not None else None,
+            "metrics": self.metrics.snapshot() if self.metrics is not None else None,
+        }
+
+    async def _housekeeping(self) -> None:
+        last_stats = 0.0
+        while True:
+            try:
+                while self.cmd_conn.poll(0):
+                    if not self._handle_command(self.cmd_conn.recv()):
+                        return
+            except (EOFError, OSError):
+                return
+            # 断线、REST 重同步等不经过帧钩子的失步状态变化
+            invalid = self.store.get_invalid_assets()
+            changed = [
+                tid for tid in self.owned
+                if (REASON_CODES.get(invalid[tid], 1) if tid in invalid else 0) != self._published_reason.get(tid, 0)
+            ]
+            self._send_dirty([s for s in (self._publish(t) for t in changed) if s is not None])
+            now = time.monotonic()
+            if now - last_stats >= 1.0:
+                self.evt_conn.send_bytes(b"S" + json.dumps(self._stats()).encode("utf-8"))
+                last_stats = now
+            await asyncio.sleep(self.housekeeping_sec)
+
+    async def run(self) -> None:
+        ingest = asyncio.ensure_future(self.engine.run())
+        try:
+            await self._housekeeping()
+        finally:
+            self.engine.stop()
+            if self.resyncer is not None:
+                self.resyncer.stop()
+            ingest.cancel()
+            try:
+                await ingest
+            except (asyncio.CancelledError, Exception):
+                pass
+            if self.recorder is not None:
+                self.recorder.close()
+
+
+def _ingest_process_main(
+    shm_name: str, capacity: int, depth: int, cmd_conn: Any, evt_conn: Any,
+    owned: Dict[str, List[int]], options: Dict[str, Any],
+) -> None:
+    """目的：接入进程入口（spawn 启动，须为模块级函数）"""
+    logging.basicConfig(level=options.get("log_level", logging.INFO), format="%(asctime)s [ingest] %(levelname)s %(name)s: %(message)s")
+    table = SharedQuoteTable(capacity, depth, name=shm_name, create=False)
+    try:
+        asyncio.run(_IngestWorker(table, cmd_conn, evt_conn, owned, options).run())
+    finally:
+        table.close()
+
+
+class SharedMemoryQuoteStore:
+    """
+    目的：主进程侧的报价读取接口，与 OrderBookStore 的读取方法同名同语义，可直接替换传给检测与执行逻辑
+    方法：token -> (槽位, owner) 由本类分配并经命令管道同步给接入进程；读取时按槽位无锁 seqlock 读，owner 不符视为无数据；
+         事件线程接收接入进程发回的脏槽位，映射为 condition_id 后供 wait_dirty_markets；深度最多 depth 档
+    """
+
+    def __init__(self, capacity: int = 8192, depth: int = 5, clock: Callable[[], float] = time.monotonic) -> None:
+        self.table = SharedQuoteTable(capacity, depth)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._dirty_cond = threading.Condition(self._lock)
+        self._slots: Dict[str, Tuple[int, int]] = {}
+        self._by_slot: Dict[int, str] = {}
+        self._free: List[int] = []
+        self._next_slot = 0
+        self._next_owner = 0
+        self._markets_by_token: Dict[str, List[str]] = {}
+        self._dirty = ConflatingHandoff()
+        # 接入进程每秒发回的统计；shard_stats 原地更新，main 持有的引用保持有效
+        self.desync_counts: Dict[str, int] = {}
+        self.shard_stats: List[ShardStats] = []
+        self.resync_stats: Optional[Dict[str, Any]] = None
+        self.remote_metrics: Optional[Dict[str, Dict[str, Any]]] = None
+        self._proc: Any = None
+        self._cmd: Any = None
+        self._evt: Any = None
+        self._stop = threading.Event()
+
+    # ---- 订阅与进程管理 ----
+
+    def _allocate(self, ids: List[str]) -> Dict[str, List[int]]:
+        """目的：为新 token 分配槽位与新的 owner 编号。注意：调用方需持有 _lock"""
+        out: Dict[str, List[int]] = {}
+        for tid in ids:
+            if tid in self._slots:
+                continue
+            if self._free:
+                slot = self._free.pop()
+            elif self._next_slot < self.table.capacity:
+                slot = self._next_slot
+                self._next_slot += 1
+            else:
+                logger.error("共享报价表已满（capacity=%d），token %s 未订阅", self.table.capacity, tid)
+                continue
+            self._next_owner += 1
+            self._slots[tid] = (slot, self._next_owner)
+            self._by_slot[slot] = tid
+            out[tid] = [slot, self._next_owner]
+        return out
+
+    def _release(self, ids: List[str]) -> None:
+        """目的：回收 token 的槽位。注意：调用方需持有 _lock"""
+        for tid in ids:
+            entry = self._slots.pop(tid, None)
+            if entry is not None:
+                self._by_slot.pop(entry[0], None)
+                self._free.append(entry[0])
+
+    def start(
+        self,
+        asset_ids_or_getter: Union[List[str], Callable[[], List[str]]],
+        url: str = WSS_MARKET_URL,
+        num_connections: int = 1,
+        resubscribe_check_sec: float = 1.0,
+        verify_hash: bool = False,
+        capture_dir: str = "",
+        resync_enabled: bool = True,
+        resync_interval_sec: float = 1.0,
+        resync_grace_sec: float = 2.0,
+        latency_metrics: bool = True,
+    ) -> None:
+        """
+        目的：启动接入进程与主进程侧的事件线程、订阅同步线程
+        方法：spawn 方式启动（主进程已有多个线程，避免 fork 继承锁状态）；初始订阅随进程参数传入，之后每 resubscribe_check_sec
+             比较 getter 结果并发送 sub/unsub 命令；接入进程内的录制、延迟度量与 REST 重同步由参数开启
+        """
+        def _current() -> List[str]:
+            ids = asset_ids_or_getter() if callable(asset_ids_or_getter) else asset_ids_or_getter
+            return [str(a) for a in dict.fromkeys(ids)]
+
+        with self._lock:
+            owned = self._allocate(_current())
+        ctx = multiprocessing.get_context("spawn")
+        cmd_parent, cmd_child = ctx.Pipe()
+        evt_recv, evt_send = ctx.Pipe(duplex=False)
+        options = {
+            "url": url,
+            "num_connections": num_connections,
+            "resubscribe_check_sec": min(resubscribe_check_sec, 0.5),
+            "verify_hash": verify_hash,
+            "capture_dir": capture_dir,
+            "resync_enabled": resync_enabled,
+            "resync_interval_sec": resync_interval_sec,
+            "resync_grace_sec": resync_grace_sec,
+            "latency_metrics": latency_metrics,
+            "log_level": logging.getLogger().getEffectiveLevel(),
+        }
+        self._proc = ctx.Process(
+            target=_ingest_process_main,
+            args=(self.table.name, self.table.capacity, self.table.depth, cmd_child, evt_send, owned, options),
+            daemon=True,
+            name="orderbook-ingest",
+        )
+        self._proc.start()
+        cmd_child.close()
+        evt_send.close()
+        self._cmd = cmd_parent
+        self._evt = evt_recv
+        threading.Thread(target=self._event_loop, daemon=True, name="shm-events").start()
+
+        def _sync_loop() -> None:
+            while not self._stop.wait(resubscribe_check_sec):
+                try:
+                    self.sync_subscriptions(_current())
+                except (OSError, EOFError) as e:
+                    logger.warning("接入进程订阅同步失败: %s", e)
+                    return
+
+        threading.Thread(target=_sync_loop, daemon=True, name="shm-subscribe").start()
+
+    def sync_subscriptions(self, ids: List[str]) -> None:
+        """目的：按最新 token 列表增量订阅/退订。方法：先发 unsub 再发 sub，接入进程按序处理"""
+        with self._lock:
+            current = set(ids)
+            removed = [t for t in self._slots if t not in current]
+            self._release(removed)
+            added = self._allocate([t for t in ids if t not in self._slots])
+        if removed:
+            self._cmd.send({"op": "unsub", "ids": removed})
+        if added:
+            self._cmd.send({"op": "sub", "slots": added})
+        if removed or added:
+            logger.info("接入进程增量订阅: +%d -%d", len(added), len(removed))
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """目的：通知接入进程退出并释放共享内存"""
+        self._stop.set()
+        if self._proc is not None:
+            try:
+                self._cmd.send({"op": "stop"})
+            except (OSError, EOFError):
+                pass
+            self._proc.join(timeout)
+            if self._proc.is_alive():
+                self._proc.terminate()
+                self._proc.join(timeout)
+        self.table.close()
+        self.table.unlink()
+
+    def _event_loop(self) -> None:
+        """目的：接收接入进程的脏槽位（b"D"）与统计（b"S"），进程退出后结束"""
+        while True:
+            try:
+                data = self._evt.recv_bytes()
+            except (EOFError, OSError):
+                logger.warning("接入进程事件管道已关闭")
+                return
+            tag, body = data[:1], data[1:]
+            if tag == b"D":
+                slots = array("i")
+                slots.frombytes(body)
+                with self._dirty_cond:
+                    now = self._clock()
+                    for slot in slots:
+                        tid = self._by_slot.get(slot)
+                        for cid in self._markets_by_token.get(tid, ()) if tid else ():
+                            self._dirty.mark(cid, now)
+                    if self._dirty:
+                        self._dirty_cond.notify_all()
+            elif tag == b"S":
+                self._apply_stats(json.loads(body))
+
+    def _apply_stats(self, stats: Dict[str, Any]) -> None:
+        self.desync_counts = stats.get("desync_counts") or {}
+        self.resync_stats = stats.get("resync")
+        self.remote_metrics = stats.get("metrics")
+        names = {f.name for f in fields(ShardStats)}
+        shards = [ShardStats(**{k: v for k, v in s.items() if k in names}) for s in stats.get("shards") or []]
+        self.shard_stats[:] = shards
+
+    # ---- 与 OrderBookStore 相同的读取接口 ----
+
+    def set_markets(self, markets: List[Dict[str, Any]]) -> None:
+        """目的：同 OrderBookStore.set_markets，建立 token -> market 反向索引供脏市场通知"""
+        index: Dict[str, List[str]] = {}
+        for m in markets:
+            cid = m.get("condition_id")
+            if not cid:
+                continue
+            for key in ("token_id_yes", "token_id_no"):
+                tid = m.get(key)
+                if tid:
+                    index.setdefault(str(tid), []).append(cid)
+        with self._lock:
+            self._markets_by_token = index
+            self._dirty.retain({cid for cids in index.values() for cid in cids})
+
+    def pop_dirty_markets(self) -> List[str]:
+        with self._lock:
+            return self._dirty.drain(self._clock())
+
+    def wait_dirty_markets(self, timeout: Optional[float] = None) -> List[str]:
+        with self._dirty_cond:
+            if not self._dirty:
+                self._dirty_cond.wait(timeout)
+            return self._dirty.drain(self._clock())
+
+    def get_handoff_stats(self) -> HandoffStats:
+        with self._lock:
+            return self._dirty.snapshot()
+
+    def _row(self, asset_id: str) -> Optional[List[float]]:
+        """目的：读 token 的槽位；未订阅、owner 不符（槽位已复用或接入进程尚未写入）或读失败返回 None"""
+        entry = self._slots.get(str(asset_id))
+        if entry is None:
+            return None
+        row = self.table.read(entry[0])
+        if row is None or int(row[_F_OWNER]) != entry[1]:
+            return None
+        return row
+
+    def _best(self, row: Optional[List[float]], is_bid: bool) -> Optional[float]:
+        if row is None:
+            return None
+        n = int(row[_F_NBIDS] if is_bid else row[_F_NASKS])
+        if n <= 0:
+            return None
+        return row[_HEADER + (0 if is_bid else 2 * self.table.depth)]
+
+    def get_best_bid(self, asset_id: str) -> Optional[float]:
+        return self._best(self._row(asset_id), True)
+
+    def get_best_ask(self, asset_id: str) -> Optional[float]:
+        return self._best(self._row(asset_id), False)
+
+    def get_seq(self, asset_id: str) -> int:
+        row = self._row(asset_id)
+        return 0 if row is None else int(row[_F_VERSION])
+
+    def is_valid(self, asset_id: str) -> bool:
+        row = self._row(asset_id)
+        return row is None or int(row[_F_REASON]) == 0
+
+    def _age(self, row: Optional[List[float]], now: float) -> Optional[float]:
+        if row is None:
+            return None
+        updated = _opt(row[_F_UPDATED])
+        return None if updated is None else now - updated
+
+    def get_market_snapshot(self, token_id_yes: str, token_id_no: str, with_depth: bool = False) -> MarketSnapshot:
+        """
+        目的：同 OrderBookStore.get_market_snapshot
+        方法：两腿各自 seqlock 一致，但不是同一时刻的原子读；下单前 is_pair_current 比对两腿版本，撕裂的组合不会被执行；
+             with_depth 时深度取自同一次读到的行，与该腿的报价、版本一致
+        """
+        ty, tn = str(token_id_yes), str(token_id_no)
+        ry = self._row(ty)
+        rn = self._row(tn)
+        now = self._clock()
+        return MarketSnapshot(
+            token_id_yes=ty,
+            token_id_no=tn,
+            bid_yes=self._best(ry, True),
+            ask_yes=self._best(ry, False),
+            bid_no=self._best(rn, True),
+            ask_no=self._best(rn, False),
+            seq_yes=0 if ry is None else int(ry[_F_VERSION]),
+            seq_no=0 if rn is None else int(rn[_F_VERSION]),
+            age_yes=self._age(ry, now),
+            age_no=self._age(rn, now),
+            valid=(ry is None or int(ry[_F_REASON]) == 0) and (rn is None or int(rn[_F_REASON]) == 0),
+            depth_yes=self._row_depth(ry) if with_depth else None,
+            depth_no=self._row_depth(rn) if with_depth else None,
+        )
+
+    def is_pair_current(self, token_id_yes: str, token_id_no: str, seq_yes: int, seq_no: int) -> bool:
+        ry = self._row(token_id_yes)
+        rn = self._row(token_id_no)
+        if ry is None or rn is None:
+            return seq_yes == 0 and seq_no == 0 and ry is None and rn is None
+        return (
+            int(ry[_F_REASON]) == 0 and int(rn[_F_REASON]) == 0
+            and int(ry[_F_VERSION]) == seq_yes and int(rn[_F_VERSION]) == seq_no
+        )
+
+    def _row_depth(self, row: Optional[List[float]], depth: Optional[int] = None) -> Dict[str, List[Tuple[float, float]]]:
+        if row is None:
+            return {"bids": [], "asks": []}
+        return {
+            "bids": _levels(row, 0, int(row[_F_NBIDS]), depth),
+            "asks": _levels(row, 2 * self.table.depth, int(row[_F_NASKS]), depth),
+        }
+
+    def get_depth(self, asset_id: str, depth: Optional[int] = None) -> Dict[str, List[Tuple[float, float]]]:
+        """目的：同 OrderBookStore.get_depth，但最多返回共享表的 depth 档"""
+        return self._row_depth(self._row(asset_id), depth)
+
+    def estimate_fill(
+        self, asset_id: str, side: str, size: Optional[float] = None, limit_price: Optional[float] = None,
+    ) -> FillEstimate:
+        """目的：同 OrderBookStore.estimate_fill，但只能看到共享表的 depth 档，更深的流动性不计入（结果偏保守）"""
+        is_buy = _side_is_buy(side)
+        book = self.get_depth(asset_id)
+        return walk_levels(book["asks"] if is_buy else book["bids"], size, limit_price, is_buy)
+
+    def get_vwap(self, asset_id: str, side: str, size: float) -> Optional[float]:
+        est = self.estimate_fill(asset_id, side, size)
+        return est.vwap if est.complete else None
+
+    def get_worst_price(self, asset_id: str, side: str, size: float) -> Optional[float]:
+        est = self.estimate_fill(asset_id, side, size)
+        return est.worst_price if est.complete else None
+
+    def max_size_under_limit(self, asset_id: str, side: str, limit_price: float) -> float:
+        return self.estimate_fill(asset_id, side, None, limit_price).filled
+
+    def get_all_asset_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._slots)
+
+    def get_quote_age(self, asset_id: str) -> Optional[float]:
+        return self._age(self._row(asset_id), self._clock())
+
+    def get_exchange_ts(self, asset_id: str) -> Optional[float]:
+        row = self._row(asset_id)
+        return None if row is None else _opt(row[_F_EXCHANGE_TS])
+
+    def get_invalid_assets(self, older_than_sec: float = 0.0) -> Dict[str, str]:
+        """目的：同 OrderBookStore.get_invalid_assets（失步起始时间由接入进程记录）"""
+        now = self._clock()
+        out: Dict[str, str] = {}
+        for tid in self.get_all_asset_ids():
+            row = self._row(tid)
+            if row is None or int(row[_F_REASON]) == 0:
+                continue
+            since = _opt(row[_F_INVALID_SINCE])
+            if since is None or now - since >= older_than_sec:
+                out[tid] = _REASON_NAMES.get(int(row[_F_REASON]), "gap")
+        return out
+
+    def get_freshness(
+        self, asset_ids: Optional[List[str]] = None, max_age_sec: Optional[float] = None,
+    ) -> QuoteFreshness:
+        """目的：同 OrderBookStore.get_freshness"""
+        updated: Dict[str, float] = {}
+        for tid in self.get_all_asset_ids():
+            row = self._row(tid)
+            ts = None if row is None else _opt(row[_F_UPDATED])
+            if ts is not None:
+                updated[tid] = ts
+        return summarize_freshness(self._clock(), updated, asset_ids, max_age_sec)
@@ -0,0 +1,109 @@
+# 目的：并行参数扫描：把一组配置变体（min_profit、fee_bps、maker_bid_spread、default_size、波动窗口/阈值等）
+#       分发到多进程，各自对同一份录制数据做回测，合并为一张按收益排序的结果表，代替「改配置 -> 部署 -> 等几小时」
+# 方法：先用 capture.consolidate_capture 把录制合并解压成单个 .bin；ProcessPoolExecutor 的每个 worker 在初始化时记下该路径，
+#       回测时 iter_frames 以 mmap 只读映射（各进程共享同一份页缓存，不各自读入/解压）；每个变体跑一次 backtest.run_backtest
+
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.backtest import STRATEGIES, run_backtest
+from src.capture import consolidate_capture
+
+# worker 进程内的共享输入（由 _init_worker 设置，避免每个任务重复序列化市场列表）
+_WORKER_PATH: Optional[str] = None
+_WORKER_MARKETS: List[Dict[str, Any]] = []
+_WORKER_BASE: Dict[str, Any] = {}
+_WORKER_HOLD: float = 60.0
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    目的：把参数网格展开为配置变体列表
+    方法：按键名排序后做笛卡尔积，顺序确定；空网格返回单个空变体（即只跑基准配置）
+    """
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(list(grid[k]) for k in keys))]
+
+
+def _init_worker(path: str, markets: List[Dict[str, Any]], base_config: Dict[str, Any], hold_sec: float) -> None:
+    global _WORKER_PATH, _WORKER_MARKETS, _WORKER_BASE, _WORKER_HOLD
+    _WORKER_PATH = path
+    _WORKER_MARKETS = markets
+    _WORKER_BASE = base_config
+    _WORKER_HOLD = hold_sec
+
+
+def _run_variant(job: Tuple[int, Dict[str, Any]]) -> Tuple[int, Dict[str, Any], Dict[str, Any]]:
+    """目的：worker 内跑一个变体。返回：(变体序号, 覆盖参数, 回测结果字典)"""
+    index, overrides = job
+    config = dict(_WORKER_BASE)
+    config.update(overrides)
+    result = run_backtest(_WORKER_PATH, _WORKER_MARKETS, config, volatility_hold_sec=_WORKER_HOLD)
+    return index, overrides, result.to_dict()
+
+
+def rank_results(rows: List[Dict[str, Any]], key: str = "total_pnl") -> List[Dict[str, Any]]:
+    """目的：按指标降序排序并写入 rank；同分按变体序号，保证排序稳定"""
+    ranked = sorted(rows, key=lambda r: (-r["result"][key], r["index"]))
+    for i, row in enumerate(ranked, 1):
+        row["rank"] = i
+    return ranked
+
+
+def run_sweep(
+    paths: Union[str, List[str]],
+    markets: List[Dict[str, Any]],
+    grid: Dict[str, List[Any]],
+    base_config: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    work_dir: Optional[str] = None,
+    volatility_hold_sec: float = 60.0,
+    rank_by: str = "total_pnl",
+) -> List[Dict[str, Any]]:
+    """
+    目的：对参数网格并行回测并返回排好序的结果
+    方法：录制合并为 work_dir（缺省为临时目录）下的 sweep.bin，worker 以 mmap 共享读取；结果按 rank_by 降序
+    返回：[{"rank", "index", "params", "result"}, ...]，result 为 BacktestResult.to_dict()
+    """
+    variants = expand_grid(grid)
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="sweep-")
+    shared = os.path.join(work_dir, "sweep.bin")
+    try:
+        consolidate_capture(paths, shared)
+        rows: List[Dict[str, Any]] = []
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared, markets, dict(base_config or {}), volatility_hold_sec),
+        ) as pool:
+            for index, params, result in pool.map(_run_variant, list(enumerate(variants))):
+                rows.append({"index": index, "params": params, "result": result})
+        return rank_results(rows, rank_by)
+    finally:
+        if own_dir:
+            # 合并中途失败时 sweep.bin 可能不存在或不完整，整个临时目录一并删除
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_table(rows: List[Dict[str, Any]], limit: Optional[int] = None) -> str:
+    """目的：把排序结果格式化为文本表：排名、参数、总 PnL 及各策略成交数/PnL/命中率"""
+    rows = rows[:limit] if limit else rows
+    if not rows:
+        return "(无结果)"
+    keys = sorted({k for r in rows for k in r["params"]})
+    header = ["rank"] + keys + ["total_pnl"]
+    for name in STRATEGIES:
+        header += ["%s_trades" % name, "%s_pnl" % name, "%s_hit%%" % name]
+    lines = ["\t".join(header)]
+    for r in rows:
+        cells = [str(r["rank"])] + [str(r["params"].get(k, "")) for k in keys] + ["%.4f" % r["result"]["total_pnl"]]
+        for name in STRATEGIES:
+            st = r["result"]["strategies"][name]
+            cells += [str(st["trades"]), "%.4f" % st["pnl"], "%.1f" % (st["hit_rate"] * 100)]
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
@@ -1,9 +1,16 @@
 # 目的：套利机会出现时推送消息到 Telegram Bot，便于远程提醒
 # 方法：从环境变量读 TELEGRAM_BOT_TOKEN、TELEGRAM_CHAT_ID，用 Bot API sendMessage 发送；未配置则跳过
+# 非阻塞：start_notifier 启动后台 TelegramNotifier，notify_* 只把消息放入有界队列（满时丢弃最旧），
+#       由工作线程用复用连接的 Session 发送：突发消息合并为摘要、按 min_interval_sec 限速、429 按 retry_after 等待重试，
+#       Telegram 故障不会拖慢检测与下单；未启动时 notify_* 退回同步发送
 
 import logging
 import os
-from typing import Optional
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, List, Optional
 
 import requests
 
@@ -36,6 +43,245 @@ def send_telegram_message(text: str, bot_token: Optional[str] = None, chat_id: O
         return False
 
 
+# Telegram 单条消息的最大长度（字符）
+TELEGRAM_MAX_LEN = 4096
+# 摘要中各条消息之间的分隔
+DIGEST_SEPARATOR = "\n\n━━━━━━━━\n\n"
+
+
+@dataclass
+class NotifierStats:
+    """
+    目的：后台推送的累计统计，供状态日志
+    方法：enqueued 为入队消息数，dropped 为队列满时被丢弃的最旧消息数；sent 为成功发送的 Telegram 消息数（一条摘要算一条），
+         digests 为合并了多条提醒的摘要数；rate_limited 为收到 429 的次数，failed 为重试耗尽后放弃的消息数
+    """
+    enqueued: int = 0
+    dropped: int = 0
+    sent: int = 0
+    digests: int = 0
+    rate_limited: int = 0
+    failed: int = 0
+    queued: int = 0
+
+
+def pack_digests(texts: List[str], limit: int = TELEGRAM_MAX_LEN) -> List[str]:
+    """
+    目的：把一批提醒合并为尽量少的消息，每条不超过 Telegram 长度上限
+    方法：按顺序拼接，超出 limit 时另起一条；多条合并的消息加「N 条提醒」标题；单条超长的截断
+    """
+    out: List[str] = []
+    chunk: List[str] = []
+
+    def _flush() -> None:
+        if not chunk:
+            return
+        out.append(chunk[0] if len(chunk) == 1 else "📬 %d 条提醒\n\n%s" % (len(chunk), DIGEST_SEPARATOR.join(chunk)))
+        chunk.clear()
+
+    header = len("📬 999 条提醒\n\n")
+    for text in texts:
+        text = text if len(text) <= limit - header else text[:limit - header - 3] + "..."
+        size = header + sum(len(t) for t in chunk) + len(DIGEST_SEPARATOR) * len(chunk) + len(text)
+        if chunk and size > limit:
+            _flush()
+        chunk.append(text)
+    _flush()
+    return out
+
+
+class TelegramNotifier:
+    """
+    目的：后台推送 Telegram，热路径只入队
+    方法：enqueue 在锁内追加到有界 deque（超出 max_queue 丢弃最旧）后立即返回；工作线程取到第一条后再等 digest_window_sec
+         收集同一突发内的其他消息，pack_digests 合并后逐条发送。发送用 requests.Session（连接复用），两次发送至少间隔
+         min_interval_sec；429 按响应中的 retry_after（或 Retry-After 头）等待后重试，网络错误与 5xx 指数退避重试，
+         最多 max_retries 次；stop 时尽量发完队列（受 timeout 限制）
+    """
+
+    def __init__(
+        self,
+        bot_token: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        max_queue: int = 100,
+        digest_window_sec: float = 2.0,
+        min_interval_sec: float = 1.0,
+        max_retries: int = 3,
+        timeout: float = 10.0,
+        session: Optional[Any] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.bot_token = (bot_token or os.getenv("TELEGRAM_BOT_TOKEN") or "").strip()
+        self.chat_id = (chat_id or os.getenv("TELEGRAM_CHAT_ID") or "").strip()
+        self.max_queue = max(1, int(max_queue))
+        self.digest_window_sec = digest_window_sec
+        self.min_interval_sec = min_interval_sec
+        self.max_retries = max(0, int(max_retries))
+        self.timeout = timeout
+        self.stats = NotifierStats()
+        self._session = session
+        self._clock = clock
+        self._queue: Deque[str] = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_send = float("-inf")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bot_token and self.chat_id)
+
+    def enqueue(self, text: str) -> bool:
+        """目的：热路径入队，不做任何 I/O。返回：是否已入队（未配置 token/chat_id 时为 False）"""
+        if not self.enabled:
+            return False
+        with self._cond:
+            self._queue.append(text)
+            self.stats.enqueued += 1
+            while len(self._queue) > self.max_queue:
+                self._queue.popleft()
+                self.stats.dropped += 1
+            self._cond.notify()
+        return True
+
+    def get_stats(self) -> NotifierStats:
+        with self._cond:
+            self.stats.queued = len(self._queue)
+            return NotifierStats(**vars(self.stats))
+
+    def start(self) -> threading.Thread:
+        """目的：启动工作线程（daemon）"""
+        if self._session is None:
+            self._session = requests.Session()
+        t = threading.Thread(target=self._run, daemon=True, name="telegram-notifier")
+        self._thread = t
+        t.start()
+        return t
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """目的：停止工作线程；线程会在 timeout 内尽量发完剩余队列"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take_batch(self) -> List[str]:
+        """目的：阻塞取一批消息：等到第一条后再收集 digest_window_sec 内到达的其余消息（停止时不再等待）"""
+        with self._cond:
+            while not self._queue and not self._stop.is_set():
+                self._cond.wait(0.5)
+            if not self._queue:
+                return []
+            deadline = self._clock() + self.digest_window_sec
+            while not self._stop.is_set():
+                left = deadline - self._clock()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            batch = list(self._queue)
+            self._queue.clear()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stop.is_set():
+                    return
+                continue
+            messages = pack_digests(batch)
+            self.stats.digests += sum(1 for m in messages if m.startswith("📬"))
+            for text in messages:
+                if self.send(text):
+                    self.stats.sent += 1
+                else:
+                    self.stats.failed += 1
+
+    def _wait(self, seconds: float) -> None:
+        """目的：限速/退避等待；停止后不再等待，尽快发完剩余消息"""
+        if seconds > 0 and not self._stop.is_set():
+            self._stop.wait(seconds)
+
+    def send(self, text: str) -> bool:
+        """
+        目的：同步发送一条消息（工作线程内调用），含限速与重试
+        方法：POST sendMessage；200 成功；429 读 parameters.retry_after 等待后重试；5xx 与网络异常按 1s、2s、4s… 退避重试；
+             其余 4xx 视为不可重试直接失败
+        """
+        if self._session is None:
+            self._session = requests.Session()
+        url = TELEGRAM_API % self.bot_token
+        for attempt in range(self.max_retries + 1):
+            self._wait(self._last_send + self.min_interval_sec - self._clock())
+            self._last_send = self._clock()
+            try:
+                r = self._session.post(url, data={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+            except Exception as e:
+                logger.warning("Telegram 发送异常（第 %d 次）: %s", attempt + 1, e)
+                self._wait(2.0 ** attempt)
+                continue
+            if r.status_code == 200:
+                return True
+            if r.status_code == 429:
+                self.stats.rate_limited += 1
+                retry_after = _retry_after(r)
+                logger.warning("Telegram 限流，%.0fs 后重试", retry_after)
+                self._wait(retry_after)
+                continue
+            logger.warning("Telegram 发送失败: status=%s body=%s", r.status_code, r.text[:200])
+            if r.status_code < 500:
+                return False
+            self._wait(2.0 ** attempt)
+        return False
+
+
+def _retry_after(resp: Any, default: float = 1.0) -> float:
+    """目的：解析 429 响应的等待秒数。方法：优先 JSON parameters.retry_after，其次 Retry-After 头"""
+    try:
+        return float(resp.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return default
+
+
+# 进程内的后台推送器；未启动时 notify_* 同步发送
+_notifier: Optional[TelegramNotifier] = None
+
+
+def start_notifier(**kwargs: Any) -> Optional[TelegramNotifier]:
+    """
+    目的：启动全局后台推送器，之后 notify_* 只入队
+    方法：kwargs 透传给 TelegramNotifier；未配置 TELEGRAM_* 时不启动，返回 None
+    """
+    global _notifier
+    notifier = TelegramNotifier(**kwargs)
+    if not notifier.enabled:
+        return None
+    notifier.start()
+    _notifier = notifier
+    return notifier
+
+
+def stop_notifier(timeout: float = 5.0) -> None:
+    """目的：停止全局后台推送器（尽量发完队列），之后 notify_* 恢复同步发送"""
+    global _notifier
+    notifier, _notifier = _notifier, None
+    if notifier is not None:
+        notifier.stop(timeout)
+
+
+def _dispatch(text: str) -> bool:
+    """目的：有后台推送器时入队，否则同步发送"""
+    notifier = _notifier
+    if notifier is not None:
+        return notifier.enqueue(text)
+    return send_telegram_message(text)
+
+
 # Polymarket 市场页面 URL（用 condition_id 可跳转或搜索）
 def _market_url(condition_id: str) -> str:
     if not condition_id or not condition_id.strip():
@@ -149,10 +395,10 @@ def format_maker_arb_opportunity(signal: MakerArbitrageSignal) -> str:
 def notify_arb_opportunity(signal: ArbitrageSignal) -> bool:
     """
     目的：出现 Taker/Merge 套利机会时推送到 Telegram；供 run_once 或 execution 层调用
-    方法：格式化 signal 后调用 send_telegram_message；未配置 TELEGRAM_* 则跳过
+    方法：格式化 signal 后入队（后台推送器已启动时）或同步 send_telegram_message；未配置 TELEGRAM_* 则跳过
     """
     text = format_arb_opportunity(signal)
-    return send_telegram_message(text)
+    return _dispatch(text)
 
 
 def notify_split_arb_opportunity(signal: SplitArbitrageSignal) -> bool:
@@ -160,7 +406,7 @@ def notify_split_arb_opportunity(signal: SplitArbitrageSignal) -> bool:
     目的：出现 Split 套利机会时推送到 Telegram
     """
     text = format_split_arb_opportunity(signal)
-    return send_telegram_message(text)
+    return _dispatch(text)
 
 
 def notify_maker_arb_opportunity(signal: MakerArbitrageSignal) -> bool:
@@ -168,7 +414,7 @@ def notify_maker_arb_opportunity(signal: MakerArbitrageSignal) -> bool:
     目的：出现 Maker 套利机会时推送到 Telegram
     """
     text = format_maker_arb_opportunity(signal)
-    return send_telegram_message(text)
+    return _dispatch(text)
 
 
 def notify_startup() -> bool:
@@ -198,4 +444,4 @@ def notify_heartbeat() -> bool:
     方法：发送固定文案；未配置 TELEGRAM_* 时返回 False，不抛异常
     """
     text = "⏱ Polysportarb 策略正在 Railway 运行中"
-    return send_telegram_message(text)
+    return _dispatch(text)
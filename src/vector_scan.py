@@ -0,0 +1,203 @@
+# 目的：向量化的全市场套利扫描：一次 NumPy 运算算出所有市场的 Merge/Split/Maker 边际，只为命中的市场生成信号
+# 方法：从 QuoteTable 按预先解析好的 YES/NO 槽位 gather 出四列报价，按与 arbitrage.check_* 相同的过滤与公式
+#       （0.01/0.99 区间、fee_bps、min_profit、maker_bid_spread）做逐元素比较，返回命中下标
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.arbitrage import ArbitrageSignal, MakerArbitrageSignal, SplitArbitrageSignal
+from src.quote_table import QuoteTable
+
+
+@dataclass
+class VectorHits:
+    """
+    目的：一次向量扫描的结果，下标均指向扫描输入的行（即 VectorScanner 的市场顺序）
+    方法：*_idx 为命中行下标；*_net 为每行的单位净利润（未命中行可能为 NaN 或低于阈值）；maker_bid_* 为 Maker 挂单价；
+         bid_*/ask_* 为参与计算的报价列，seq_* 为同一时刻两腿的更新序号（供下单前 is_pair_current 校验），供只为命中行生成信号
+    """
+    bid_yes: Any
+    ask_yes: Any
+    bid_no: Any
+    ask_no: Any
+    merge_idx: Any
+    split_idx: Any
+    maker_idx: Any
+    merge_net: Any
+    split_net: Any
+    maker_net: Any
+    maker_bid_yes: Any
+    maker_bid_no: Any
+    seq_yes: Optional[Any] = None
+    seq_no: Optional[Any] = None
+
+
+def _in_band(x: Any) -> Any:
+    """目的：与 check_* 一致，排除 0.01/0.99 附近的不活跃报价；NaN 比较恒为 False，天然被排除"""
+    return (x > 0.01) & (x < 0.99)
+
+
+def compute_edge_hits(
+    bid_yes: Any,
+    ask_yes: Any,
+    bid_no: Any,
+    ask_no: Any,
+    min_profit: float = 0.005,
+    fee_bps: float = 0.0,
+    maker_bid_spread: float = 0.01,
+) -> VectorHits:
+    """
+    目的：对 N 个市场同时计算三种策略的边际并筛出命中
+    方法：
+    - Merge：net = 1 - (ask_yes + ask_no) - fee，两腿 ask 在区间内且 net >= min_profit
+    - Split：net = (bid_yes + bid_no) - 1 - fee，两腿 bid 在区间内且 net >= min_profit
+    - Maker：maker_bid = ask - spread，低于当前 bid 时改为 bid + 0.001；两腿 ask 与 maker_bid 在区间内、
+             合计 < 1 且 net = 1 - 合计 - fee >= min_profit
+    缺失报价用 NaN 表示
+    """
+    bid_yes = np.asarray(bid_yes, dtype=np.float64)
+    ask_yes = np.asarray(ask_yes, dtype=np.float64)
+    bid_no = np.asarray(bid_no, dtype=np.float64)
+    ask_no = np.asarray(ask_no, dtype=np.float64)
+    fee = fee_bps / 10000.0 if fee_bps else 0.0
+
+    with np.errstate(invalid="ignore"):
+        asks_ok = _in_band(ask_yes) & _in_band(ask_no)
+        merge_net = (1.0 - (ask_yes + ask_no)) - fee
+        merge_mask = asks_ok & (merge_net >= min_profit)
+
+        split_net = ((bid_yes + bid_no) - 1.0) - fee
+        split_mask = _in_band(bid_yes) & _in_band(bid_no) & (split_net >= min_profit)
+
+        mby = ask_yes - maker_bid_spread
+        mbn = ask_no - maker_bid_spread
+        mby = np.where(mby < bid_yes, bid_yes + 0.001, mby)
+        mbn = np.where(mbn < bid_no, bid_no + 0.001, mbn)
+        sum_maker = mby + mbn
+        maker_net = (1.0 - sum_maker) - fee
+        maker_mask = (
+            asks_ok & _in_band(mby) & _in_band(mbn) & (sum_maker < 1.0) & (maker_net >= min_profit)
+        )
+
+    return VectorHits(
+        bid_yes=bid_yes,
+        ask_yes=ask_yes,
+        bid_no=bid_no,
+        ask_no=ask_no,
+        merge_idx=np.flatnonzero(merge_mask),
+        split_idx=np.flatnonzero(split_mask),
+        maker_idx=np.flatnonzero(maker_mask),
+        merge_net=merge_net,
+        split_net=split_net,
+        maker_net=maker_net,
+        maker_bid_yes=mby,
+        maker_bid_no=mbn,
+    )
+
+
+class VectorScanner:
+    """
+    目的：对一组固定的监控市场反复做向量扫描；市场列表变化时重新构造
+    方法：构造时用 QuoteTable.resolve_markets 解析一次槽位并存为整数数组；scan 时 np.take 取四列后调用 compute_edge_hits
+    """
+
+    def __init__(self, table: QuoteTable, markets: List[Dict[str, Any]]) -> None:
+        self.table = table
+        self.markets = markets
+        idx, ys, ns = table.resolve_markets(markets)
+        self._market_idx = np.asarray(idx, dtype=np.int64)
+        self._yes = np.asarray(ys, dtype=np.int64)
+        self._no = np.asarray(ns, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._market_idx)
+
+    def gather(self) -> Tuple[Any, Any, Any, Any, Any, Any]:
+        """
+        目的：取出全部监控市场的 (bid_yes, ask_yes, bid_no, ask_no, seq_yes, seq_no) 六列
+        方法：QuoteTable.gather_slots 一次持锁读取，报价与序号来自同一时刻
+        """
+        return self.table.gather_slots(self._yes, self._no)
+
+    def scan(
+        self,
+        min_profit: float = 0.005,
+        fee_bps: float = 0.0,
+        maker_bid_spread: float = 0.01,
+    ) -> VectorHits:
+        """目的：一次扫描全部监控市场，返回命中行下标（行序与 self.markets 中有 YES/NO token 的市场一致）"""
+        by, ay, bn, an, sy, sn = self.gather()
+        hits = compute_edge_hits(by, ay, bn, an, min_profit, fee_bps, maker_bid_spread)
+        hits.seq_yes, hits.seq_no = np.asarray(sy, dtype=np.int64), np.asarray(sn, dtype=np.int64)
+        return hits
+
+    def signals(
+        self,
+        hits: VectorHits,
+        default_size: float = 5.0,
+    ) -> Tuple[List[ArbitrageSignal], List[SplitArbitrageSignal], List[MakerArbitrageSignal]]:
+        """
+        目的：只为命中的行生成信号对象，字段与 scan_markets_for_* 的结果一致
+        方法：用 hits 中的报价列、净利润与 Maker 挂单价构造 dataclass；seq_yes/seq_no 取扫描时的序号
+             （hits 来自 compute_edge_hits 直接调用、无序号时为 0，表示未知）
+        """
+        by, ay, bn, an = hits.bid_yes, hits.ask_yes, hits.bid_no, hits.ask_no
+
+        def _seqs(i: int) -> Tuple[int, int]:
+            if hits.seq_yes is None or hits.seq_no is None:
+                return 0, 0
+            return int(hits.seq_yes[i]), int(hits.seq_no[i])
+
+        merge: List[ArbitrageSignal] = []
+        for i in hits.merge_idx.tolist():
+            m = self.markets[int(self._market_idx[i])]
+            sy, sn = _seqs(i)
+            merge.append(ArbitrageSignal(
+                token_id_yes=m["token_id_yes"],
+                token_id_no=m["token_id_no"],
+                price_yes=float(ay[i]),
+                price_no=float(an[i]),
+                size=default_size,
+                expected_profit=float(hits.merge_net[i]) * default_size,
+                condition_id=m.get("condition_id", ""),
+                question=m.get("question", ""),
+                seq_yes=sy,
+                seq_no=sn,
+            ))
+        split: List[SplitArbitrageSignal] = []
+        for i in hits.split_idx.tolist():
+            m = self.markets[int(self._market_idx[i])]
+            sy, sn = _seqs(i)
+            split.append(SplitArbitrageSignal(
+                token_id_yes=m["token_id_yes"],
+                token_id_no=m["token_id_no"],
+                bid_yes=float(by[i]),
+                bid_no=float(bn[i]),
+                size=default_size,
+                expected_profit=float(hits.split_net[i]) * default_size,
+                condition_id=m.get("condition_id", ""),
+                question=m.get("question", ""),
+                seq_yes=sy,
+                seq_no=sn,
+            ))
+        maker: List[MakerArbitrageSignal] = []
+        for i in hits.maker_idx.tolist():
+            m = self.markets[int(self._market_idx[i])]
+            sy, sn = _seqs(i)
+            maker.append(MakerArbitrageSignal(
+                token_id_yes=m["token_id_yes"],
+                token_id_no=m["token_id_no"],
+                maker_bid_yes=float(hits.maker_bid_yes[i]),
+                maker_bid_no=float(hits.maker_bid_no[i]),
+                best_ask_yes=float(ay[i]),
+                best_ask_no=float(an[i]),
+                size=default_size,
+                expected_profit=float(hits.maker_net[i]) * default_size,
+                condition_id=m.get("condition_id", ""),
+                question=m.get("question", ""),
+                seq_yes=sy,
+                seq_no=sn,
+            ))
+        return merge, split, maker
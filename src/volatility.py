@@ -100,10 +100,11 @@ def scan_markets_for_volatility(
     deviation_pct: float = 0.05,
     default_size: float = 5.0,
     max_position: float = 50.0,
+    window_size: int = 20,
 ) -> List[VolatilitySignal]:
     """
     目的：对多个市场的 YES token 检测波动信号（仅对 YES 做单边，NO 可对称扩展）
-    方法：遍历 markets，对 token_id_yes 维护或获取 detector，update 后 check_signal，收集非空信号
+    方法：遍历 markets，对 token_id_yes 维护或获取 detector（新建时用 window_size 个 mid 价做均值窗口），update 后 check_signal，收集非空信号
     """
     signals: List[VolatilitySignal] = []
     for m in markets:
@@ -113,6 +114,7 @@ def scan_markets_for_volatility(
         if ty not in detectors:
             detectors[ty] = VolatilityDetector(
                 token_id=ty,
+                window_size=window_size,
                 deviation_pct=deviation_pct,
                 default_size=default_size,
                 max_position=max_position,
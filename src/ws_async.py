@@ -0,0 +1,219 @@
+# 目的：基于 asyncio 的 CLOB market channel 接入引擎，与线程版 run_websocket_loop 并存
+# 方法：单个事件循环内为每个分片维护一条 WebSocket 连接；应用层 PING/PONG 保活，断线按指数退避 + 抖动重连，
+#       每帧写入 OrderBookStore 后依次 await 已注册的钩子，供下游检测器订阅
+
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from src.orderbook import (
+    WSS_MARKET_URL,
+    OrderBookStore,
+    ShardStats,
+    ingest_frame,
+    plan_resubscription,
+    shard_for_asset,
+)
+
+logger = logging.getLogger(__name__)
+
+# 钩子签名：收到一帧并写入 store 后调用，参数为该帧解析出的消息列表
+FrameHook = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = 0.5,
+    cap: float = 30.0,
+    rng: Callable[[], float] = random.random,
+) -> float:
+    """
+    目的：计算第 attempt 次重连前的等待时间，避免所有连接同时重连冲击服务端
+    方法：指数退避 min(cap, base * 2^attempt)，再乘 [0.5, 1.0) 的随机抖动
+    """
+    ceiling = min(cap, base * (2 ** max(0, attempt)))
+    return ceiling * (0.5 + rng() / 2.0)
+
+
+class AsyncMarketIngest:
+    """
+    目的：在一个事件循环上复用多条订阅连接，支持上千 token 且无需每个 socket 一个线程
+    方法：run() 为每个分片启动一个协程；分片内：连接 -> 订阅 -> 收帧/保活循环；异常时记录到 ShardStats 并退避重连
+    """
+
+    def __init__(
+        self,
+        store: OrderBookStore,
+        asset_ids_or_getter: Union[List[str], Callable[[], List[str]]],
+        url: str = WSS_MARKET_URL,
+        num_connections: int = 1,
+        ping_interval_sec: float = 10.0,
+        pong_timeout_sec: float = 20.0,
+        resubscribe_check_sec: float = 1.0,
+        backoff_base_sec: float = 0.5,
+        backoff_max_sec: float = 30.0,
+        connect: Optional[Callable[[str], Awaitable[Any]]] = None,
+        recorder: Optional[Any] = None,
+        metrics: Optional[Any] = None,
+    ) -> None:
+        self.store = store
+        self.url = url
+        self.num_connections = max(1, int(num_connections))
+        self.ping_interval_sec = ping_interval_sec
+        self.pong_timeout_sec = pong_timeout_sec
+        self.resubscribe_check_sec = resubscribe_check_sec
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.stats: List[ShardStats] = [ShardStats(shard_id=i) for i in range(self.num_connections)]
+        self._asset_ids_or_getter = asset_ids_or_getter
+        self._connect = connect or self._default_connect
+        # 可选的原始帧录制器（src.capture.FrameRecorder）
+        self.recorder = recorder
+        # 可选的延迟度量（src.metrics.MetricsRegistry）
+        self.metrics = metrics
+        self._hooks: List[FrameHook] = []
+        # 分片 -> 当前连接上已订阅的 asset_ids，断线时据此标记失步
+        self._subscribed: Dict[int, List[str]] = {}
+        self._stopping = False
+
+    @staticmethod
+    async def _default_connect(url: str) -> Any:
+        """目的：默认用 websockets 建立连接。方法：关闭库自带 ping，由本引擎发送应用层 PING"""
+        import websockets
+        return await websockets.connect(url, ping_interval=None, max_size=None)
+
+    def add_hook(self, hook: FrameHook) -> None:
+        """目的：注册下游检测器钩子；每帧写入 store 后按注册顺序 await"""
+        self._hooks.append(hook)
+
+    def stop(self) -> None:
+        """目的：请求各分片在当前连接结束后退出，不再重连"""
+        self._stopping = True
+
+    def _shard_ids(self, shard_id: int) -> List[str]:
+        if callable(self._asset_ids_or_getter):
+            ids = list(self._asset_ids_or_getter())
+        else:
+            ids = list(self._asset_ids_or_getter)
+        return [str(a) for a in ids if shard_for_asset(str(a), self.num_connections) == shard_id]
+
+    async def run(self) -> None:
+        """目的：启动全部分片并等待其结束（stop 后）。方法：asyncio.gather 各分片协程"""
+        await asyncio.gather(*(self._run_shard(i) for i in range(self.num_connections)))
+
+    async def _run_shard(self, shard_id: int) -> None:
+        """
+        目的：单个分片的连接生命周期：订阅、收帧、断线退避重连
+        方法：连接成功且收到过消息后重置退避计数；每次异常均写入 ShardStats 并打 warning，不静默吞掉
+        """
+        stats = self.stats[shard_id]
+        attempt = 0
+        while not self._stopping:
+            ids = self._shard_ids(shard_id)
+            stats.asset_count = len(ids)
+            if not ids:
+                # 空分片与已连接分片同频检查订阅列表，新市场落到本分片时尽快连接
+                await asyncio.sleep(self.resubscribe_check_sec)
+                continue
+            conn = None
+            received_before = stats.messages
+            self._subscribed[shard_id] = ids
+            try:
+                conn = await self._connect(self.url)
+                await conn.send(json.dumps({"assets_ids": ids, "type": "MARKET"}))
+                stats.connected = True
+                stats.connects += 1
+                logger.info("分片 %d 已连接，订阅 %d 个 asset_ids", shard_id, len(ids))
+                await self._recv_loop(conn, stats, shard_id, ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.errors += 1
+                stats.last_error = "%s: %s" % (type(e).__name__, e)
+                logger.warning("分片 %d 连接异常: %s", shard_id, stats.last_error)
+            finally:
+                if stats.connected:
+                    stats.connected = False
+                    stats.disconnects += 1
+                    # 断线窗口内的增量已丢失：本分片订阅的 asset 失步，直到重连后的 book 快照或 REST 重同步
+                    self.store.invalidate(self._subscribed.get(shard_id, []), "disconnect")
+                if conn is not None:
+                    try:
+                        await conn.close()
+                    except Exception:
+                        pass
+            if self._stopping:
+                break
+            attempt = 0 if stats.messages > received_before else attempt + 1
+            delay = backoff_delay(attempt, self.backoff_base_sec, self.backoff_max_sec)
+            logger.info("分片 %d 将在 %.2fs 后重连（第 %d 次退避）", shard_id, delay, attempt)
+            await asyncio.sleep(delay)
+
+    async def _recv_loop(self, conn: Any, stats: ShardStats, shard_id: int, subscribed: List[str]) -> None:
+        """
+        目的：收帧并保活；超过 pong_timeout_sec 无任何入站数据视为半开连接，抛出以触发重连
+        方法：recv 以 min(ping_interval_sec, resubscribe_check_sec) 为超时；距上次入站超过 ping_interval_sec 则发送 "PING"，
+             服务端回 "PONG" 或任意帧都刷新存活时间；每 resubscribe_check_sec 检查一次订阅差异并增量订阅
+        """
+        last_seen = time.monotonic()
+        last_ping = last_seen
+        last_check = last_seen
+        wait = min(self.ping_interval_sec, self.resubscribe_check_sec)
+        while not self._stopping:
+            now = time.monotonic()
+            if now - last_check >= self.resubscribe_check_sec:
+                last_check = now
+                subscribed = await self._resubscribe(conn, stats, shard_id, subscribed)
+                self._subscribed[shard_id] = subscribed
+            try:
+                raw = await asyncio.wait_for(conn.recv(), timeout=wait)
+            except asyncio.TimeoutError:
+                now = time.monotonic()
+                if now - last_seen > self.pong_timeout_sec:
+                    raise TimeoutError("%.0fs 内未收到 PONG 或数据" % self.pong_timeout_sec)
+                if now - max(last_seen, last_ping) >= self.ping_interval_sec:
+                    await conn.send("PING")
+                    last_ping = now
+                continue
+            if raw is None:
+                return
+            last_seen = time.monotonic()
+            if raw == "PONG":
+                continue
+            if self.recorder is not None:
+                self.recorder.record(raw)
+            stats.messages += 1
+            stats.last_message_at = last_seen
+            await self._handle_frame(raw)
+
+    async def _resubscribe(self, conn: Any, stats: ShardStats, shard_id: int, subscribed: List[str]) -> List[str]:
+        """目的：在现有连接上增量订阅/退订，并丢弃已退订 token 的订单簿。方法：plan_resubscription 生成帧后逐条发送"""
+        current = self._shard_ids(shard_id)
+        added, removed, frames = plan_resubscription(subscribed, current)
+        if not frames:
+            return subscribed
+        for frame in frames:
+            await conn.send(frame)
+        self.store.remove_assets(removed)
+        stats.asset_count = len(current)
+        logger.info("分片 %d 增量订阅: +%d -%d", shard_id, len(added), len(removed))
+        return list(dict.fromkeys(current))
+
+    async def _handle_frame(self, raw: Union[str, bytes]) -> None:
+        """目的：解码一帧并一次性写入 store，然后通知钩子。方法：ingest_frame（含可选计时）；钩子异常只记录不影响收帧"""
+        msgs = ingest_frame(self.store, raw, self.metrics)
+        if not msgs:
+            return
+        for hook in self._hooks:
+            try:
+                await hook(msgs)
+            except Exception as e:
+                logger.warning("ingest 钩子异常: %s", e)
+
+
+def run_async_ingest(engine: AsyncMarketIngest) -> None:
+    """目的：供 main 在后台线程中运行 asyncio 引擎。方法：asyncio.run(engine.run())"""
+    asyncio.run(engine.run())
@@ -131,3 +131,143 @@ def test_scan_markets_for_arbitrage_collects_signals():
     assert signals[0].condition_id == "c1"
     assert signals[0].price_yes == 0.46
     assert signals[0].price_no == 0.50
+
+
+def test_scan_markets_with_snapshot_uses_pair_and_sets_sequences():
+    """
+    目的：传入 get_snapshot 时每个市场只读一次快照，信号带上两腿序号供下单前校验
+    预期：get_snapshot 每市场调用一次；信号价格来自快照，seq_yes/seq_no 与快照一致
+    """
+    from src.orderbook import MarketSnapshot
+
+    calls = []
+
+    def get_snapshot(ty, tn):
+        calls.append((ty, tn))
+        return MarketSnapshot(ty, tn, 0.47, 0.48, 0.49, 0.50, seq_yes=7, seq_no=9)
+
+    def no_getter(tid):
+        raise AssertionError("不应逐腿读取")
+
+    markets = [{"token_id_yes": "y", "token_id_no": "n", "condition_id": "c"}]
+    sigs = scan_markets_for_arbitrage(markets, get_best_ask=no_getter, min_profit=0.005, get_snapshot=get_snapshot)
+    assert calls == [("y", "n")]
+    assert len(sigs) == 1
+    assert (sigs[0].price_yes, sigs[0].price_no) == (0.48, 0.50)
+    assert (sigs[0].seq_yes, sigs[0].seq_no) == (7, 9)
+
+
+def test_scan_markets_all_strategies_single_snapshot_per_market():
+    """
+    目的：统一检测每个市场只读一次快照，并对同一快照运行所有启用策略，报告各策略命中数
+    预期：两个市场各读一次；c1 命中 merge 与 maker，c2 命中 split；hit_counts 与 quotes 正确
+    """
+    from src.arbitrage import scan_markets_all_strategies
+    from src.orderbook import MarketSnapshot
+
+    books = {
+        "c1": ("y1", "n1", 0.40, 0.45, 0.45, 0.50),
+        "c2": ("y2", "n2", 0.55, 0.56, 0.50, 0.51),
+    }
+    calls = []
+
+    def get_snapshot(ty, tn):
+        calls.append(ty)
+        for _, (y, n, by, ay, bn, an) in books.items():
+            if y == ty:
+                return MarketSnapshot(y, n, by, ay, bn, an, seq_yes=3, seq_no=4)
+
+    markets = [
+        {"token_id_yes": "y1", "token_id_no": "n1", "condition_id": "c1"},
+        {"token_id_yes": "y2", "token_id_no": "n2", "condition_id": "c2"},
+    ]
+    res = scan_markets_all_strategies(markets, get_snapshot, min_profit=0.01, maker_enabled=True)
+    assert calls == ["y1", "y2"]
+    assert res.markets_scanned == 2
+    assert res.hit_counts == {"merge": 1, "split": 1, "maker": 1}
+    assert [s.condition_id for s in res.merge] == ["c1"]
+    assert [s.condition_id for s in res.split] == ["c2"]
+    assert [s.condition_id for s in res.maker] == ["c1"]
+    assert (res.merge[0].seq_yes, res.merge[0].seq_no) == (3, 4)
+    assert res.quotes["n2"] == (0.50, 0.51)
+
+    res = scan_markets_all_strategies(markets, get_snapshot, min_profit=0.01, merge_enabled=False, split_enabled=False)
+    assert res.hit_counts == {"merge": 0, "split": 0, "maker": 0}
+
+
+def test_scan_markets_all_strategies_skips_stale_quotes():
+    """
+    目的：任一腿报价超过 max_quote_age_sec 的市场不参与检测，避免用陈旧报价下单
+    预期：NO 腿 120s 未更新时跳过（stale_skipped=1，无信号、不计入 quotes）；放宽阈值后命中 merge
+    """
+    from src.arbitrage import scan_markets_all_strategies
+    from src.orderbook import MarketSnapshot
+
+    def get_snapshot(ty, tn):
+        return MarketSnapshot(ty, tn, 0.40, 0.45, 0.45, 0.50, age_yes=1.0, age_no=120.0)
+
+    markets = [{"token_id_yes": "y1", "token_id_no": "n1", "condition_id": "c1"}]
+    res = scan_markets_all_strategies(markets, get_snapshot, min_profit=0.01, max_quote_age_sec=60.0)
+    assert res.stale_skipped == 1 and res.markets_scanned == 0
+    assert res.merge == [] and res.quotes == {}
+    res = scan_markets_all_strategies(markets, get_snapshot, min_profit=0.01, max_quote_age_sec=300.0)
+    assert res.stale_skipped == 0 and len(res.merge) == 1
+
+
+def test_walk_joint_sizes_until_marginal_edge_drops():
+    """
+    目的：两腿同步逐档吃单，直到下一份的边际利润低于 min_profit
+    预期：0.40+0.50 吃 30 份、0.42+0.50 吃 20 份、0.42+0.55 边际 0.03 < 0.05 停止；max_size 只截断数量，depth 不变
+    """
+    from src.arbitrage import walk_joint
+
+    asks_yes = [(0.40, 30.0), (0.42, 100.0)]
+    asks_no = [(0.50, 50.0), (0.55, 100.0)]
+    edge = lambda py, pn: 1.0 - py - pn
+    fill = walk_joint(asks_yes, asks_no, edge, min_profit=0.05)
+    assert fill.size == fill.depth == 50
+    assert fill.profit == pytest.approx(30 * 0.10 + 20 * 0.08)
+    assert (fill.worst_yes, fill.worst_no) == (0.42, 0.50)
+    capped = walk_joint(asks_yes, asks_no, edge, min_profit=0.05, max_size=10)
+    assert capped.size == 10 and capped.depth == 50 and capped.worst_yes == 0.40
+    assert capped.profit == pytest.approx(10 * 0.10)
+
+
+def test_scan_markets_all_strategies_sizes_from_depth_and_position():
+    """
+    目的：with_depth 时命中的市场再读一份带深度的快照并按两腿深度定量，可获利深度不足 min_book_depth 的市场拒绝，
+         数量只受单市场剩余仓位与可选的 max_order_size 限制、不受 default_size 限制；价格、序号与深度取自同一份快照
+    预期：可获利深度 50：min_book_depth=60 时无信号；max_position=40、已持 15 时 size=25，不限仓位时 size=50（default_size=5）；
+         max_order_size=20 时 size=20；信号序号来自带深度的快照
+    """
+    from src.arbitrage import scan_markets_all_strategies
+    from src.orderbook import MarketSnapshot
+
+    depth = {
+        "y1": {"bids": [(0.38, 10.0)], "asks": [(0.40, 30.0), (0.42, 100.0)]},
+        "n1": {"bids": [(0.48, 10.0)], "asks": [(0.50, 50.0), (0.55, 100.0)]},
+    }
+
+    def get_snapshot(ty, tn, with_depth=False):
+        if not with_depth:
+            return MarketSnapshot(ty, tn, 0.38, 0.40, 0.48, 0.50, seq_yes=1, seq_no=1)
+        return MarketSnapshot(ty, tn, 0.38, 0.40, 0.48, 0.50, seq_yes=2, seq_no=3, depth_yes=depth[ty], depth_no=depth[tn])
+
+    markets = [{"token_id_yes": "y1", "token_id_no": "n1", "condition_id": "c1"}]
+    kwargs = {"min_profit": 0.05, "split_enabled": False, "with_depth": True, "default_size": 5.0}
+    assert scan_markets_all_strategies(markets, get_snapshot, min_book_depth=60, **kwargs).merge == []
+    res = scan_markets_all_strategies(
+        markets, get_snapshot, min_book_depth=10, max_position=40, get_position={"c1": 15.0}.get, **kwargs,
+    )
+    sig = res.merge[0]
+    assert sig.size == 25 and sig.price_yes == 0.40 and sig.price_no == 0.50
+    assert sig.expected_profit == pytest.approx(25 * 0.10)
+    assert (sig.seq_yes, sig.seq_no) == (2, 3)
+    full = scan_markets_all_strategies(markets, get_snapshot, min_book_depth=10, **kwargs).merge[0]
+    assert full.size == 50 and full.price_yes == 0.42
+    assert full.expected_profit == pytest.approx(30 * 0.10 + 20 * 0.08)
+    assert scan_markets_all_strategies(
+        markets, get_snapshot, max_position=40, get_position={"c1": 40.0}.get, **kwargs,
+    ).merge == []
+    capped = scan_markets_all_strategies(markets, get_snapshot, min_book_depth=10, max_order_size=20.0, **kwargs)
+    assert capped.merge[0].size == 20
@@ -0,0 +1,99 @@
+# 目的：验证回测引擎：在模拟时钟上回放录制帧，按录制深度模拟成交并统计各策略 PnL、机会时长与资金占用
+# 方法：在 tmp_path 下用 FrameRecorder 写入构造好的 book 帧（recv_ns 即模拟时间），再 run_backtest 断言统计
+
+import json
+
+import pytest
+
+from src.backtest import run_backtest, take_liquidity
+from src.capture import FrameRecorder, list_capture_files, load_markets, save_markets
+
+SEC = 1_000_000_000
+MARKET = {"condition_id": "c1", "token_id_yes": "y", "token_id_no": "n", "question": "Q"}
+
+
+def _book(asset, bids, asks):
+    return json.dumps({"event_type": "book", "asset_id": asset, "bids": bids, "asks": asks})
+
+
+def _record(tmp_path, frames):
+    rec = FrameRecorder(str(tmp_path), compress=False)
+    for t, raw in frames:
+        rec.record(raw, recv_ns=int(t * SEC))
+    rec.close()
+    return list_capture_files(str(tmp_path))
+
+
+def test_take_liquidity_respects_limit_and_depth():
+    """
+    目的：限价吃单逐档成交，不越过限价
+    预期：买 10 限价 0.41：0.40 吃 4、0.41 吃 3，共 7；剩余档位为 0.42
+    """
+    filled, notional, rest = take_liquidity([(0.40, 4), (0.41, 3), (0.42, 9)], 10, 0.41, is_buy=True)
+    assert filled == 7
+    assert notional == pytest.approx(4 * 0.40 + 3 * 0.41)
+    assert rest == [(0.42, 9)]
+
+
+def test_backtest_merge_fills_against_recorded_depth(tmp_path):
+    """
+    目的：Merge 机会按两腿录制深度定量并成交，机会持续时间按模拟时钟统计
+    预期：YES 0.40 只有 3 份，下一档 0.45+0.55 已无利润，定量并成交 3 对；机会从 t=1 持续到 t=11（10 秒）
+    """
+    files = _record(tmp_path, [
+        (0, _book("n", [["0.50", "10"]], [["0.55", "5"]])),
+        (1, _book("y", [["0.38", "10"]], [["0.40", "3"], ["0.45", "10"]])),
+        (11, _book("y", [["0.38", "10"]], [["0.50", "10"]])),
+    ])
+    res = run_backtest(files, [MARKET], {"min_profit": 0.01, "min_book_depth": 0, "split_arb_enabled": False})
+    st = res.strategies["merge"]
+    assert st.signals == 1 and st.trades == 1 and st.wins == 1
+    assert st.filled_size == 3
+    assert st.pnl == pytest.approx(3 * (1 - 0.40 - 0.55))
+    assert st.durations == [pytest.approx(10.0)]
+    assert st.capital_used == pytest.approx(3 * 0.40 + 3 * 0.55)
+    assert res.frames == 3 and res.sim_seconds == pytest.approx(11.0)
+
+
+def test_backtest_maker_fills_when_asks_touch_and_times_out(tmp_path):
+    """
+    目的：Maker 挂单在录制 ask 触及挂单价时成交；超时未成交完则撤单并结算已成交部分
+    预期：YES 挂 0.39、NO 挂 0.54；t=2 YES ask 降到 0.39 成交，NO 一直未触及，超时后 YES 按 bid 0.38 平掉，亏损 0.01/份
+    """
+    files = _record(tmp_path, [
+        (0, _book("n", [["0.50", "10"]], [["0.55", "10"]])),
+        (1, _book("y", [["0.30", "10"]], [["0.40", "10"]])),
+        (2, _book("y", [["0.38", "10"]], [["0.39", "10"]])),
+        (20, _book("y", [["0.38", "10"]], [["0.39", "10"]])),
+    ])
+    cfg = {
+        "min_profit": 0.01, "default_size": 5.0, "maker_arb_enabled": True, "maker_bid_spread": 0.01,
+        "merge_arb_enabled": False, "split_arb_enabled": False, "maker_order_timeout_sec": 10.0,
+    }
+    st = run_backtest(files, [MARKET], cfg).strategies["maker"]
+    assert st.signals == 1
+    assert st.trades == 1 and st.wins == 0
+    assert st.pnl == pytest.approx(5 * (0.38 - 0.39))
+    assert st.capital_peak == pytest.approx(5 * (0.39 + 0.54))
+
+
+def test_backtest_is_deterministic(tmp_path):
+    """
+    目的：同一录制与配置多次回测结果一致（不依赖墙钟与随机数）
+    预期：两次 to_dict 除 wall_seconds/speedup 外完全相同
+    """
+    files = _record(tmp_path, [
+        (0, _book("n", [["0.50", "10"]], [["0.55", "5"]])),
+        (1, _book("y", [["0.38", "10"]], [["0.40", "3"]])),
+        (2, _book("y", [["0.46", "10"]], [["0.47", "3"]])),
+        (3, _book("y", [["0.38", "10"]], [["0.40", "3"]])),
+    ])
+    save_markets(str(tmp_path), [MARKET])
+    runs = []
+    for _ in range(2):
+        d = run_backtest(files, load_markets(str(tmp_path)), {"volatility_enabled": True, "min_book_depth": 0}, volatility_hold_sec=1.0).to_dict()
+        d.pop("wall_seconds")
+        d.pop("speedup")
+        runs.append(d)
+    assert runs[0] == runs[1]
+    assert runs[0]["strategies"]["merge"]["signals"] == 2
@@ -0,0 +1,109 @@
+# 目的：验证多结果（negRisk）事件的分组、YES/NO 篮子检测与深度定量，不依赖真实行情
+# 方法：用 OrderBookStore 写入各结果市场的 book 消息，EventIndex 分组后调用 scan_event_groups，断言信号的价格、数量与利润
+
+import pytest
+from src.event_arb import EventIndex, check_event_arbitrage, is_event_signal_current, scan_event_groups
+from src.execution import execute_event_arbitrage
+from src.gamma import events_to_neg_risk_markets
+from src.orderbook import OrderBookStore
+
+
+def _event(outcomes, **extra):
+    ev = {
+        "slug": "cup-winner", "title": "Cup Winner", "negRisk": True, "negRiskMarketID": "0xevt",
+        "markets": [
+            {"conditionId": "c%d" % i, "clobTokenIds": ["y%d" % i, "n%d" % i], "question": "Team %d?" % i,
+             "orderPriceMinTickSize": 0.001}
+            for i in range(outcomes)
+        ],
+    }
+    ev.update(extra)
+    return ev
+
+
+def _book(store, aid, bid, ask, size="100"):
+    store.update_from_message({
+        "event_type": "book", "asset_id": aid,
+        "bids": [{"price": str(bid), "size": size}], "asks": [{"price": str(ask), "size": size}],
+    })
+
+
+def test_events_to_neg_risk_markets_keeps_complete_groups_only():
+    """
+    目的：只取非 augmented 的 negRisk 事件，已关闭或已结算的结果不计入，任一未结算结果无法解析或不可交易则整个事件跳过
+    预期：4 个结果中 1 个已关闭、1 个已结算 -> 2 腿，event_outcomes=2；未结算但 active=False、augmented、缺 token、
+         非 negRisk 事件均无输出
+    """
+    ev = _event(4)
+    ev["markets"][2]["closed"] = True
+    ev["markets"][3]["umaResolutionStatus"] = "resolved"
+    legs = events_to_neg_risk_markets([ev])
+    assert [m["condition_id"] for m in legs] == ["c0", "c1"]
+    assert all(m["event_id"] == "0xevt" and m["event_outcomes"] == 2 and m["neg_risk"] for m in legs)
+    broken = _event(3)
+    broken["markets"][1].pop("clobTokenIds")
+    inactive = _event(3)
+    inactive["markets"][1]["active"] = False
+    assert events_to_neg_risk_markets([_event(3, negRiskAugmented=True), broken, inactive, _event(3, negRisk=False)]) == []
+
+
+def test_event_index_requires_all_outcomes_and_maps_markets():
+    """
+    目的：组内结果不齐（部分结果未被监控）的事件不成组；任一结果市场可定位到所属事件
+    预期：完整事件可由 c1 查到；去掉一腿后索引为空
+    """
+    legs = events_to_neg_risk_markets([_event(3)])
+    index = EventIndex(legs + [{"condition_id": "other", "token_id_yes": "a", "token_id_no": "b"}])
+    assert len(index) == 1
+    assert [g.event_id for g in index.groups_for(["other", "c1", "c2"])] == ["0xevt"]
+    assert len(EventIndex(legs[:2])) == 0
+
+
+def test_scan_event_groups_yes_and_no_baskets_sized_from_depth():
+    """
+    目的：sum(ask_yes) < 1 出 YES 篮子；sum(ask_no) < N-1 出 NO 篮子；数量沿 N 腿深度定量，按剩余仓位与可选的 max_order_size 封顶，
+         不受 default_size 限制
+    预期：YES 0.30+0.30+0.35=0.95 -> 利润 0.05/份 x 100（default_size=5）；NO 篮子 0.60*3=1.80 < 2 -> 利润 0.20/份，
+         max_position=40 时 size=40，max_order_size=20 时 size=20；各腿带市场的 tick_size
+    """
+    store = OrderBookStore()
+    legs = events_to_neg_risk_markets([_event(3)])
+    index = EventIndex(legs)
+    for i, ask_yes in enumerate((0.30, 0.30, 0.35)):
+        _book(store, "y%d" % i, ask_yes - 0.02, ask_yes)
+        _book(store, "n%d" % i, 0.55, 0.60)
+    groups = index.groups_for(["c0"])
+    kwargs = {"min_profit": 0.01, "with_depth": True, "min_book_depth": 10, "default_size": 5.0}
+    sigs = scan_event_groups(groups, store.get_market_snapshot, **kwargs)
+    by_basket = {s.basket: s for s in sigs}
+    yes, no = by_basket["yes"], by_basket["no"]
+    assert [leg.token_id for leg in yes.legs] == ["y0", "y1", "y2"]
+    assert yes.size == 100 and yes.payout == 1.0
+    assert all(leg.tick_size == "0.001" for leg in yes.legs)
+    assert yes.expected_profit == pytest.approx(100 * 0.05)
+    assert no.payout == 2.0 and no.expected_profit == pytest.approx(100 * 0.20)
+    capped = scan_event_groups(groups, store.get_market_snapshot, max_position=40, get_position={"0xevt": 0.0}.get,
+                               yes_enabled=False, **kwargs)
+    assert [s.size for s in capped] == [40]
+    assert [s.size for s in scan_event_groups(groups, store.get_market_snapshot, max_order_size=20.0, **kwargs)] == [20, 20]
+    assert is_event_signal_current(store, yes)
+    _book(store, "y1", 0.40, 0.45)
+    assert not is_event_signal_current(store, yes)
+    assert execute_event_arbitrage(yes, paper=True, is_current=lambda s: is_event_signal_current(store, s)) == []
+
+
+def test_check_event_arbitrage_rejects_missing_leg_or_thin_book():
+    """
+    目的：任一腿无报价不出信号；可获利深度不足 min_book_depth 的事件拒绝
+    预期：y2 无 ask 时无信号；各腿仅 5 份、min_book_depth=10 时无信号
+    """
+    store = OrderBookStore()
+    group = EventIndex(events_to_neg_risk_markets([_event(3)])).groups["0xevt"]
+    for i in range(2):
+        _book(store, "y%d" % i, 0.28, 0.30, size="5")
+    snaps = lambda: [store.get_market_snapshot("y%d" % i, "n%d" % i) for i in range(3)]
+    assert check_event_arbitrage(group, snaps()) is None
+    _book(store, "y2", 0.28, 0.30, size="5")
+    asks = lambda tid: store.get_depth(tid)["asks"]
+    assert check_event_arbitrage(group, snaps(), get_asks=asks, min_book_depth=10) is None
+    assert check_event_arbitrage(group, snaps(), get_asks=asks, min_book_depth=5).size == 5
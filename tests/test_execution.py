@@ -91,3 +91,25 @@ def test_cancel_orders_live_mode_calls_client():
     with patch("src.execution.logger"):
         cancel_orders(client, ["oid1"], paper=False)
     client.cancel_orders.assert_called_once_with(["oid1"])
+
+
+def test_execute_arbitrage_skips_when_quote_moved():
+    """
+    目的：两腿报价自检测后已变化时不应下单，避免用过期报价成交
+    预期：is_current 返回 False 时返回 []，client.create_order 未被调用
+    """
+    client = MagicMock()
+    signal = ArbitrageSignal(
+        token_id_yes="ty",
+        token_id_no="tn",
+        price_yes=0.48,
+        price_no=0.50,
+        size=5.0,
+        expected_profit=0.1,
+        seq_yes=1,
+        seq_no=1,
+    )
+    with patch("src.execution.logger"):
+        result = execute_arbitrage(signal, client=client, paper=False, is_current=lambda s: False)
+    assert result == []
+    client.create_order.assert_not_called()
@@ -53,3 +53,108 @@ def test_run_once_no_markets_no_exception():
     store = OrderBookStore()
     with patch("src.main.execute_arbitrage"):
         run_once(config, store, [], paper=True, client=None, volatility_detectors={})
+
+
+def test_run_dirty_markets_only_evaluates_updated_markets():
+    """
+    目的：事件驱动检测只评估订单簿有更新的市场，未更新的市场不重复扫描
+    预期：只更新 c1 的两腿时，run_once 收到的市场列表仅含 c1，返回值为 1
+    """
+    from src.main import run_dirty_markets, _markets_by_condition
+
+    markets = [
+        {"condition_id": "c1", "token_id_yes": "ty1", "token_id_no": "tn1", "question": "A?"},
+        {"condition_id": "c2", "token_id_yes": "ty2", "token_id_no": "tn2", "question": "B?"},
+    ]
+    store = OrderBookStore()
+    store.set_markets(markets)
+    store.update_from_message({"asset_id": "ty1", "bid": 0.47, "ask": 0.48})
+    store.update_from_message({"asset_id": "tn1", "bid": 0.49, "ask": 0.50})
+    with patch("src.main.run_once") as mock_run:
+        n = run_dirty_markets({}, store, _markets_by_condition(markets), True, None, {}, timeout=0.01)
+    assert n == 1
+    evaluated = mock_run.call_args[0][2]
+    assert [m["condition_id"] for m in evaluated] == ["c1"]
+
+
+def test_run_once_with_tracker_does_not_refire_persistent_opportunity():
+    """
+    目的：同一套利机会持续存在时，后续轮次不重复下单与推送
+    预期：连续三轮 run_once 只执行与推送一次；tracker 记录一个进行中的 merge 机会
+    """
+    from src.opportunity import OpportunityTracker
+
+    config = {"min_profit": 0.005, "fee_bps": 0, "default_size": 5.0, "split_arb_enabled": False}
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "ty1", "bid": 0.47, "ask": 0.48})
+    store.update_from_message({"asset_id": "tn1", "bid": 0.49, "ask": 0.50})
+    markets = [{"token_id_yes": "ty1", "token_id_no": "tn1", "condition_id": "c1", "question": "Test?"}]
+    tracker = OpportunityTracker(cooldown_sec=60.0)
+    with patch("src.main.execute_arbitrage") as mock_exec, patch("src.main.notify_arb_opportunity") as mock_notify:
+        for _ in range(3):
+            run_once(config, store, markets, paper=True, client=None, volatility_detectors={}, tracker=tracker)
+    assert mock_exec.call_count == 1 and mock_notify.call_count == 1
+    stats = tracker.get_stats()
+    assert (stats.open, stats.actions, stats.suppressed) == (1, 1, 2)
+
+
+def test_run_once_failed_execution_does_not_start_cooldown():
+    """
+    目的：下单失败（execute 返回空列表）时 tracker 不记录执行，机会下一轮仍重试；成功后才开始冷却
+    预期：前两轮下单失败均重试；第三轮成功；第四轮在冷却期内不再执行，tracker actions=1
+    """
+    from src.opportunity import OpportunityTracker
+
+    config = {"min_profit": 0.005, "fee_bps": 0, "default_size": 5.0, "split_arb_enabled": False}
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "ty1", "bid": 0.47, "ask": 0.48})
+    store.update_from_message({"asset_id": "tn1", "bid": 0.49, "ask": 0.50})
+    markets = [{"token_id_yes": "ty1", "token_id_no": "tn1", "condition_id": "c1", "question": "Test?"}]
+    tracker = OpportunityTracker(cooldown_sec=60.0)
+    with patch("src.main.execute_arbitrage", side_effect=[[], [], ["o1", "o2"]]) as mock_exec, \
+            patch("src.main.notify_arb_opportunity"):
+        for _ in range(4):
+            run_once(config, store, markets, paper=False, client=MagicMock(), volatility_detectors={}, tracker=tracker)
+    assert mock_exec.call_count == 3
+    assert tracker.get_stats().actions == 1
+
+
+def test_run_once_split_fill_counts_toward_position_limit():
+    """
+    目的：Split 下单成功后也要累加该市场仓位，否则 max_position_per_market 对 Split 不生效
+    预期：第一轮下单 5 份后 positions["c1"]=5；max_position=5 时第二轮不再出 Split 信号
+    """
+    config = {
+        "min_profit": 0.005, "fee_bps": 0, "default_size": 5.0, "merge_arb_enabled": False,
+        "max_position_per_market": 5.0,
+    }
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "ty1", "bid": 0.52, "ask": 0.53})
+    store.update_from_message({"asset_id": "tn1", "bid": 0.50, "ask": 0.51})
+    markets = [{"token_id_yes": "ty1", "token_id_no": "tn1", "condition_id": "c1", "question": "Test?"}]
+    positions = {}
+    with patch("src.main.execute_split_arbitrage", return_value=["ok"]) as mock_exec, \
+            patch("src.main.notify_split_arb_opportunity"):
+        run_once(config, store, markets, paper=False, client=None, volatility_detectors={}, positions=positions)
+        assert positions == {"c1": 5.0}
+        det = run_once(config, store, markets, paper=False, client=None, volatility_detectors={}, positions=positions)
+    assert mock_exec.call_count == 1 and det.split == []
+
+
+def test_run_once_passes_neg_risk_and_tick_size_to_execution():
+    """
+    目的：negRisk 结果市场进入二元策略时，下单需带该市场的 neg_risk 与 tick_size，否则按普通 CTF 订单签名会被拒
+    预期：execute_arbitrage 收到 neg_risk=True、tick_size="0.001"；普通市场为 neg_risk=False、tick_size="0.01"
+    """
+    config = {"min_profit": 0.005, "fee_bps": 0, "default_size": 5.0, "split_arb_enabled": False}
+    store = OrderBookStore()
+    for aid, bid, ask in (("ty1", 0.47, 0.48), ("tn1", 0.49, 0.50), ("ty2", 0.47, 0.48), ("tn2", 0.49, 0.50)):
+        store.update_from_message({"asset_id": aid, "bid": bid, "ask": ask})
+    markets = [
+        {"token_id_yes": "ty1", "token_id_no": "tn1", "condition_id": "c1", "neg_risk": True, "tick_size": "0.001"},
+        {"token_id_yes": "ty2", "token_id_no": "tn2", "condition_id": "c2"},
+    ]
+    with patch("src.main.execute_arbitrage") as mock_exec, patch("src.main.notify_arb_opportunity"):
+        run_once(config, store, markets, paper=True, client=None, volatility_detectors={})
+    opts = {c.args[0].condition_id: (c.kwargs["neg_risk"], c.kwargs["tick_size"]) for c in mock_exec.call_args_list}
+    assert opts == {"c1": (True, "0.001"), "c2": (False, "0.01")}
@@ -0,0 +1,88 @@
+# 目的：验证延迟直方图与度量注册表：分位数误差、帧级单向延迟与阶段耗时记录、Prometheus 输出与 HTTP 暴露
+# 方法：向直方图写入已知分布断言分位数；用带交易所 timestamp 的帧调用 ingest_frame；本地起 /metrics 服务并读取
+
+import urllib.request
+
+import pytest
+
+from src.metrics import LatencyHistogram, MetricsRegistry, start_metrics_server
+from src.orderbook import HandoffStats, OrderBookStore, ingest_frame
+
+
+def test_histogram_quantiles_within_bucket_error():
+    """
+    目的：对数分桶的分位数相对误差在子桶精度内（约 3%），负值单独计数
+    预期：1..1000ms 均匀分布时 p50≈500ms、p99≈990ms、p999≈999ms；max 精确；负值记为 0 且 negative=1
+    """
+    h = LatencyHistogram()
+    for i in range(1, 1001):
+        h.record(i / 1000.0)
+    snap = h.snapshot()
+    assert snap["count"] == 1000
+    assert snap["p50"] == pytest.approx(0.5, rel=0.04)
+    assert snap["p99"] == pytest.approx(0.99, rel=0.04)
+    assert snap["p999"] == pytest.approx(0.999, rel=0.04)
+    assert snap["max"] == 1.0
+    h.record(-0.002)
+    assert h.snapshot(reset=True)["negative"] == 1
+    assert h.snapshot()["count"] == 0 and h.quantile(0.5) is None
+
+
+def test_ingest_frame_records_feed_latency_and_stage_times():
+    """
+    目的：帧带交易所 timestamp 时记录单向延迟（取帧内最新时间戳），并记录解码与写入耗时
+    预期：store 正常写入；feed_latency、decode、apply 各 1 个样本；不带时间戳的帧不计延迟；不传 metrics 时照常写入
+    """
+    import time
+
+    reg = MetricsRegistry()
+    store = OrderBookStore()
+    ts_ms = int((time.time() - 0.25) * 1000)
+    raw = '[{"asset_id": "t1", "bid": 0.4, "ask": 0.5, "timestamp": "%d"}, {"asset_id": "t2", "bid": 0.3, "timestamp": "%d"}]' % (
+        ts_ms - 5000, ts_ms,
+    )
+    msgs = ingest_frame(store, raw, reg)
+    assert len(msgs) == 2 and store.get_best_ask("t1") == 0.5
+    snap = reg.snapshot()
+    assert {k: v["count"] for k, v in snap.items()} == {"apply": 1, "decode": 1, "feed_latency": 1}
+    assert 0.2 < snap["feed_latency"]["max"] < 5.0
+    ingest_frame(store, '{"asset_id": "t1", "bid": 0.41}', reg)
+    assert reg.histogram("feed_latency").count == 1 and reg.histogram("apply").count == 2
+    ingest_frame(store, '{"asset_id": "t1", "bid": 0.42}')
+    assert store.get_best_bid("t1") == 0.42
+    assert "feed_latency n=1" in reg.format_status()
+
+
+def test_metrics_server_serves_prometheus_text():
+    """
+    目的：/metrics 以 Prometheus summary 文本格式输出各直方图，其他路径 404
+    预期：包含 quantile 行与 _count；/other 返回 404
+    """
+    reg = MetricsRegistry()
+    reg.histogram("detect").record(0.002)
+    server = start_metrics_server(reg, 0, host="127.0.0.1")
+    try:
+        base = "http://127.0.0.1:%d" % server.server_port
+        body = urllib.request.urlopen(base + "/metrics", timeout=5).read().decode()
+        assert '# TYPE polyarb_detect_seconds summary' in body
+        assert 'polyarb_detect_seconds{quantile="0.99"}' in body
+        assert "polyarb_detect_seconds_count 1" in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(base + "/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_observe_handoff_exports_depth_and_conflation_gauges():
+    """
+    目的：检测交接的深度、合并次数作为 gauge 输出，等待时间进 handoff_wait 直方图
+    预期：Prometheus 文本含 gauge 类型与数值；handoff_wait 有 1 个样本
+    """
+    reg = MetricsRegistry()
+    reg.observe_handoff(HandoffStats(marked=10, conflated=7, delivered=3, batches=1, max_batch=3, last_wait_sec=0.004), 3)
+    body = reg.render_prometheus()
+    assert "# TYPE polyarb_handoff_conflated_total gauge" in body
+    assert "polyarb_handoff_conflated_total 7.0" in body
+    assert "polyarb_handoff_depth 3.0" in body
+    assert reg.snapshot()["handoff_wait"]["count"] == 1
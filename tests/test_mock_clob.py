@@ -0,0 +1,86 @@
+# 目的：验证本地模拟 CLOB 服务端：合成行情与客户端本地簿一致、套利窗口、突发曲线，以及经真实 WebSocket 接入
+# 方法：SyntheticFlow 直接写入 OrderBookStore 断言；MockClobServer 监听随机端口，用 AsyncMarketIngest 以 url= 连接
+
+import asyncio
+import json
+
+import pytest
+from src.capture import FrameRecorder, list_capture_files
+from src.mock_clob import BurstProfile, MockClobServer, SyntheticFlow, iter_replay, parse_profile
+from src.orderbook import OrderBookStore
+from src.ws_async import AsyncMarketIngest
+
+
+def test_synthetic_flow_keeps_client_books_consistent_and_injects_arb():
+    """
+    目的：按序应用合成消息后，客户端本地簿与生成器一致且从不失步；套利窗口内 YES+NO 卖价合计低于 1
+    预期：desync_counts 为空；最优价与生成器一致；窗口内卖价合计 = 1 - arb_edge，窗口外 > 1
+    """
+    flow = SyntheticFlow(num_markets=5, seed=7, arb_every_sec=1.0, arb_duration_sec=0.5, arb_edge=0.03)
+    store = OrderBookStore()
+    for aid in flow.asset_ids:
+        store.update_from_message(flow.snapshot(aid))
+    saw_arb = False
+    for i in range(300):
+        for msg in flow.step(i * 0.01, 20):
+            store.update_from_message(msg)
+        for m in flow.markets:
+            total = store.get_best_ask(m["token_id_yes"]) + store.get_best_ask(m["token_id_no"])
+            if m["condition_id"] in flow.arb_markets():
+                saw_arb = True
+                assert total == pytest.approx(0.97)
+            else:
+                assert total > 1.0
+    assert store.desync_counts == {}
+    assert saw_arb and flow.arb_windows_opened >= 2
+    for aid, book in flow.books.items():
+        assert store.get_best_bid(aid) == pytest.approx(book.best_bid() / 100)
+        assert store.get_best_ask(aid) == pytest.approx(book.best_ask() / 100)
+
+
+def test_burst_profile_and_replay_timing(tmp_path):
+    """
+    目的：突发曲线按周期放大速率；回放按录制间隔除以 speed 等待
+    预期：burst:10:2:5 在第 1 秒为 5 倍、第 3 秒为 1 倍；非法描述抛 ValueError；回放等待为间隔/speed
+    """
+    prof = parse_profile("burst:10:2:5")
+    assert (prof.factor(1.0), prof.factor(3.0), prof.factor(11.5)) == (5.0, 1.0, 5.0)
+    assert parse_profile("steady") == BurstProfile()
+    with pytest.raises(ValueError):
+        parse_profile("ramp:1")
+    rec = FrameRecorder(str(tmp_path))
+    rec.record("a", recv_ns=1_000_000_000)
+    rec.record("b", recv_ns=3_000_000_000)
+    rec.close()
+    assert list(iter_replay(list_capture_files(str(tmp_path)), speed=4.0)) == [(0.0, b"a"), (0.5, b"b")]
+
+
+def test_mock_server_serves_ingest_over_websocket():
+    """
+    目的：接入引擎以 url= 连接模拟服务端：订阅后收到 book 快照与增量，只收到已订阅 asset 的消息，PING 得到 PONG
+    预期：订阅的两个 token 有最优价，除停止时的断线外无失步；未订阅市场的 token 不在 store 中
+    """
+    pytest.importorskip("websockets")
+    flow = SyntheticFlow(num_markets=3, seed=1)
+    m0 = flow.markets[0]
+    wanted = [m0["token_id_yes"], m0["token_id_no"]]
+
+    async def scenario():
+        server = MockClobServer(flow, rate=300, tick_sec=0.005)
+        url = await server.start()
+        store = OrderBookStore()
+        engine = AsyncMarketIngest(store, wanted, url=url, ping_interval_sec=0.05, resubscribe_check_sec=0.05)
+        task = asyncio.ensure_future(engine.run())
+        await asyncio.sleep(0.5)
+        engine.stop()
+        await asyncio.wait_for(task, 5)
+        await server.stop()
+        return store, engine.stats[0], server
+
+    store, stats, server = asyncio.run(scenario())
+    assert stats.messages > 10 and stats.errors == 0
+    assert set(store.desync_counts) <= {"disconnect"}
+    for aid in wanted:
+        assert store.get_best_bid(aid) == pytest.approx(flow.books[aid].best_bid() / 100)
+    assert store.get_best_bid(flow.markets[1]["token_id_yes"]) is None
+    assert server.messages_sent > 0
@@ -0,0 +1,64 @@
+# 目的：验证套利机会生命周期跟踪：开启/更新/结束转换、冷却与利润变化放行、debounce 合并抖动
+# 方法：注入可控时钟，逐轮调用 OpportunityTracker.update（放行后按需 mark_acted），断言放行的 key 与机会的时间戳、峰值利润和历史
+
+from src.opportunity import OpportunityTracker
+
+
+def test_tracker_gates_repeats_by_cooldown_and_edge_change():
+    """
+    目的：持续存在的机会只在开启、冷却期满或每份利润较上次成功执行变化超过阈值时放行；冷却从 mark_acted 开始
+    预期：t=0 开启放行并记录执行；t=2 同利润不放行；t=4 利润 +0.01 放行；t=40 冷却期满放行；峰值利润与更新次数正确
+    """
+    tr = OpportunityTracker(cooldown_sec=30.0, min_edge_change=0.005, debounce_sec=5.0)
+
+    def step(strategy, edge, now):
+        act = tr.update(strategy, ["c1"], {"c1": edge}, now=now)
+        for key in act:
+            assert tr.mark_acted(strategy, key, edge, now=now)
+        return act
+
+    assert step("merge", 0.02, 0.0) == ["c1"]
+    assert step("merge", 0.02, 2.0) == []
+    assert step("merge", 0.03, 4.0) == ["c1"]
+    assert step("merge", 0.029, 6.0) == []
+    assert step("merge", 0.029, 40.0) == ["c1"]
+    opp = tr.get("merge", "c1")
+    assert (opp.opened_at, opp.last_seen, opp.peak_edge, opp.updates, opp.actions) == (0.0, 40.0, 0.03, 4, 3)
+    assert step("split", 0.02, 41.0) == ["c1"]
+    stats = tr.get_stats()
+    assert (stats.open, stats.opened, stats.actions, stats.suppressed) == (2, 2, 4, 2)
+
+
+def test_tracker_without_mark_acted_keeps_candidate():
+    """
+    目的：update 只返回候选不记录执行；执行失败（未调用 mark_acted）时不开始冷却
+    预期：未 mark_acted 时后续每轮都放行且 actions=0；mark_acted 后同利润不再放行；未跟踪的 key 返回 False
+    """
+    tr = OpportunityTracker(cooldown_sec=30.0)
+    assert tr.update("merge", ["c1"], {"c1": 0.02}, now=0.0) == ["c1"]
+    assert tr.update("merge", ["c1"], {"c1": 0.02}, now=1.0) == ["c1"]
+    assert tr.get("merge", "c1").acted_at is None and tr.get_stats().actions == 0
+    assert tr.mark_acted("merge", "c1", 0.02, now=1.0)
+    assert tr.update("merge", ["c1"], {"c1": 0.02}, now=2.0) == []
+    assert not tr.mark_acted("merge", "c2", 0.02)
+
+
+def test_tracker_debounces_flicker_and_records_history():
+    """
+    目的：消失后 debounce 窗口内再次出现视为同一机会；未被评估的市场不关闭；窗口过后结束并写入历史
+    预期：t=1 消失、t=3 重现不放行且 opened 不变；c2 未评估时保持开启；t=10 消失、t=20 结束，持续 10 秒
+    """
+    tr = OpportunityTracker(cooldown_sec=30.0, debounce_sec=5.0)
+    for key in tr.update("merge", ["c1", "c2"], {"c1": 0.02, "c2": 0.02}, now=0.0):
+        tr.mark_acted("merge", key, 0.02, now=0.0)
+    tr.update("merge", ["c1"], {}, now=1.0)
+    assert tr.get("merge", "c1").closed_at == 1.0
+    assert tr.update("merge", ["c1"], {"c1": 0.02}, now=3.0) == []
+    assert tr.get("merge", "c1").closed_at is None and tr.opened == 2
+    tr.update("merge", ["c1"], {}, now=10.0)
+    assert tr.expire(now=12.0) == 0
+    assert tr.expire(now=20.0) == 1
+    assert tr.get("merge", "c1") is None and tr.get("merge", "c2") is not None
+    assert [(o.key, o.duration) for o in tr.history] == [("c1", 10.0)]
+    assert tr.update("merge", ["c1"], {"c1": 0.02}, now=21.0) == ["c1"]
+    assert tr.get_stats().median_duration_sec == 10.0
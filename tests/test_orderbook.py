@@ -93,3 +93,406 @@ def test_update_from_message_overwrites_previous():
     store.update_from_message({"asset_id": "t", "bid": 0.42, "ask": 0.58})
     assert store.get_best_bid("t") == 0.42
     assert store.get_best_ask("t") == 0.58
+
+
+def test_book_snapshot_unsorted_levels_best_prices():
+    """
+    目的：CLOB book 消息的 bids/asks 不保证最优档在首位，应按价格排序求 best
+    预期：bids 升序给出时 best_bid 为最高价，asks 降序给出时 best_ask 为最低价
+    """
+    store = OrderBookStore()
+    store.update_from_message({
+        "event_type": "book",
+        "asset_id": "t1",
+        "bids": [{"price": "0.45", "size": "10"}, {"price": "0.47", "size": "5"}],
+        "asks": [{"price": "0.55", "size": "8"}, {"price": "0.53", "size": "20"}],
+    })
+    assert store.get_best_bid("t1") == 0.47
+    assert store.get_best_ask("t1") == 0.53
+    depth = store.get_depth("t1")
+    assert depth["bids"] == [(0.47, 5.0), (0.45, 10.0)]
+    assert depth["asks"] == [(0.53, 20.0), (0.55, 8.0)]
+
+
+def test_price_change_removing_best_level_falls_back_to_next():
+    """
+    目的：最优档被清空（size=0）后，best ask 应退到下一档，而不是保留过期价格
+    预期：删除 0.53 后 best_ask 为 0.55；新增 0.54 后 best_ask 为 0.54
+    """
+    store = OrderBookStore()
+    store.update_from_message({
+        "event_type": "book",
+        "asset_id": "t1",
+        "bids": [["0.47", "5"]],
+        "asks": [["0.53", "20"], ["0.55", "8"]],
+    })
+    store.update_from_message({
+        "event_type": "price_change",
+        "asset_id": "t1",
+        "changes": [{"price": "0.53", "side": "SELL", "size": "0"}],
+    })
+    assert store.get_best_ask("t1") == 0.55
+    store.update_from_message({
+        "event_type": "price_change",
+        "asset_id": "t1",
+        "changes": [{"price": "0.54", "side": "SELL", "size": "3"}],
+    })
+    assert store.get_best_ask("t1") == 0.54
+    assert store.get_depth("t1", depth=1)["asks"] == [(0.54, 3.0)]
+
+
+def test_price_change_new_format_with_per_change_asset_id():
+    """
+    目的：新格式 price_change 把 asset_id 放在每个 change 中，应分别更新对应 asset
+    预期：两个 asset 的 bids 各自新增一档，best_bid 更新；此前未收到 book 快照，两者均标记 gap 失步
+    """
+    store = OrderBookStore()
+    store.update_from_message({
+        "event_type": "price_change",
+        "market": "0xabc",
+        "price_changes": [
+            {"asset_id": "ty", "price": "0.40", "size": "10", "side": "BUY"},
+            {"asset_id": "tn", "price": "0.58", "size": "12", "side": "BUY"},
+        ],
+    })
+    assert store.get_best_bid("ty") == 0.40
+    assert store.get_best_bid("tn") == 0.58
+    assert store.get_best_ask("ty") is None
+    assert store.get_invalid_assets() == {"ty": "gap", "tn": "gap"}
+
+
+def test_last_trade_price_does_not_touch_book():
+    """
+    目的：成交价消息不是挂单，不应被当成 ask 写入订单簿
+    预期：收到 last_trade_price 后 best_ask 保持不变
+    """
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "t", "bids": [["0.4", "1"]], "asks": [["0.6", "1"]]})
+    store.update_from_message({"event_type": "last_trade_price", "asset_id": "t", "price": "0.9", "side": "BUY", "size": "1"})
+    assert store.get_best_ask("t") == 0.6
+
+
+def test_messages_without_book_changes_do_not_touch_seq_or_freshness():
+    """
+    目的：带 asset_id 但不改任何档位的消息不应建簿、递增序号、刷新更新时间或标脏，否则陈旧簿显得新鲜、is_pair_current 无故失效
+    预期：无价格字段的消息、side 无法识别的增量、空 changes 之后序号与报价年龄不变，无脏市场，未知 asset 不建簿
+    """
+    now = [0.0]
+    store = OrderBookStore(clock=lambda: now[0])
+    store.set_markets([{"condition_id": "c1", "token_id_yes": "t", "token_id_no": "n"}])
+    store.update_from_message({"asset_id": "t", "bids": [["0.4", "1"]], "asks": [["0.6", "1"]]})
+    store.pop_dirty_markets()
+    now[0] = 10.0
+    store.apply_batch([
+        {"event_type": "tick_size_change", "asset_id": "t", "new_tick_size": "0.001"},
+        {"event_type": "market_status", "asset_id": "t"},
+        {"event_type": "price_change", "asset_id": "t", "side": "?", "price": "0.5", "size": "1"},
+        {"event_type": "price_change", "asset_id": "t", "changes": [{"side": "BUY"}]},
+        {"event_type": "price_change", "price_changes": [{"asset_id": "x", "best_bid": "0.4"}]},
+    ])
+    assert store.get_seq("t") == 1
+    assert store.get_quote_age("t") == 10.0
+    assert store.pop_dirty_markets() == []
+    assert "x" not in store.get_all_asset_ids()
+
+
+def test_set_markets_marks_dirty_on_either_leg_update():
+    """
+    目的：任一腿 token 更新时，其所属市场应被标记为脏，供事件驱动检测只评估受影响市场
+    预期：更新 NO 腿后 pop 得到 c1；未被监控的 token 更新不产生脏市场；pop 后清空
+    """
+    store = OrderBookStore()
+    store.set_markets([
+        {"condition_id": "c1", "token_id_yes": "ty1", "token_id_no": "tn1"},
+        {"condition_id": "c2", "token_id_yes": "ty2", "token_id_no": "tn2"},
+    ])
+    store.update_from_message({"asset_id": "tn1", "bid": 0.4, "ask": 0.6})
+    store.update_from_message({"asset_id": "other", "bid": 0.4, "ask": 0.6})
+    assert store.pop_dirty_markets() == ["c1"]
+    assert store.pop_dirty_markets() == []
+
+
+def test_wait_dirty_markets_wakes_on_update_from_other_thread():
+    """
+    目的：检测线程阻塞等待时，WS 线程的更新应立即唤醒它，而不是等到超时
+    预期：另一线程更新后 wait_dirty_markets 返回 ["c1"]，耗时远小于 timeout
+    """
+    import threading
+    import time
+
+    store = OrderBookStore()
+    store.set_markets([{"condition_id": "c1", "token_id_yes": "ty1", "token_id_no": "tn1"}])
+    t = threading.Timer(0.05, store.update_from_message, args=({"asset_id": "ty1", "ask": 0.5},))
+    t.start()
+    start = time.monotonic()
+    dirty = store.wait_dirty_markets(timeout=5.0)
+    t.join()
+    assert dirty == ["c1"]
+    assert time.monotonic() - start < 2.0
+    assert store.wait_dirty_markets(timeout=0.01) == []
+
+
+def test_dirty_handoff_conflates_bursts_into_one_marker_per_market():
+    """
+    目的：检测落后时同一市场的多次更新只保留一个待处理标记，积压以市场数为上界，并统计合并次数与等待时间
+    预期：c1 更新 5 次、c2 1 次后取走 [c1, c2]；合并 4 次；等待时间为最早标记到取走的模拟时钟差；取走的是最新报价
+    """
+    now = [10.0]
+    store = OrderBookStore(clock=lambda: now[0])
+    store.set_markets([
+        {"condition_id": "c1", "token_id_yes": "ty1", "token_id_no": "tn1"},
+        {"condition_id": "c2", "token_id_yes": "ty2", "token_id_no": "tn2"},
+    ])
+    for i in range(5):
+        store.update_from_message({"asset_id": "ty1", "bid": 0.40 + i / 100, "ask": 0.6})
+        now[0] += 0.1
+    store.update_from_message({"asset_id": "tn2", "bid": 0.3, "ask": 0.7})
+    assert store.get_handoff_stats().pending == 2
+    now[0] = 11.0
+    assert store.wait_dirty_markets(timeout=0.01) == ["c1", "c2"]
+    assert store.get_best_bid("ty1") == 0.44
+    st = store.get_handoff_stats()
+    assert (st.pending, st.marked, st.conflated, st.delivered, st.batches, st.max_batch) == (0, 6, 4, 2, 1, 2)
+    assert st.last_wait_sec == pytest.approx(1.0)
+    assert store.pop_dirty_markets() == [] and store.get_handoff_stats().batches == 1
+
+
+def test_shard_for_asset_stable_partition():
+    """
+    目的：分片必须稳定（同一 token 始终落在同一连接）且覆盖全部 token
+    预期：重复计算结果一致；结果在 [0, n) 内；num_shards=1 时恒为 0；各分片都有 token
+    """
+    from src.orderbook import shard_for_asset
+
+    ids = ["%d" % (10 ** 70 + i) for i in range(200)]
+    shards = [shard_for_asset(a, 4) for a in ids]
+    assert shards == [shard_for_asset(a, 4) for a in ids]
+    assert set(shards) == {0, 1, 2, 3}
+    assert all(shard_for_asset(a, 1) == 0 for a in ids)
+
+
+def test_start_sharded_websocket_loops_partitions_assets():
+    """
+    目的：每个分片线程只订阅自己那部分 asset_id，合起来恰好是全部
+    预期：mock run_websocket_loop 后，各分片 getter 返回的 id 互不重叠且并集为全集
+    """
+    from unittest.mock import patch
+    from src.orderbook import start_sharded_websocket_loops
+
+    ids = ["a%d" % i for i in range(50)]
+    calls = []
+    with patch("src.orderbook.run_websocket_loop", side_effect=lambda *args: calls.append(args)):
+        stats = start_sharded_websocket_loops(OrderBookStore(), lambda: ids, 3)
+        import time
+        deadline = time.monotonic() + 2.0
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert [st.shard_id for st in stats] == [0, 1, 2]
+    parts = [args[1]() for args in calls]
+    assert sorted(a for p in parts for a in p) == sorted(ids)
+    assert sum(len(p) for p in parts) == len(ids)
+
+
+def test_plan_resubscription_diff_and_frames():
+    """
+    目的：市场刷新后只对差异部分发送增量订阅/退订帧
+    预期：added/removed 正确且保持顺序；无差异时不生成帧
+    """
+    import json
+    from src.orderbook import plan_resubscription
+
+    added, removed, frames = plan_resubscription(["a", "b", "c"], ["b", "c", "d", "e"])
+    assert added == ["d", "e"]
+    assert removed == ["a"]
+    assert [json.loads(f) for f in frames] == [
+        {"assets_ids": ["d", "e"], "operation": "subscribe"},
+        {"assets_ids": ["a"], "operation": "unsubscribe"},
+    ]
+    assert plan_resubscription(["a", "b"], ["b", "a"]) == ([], [], [])
+
+
+def test_resubscribe_drops_book_state_for_removed_tokens():
+    """
+    目的：退订的 token 不应残留旧订单簿，避免对不再更新的价格做检测
+    预期：_resubscribe 发送帧后，被移除 token 的 best ask 为 None、序号清零，保留 token 不受影响
+    """
+    from src.orderbook import ShardStats, _resubscribe
+
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "old", "bid": 0.4, "ask": 0.6})
+    store.update_from_message({"asset_id": "keep", "bid": 0.4, "ask": 0.6})
+    sent = []
+    subscribed = _resubscribe(sent.append, store, ["old", "keep"], ["keep", "new"], ShardStats())
+    assert subscribed == ["keep", "new"]
+    assert len(sent) == 2
+    assert store.get_best_ask("old") is None
+    assert store.get_seq("old") == 0
+    assert store.get_best_ask("keep") == 0.6
+
+
+def test_decode_frame_dict_list_and_non_json(monkeypatch):
+    """
+    目的：帧解码在有无 orjson 时结果一致，非 JSON 帧（如 PONG）不报错
+    预期：dict 帧得单元素列表，list 帧过滤非 dict，"PONG" 得空列表；禁用 orjson 后结果相同
+    """
+    import src.orderbook as ob
+
+    frame = '[{"asset_id": "t1", "bid": "0.4"}, 5, {"asset_id": "t2"}]'
+    expected = [{"asset_id": "t1", "bid": "0.4"}, {"asset_id": "t2"}]
+    assert ob.decode_frame(frame) == expected
+    assert ob.decode_frame(b'{"asset_id": "t1"}') == [{"asset_id": "t1"}]
+    assert ob.decode_frame("PONG") == []
+    monkeypatch.setattr(ob, "_orjson", None)
+    assert ob.decode_frame(frame) == expected
+    assert ob.decode_frame("PONG") == []
+
+
+def test_apply_batch_matches_per_message_updates():
+    """
+    目的：批量写入与逐条 update_from_message 的结果必须一致，且整帧只标记一次脏市场
+    预期：两个 store 的深度相同；批量 store 的脏市场为 ["c1"]
+    """
+    msgs = [
+        {"event_type": "book", "asset_id": "ty", "bids": [["0.40", "5"]], "asks": [["0.45", "5"], ["0.47", "9"]]},
+        {"event_type": "price_change", "asset_id": "ty", "changes": [{"price": "0.45", "side": "SELL", "size": "0"}]},
+        {"event_type": "book", "asset_id": "tn", "bids": [["0.50", "3"]], "asks": [["0.52", "4"]]},
+    ]
+    one = OrderBookStore()
+    for m in msgs:
+        one.update_from_message(m)
+    batch = OrderBookStore()
+    batch.set_markets([{"condition_id": "c1", "token_id_yes": "ty", "token_id_no": "tn"}])
+    batch.apply_batch(msgs)
+    for aid in ("ty", "tn"):
+        assert batch.get_depth(aid) == one.get_depth(aid)
+    assert batch.get_best_ask("ty") == 0.47
+    assert batch.pop_dirty_markets() == ["c1"]
+
+
+def test_get_market_snapshot_reads_both_legs_with_sequences():
+    """
+    目的：一次调用读出两腿 bid/ask 与各自序号，序号随该腿更新递增
+    预期：快照价格正确；NO 腿更新后 is_pair_current 变为 False，YES 腿序号不变；with_depth 时带两腿档位
+    """
+    store = OrderBookStore()
+    store.update_from_message({"asset_id": "ty", "bid": 0.47, "ask": 0.48})
+    store.update_from_message({"asset_id": "tn", "bid": 0.49, "ask": 0.50})
+    snap = store.get_market_snapshot("ty", "tn")
+    assert (snap.bid_yes, snap.ask_yes, snap.bid_no, snap.ask_no) == (0.47, 0.48, 0.49, 0.50)
+    assert snap.seq_yes == 1 and snap.seq_no == 1
+    assert store.is_pair_current("ty", "tn", snap.seq_yes, snap.seq_no)
+    store.update_from_message({"asset_id": "tn", "ask": 0.55})
+    assert not store.is_pair_current("ty", "tn", snap.seq_yes, snap.seq_no)
+    assert store.get_seq("ty") == 1
+    assert store.get_seq("tn") == 2
+    assert snap.depth_yes is None
+    deep = store.get_market_snapshot("ty", "tn", with_depth=True)
+    assert deep.depth_yes == {"bids": [(0.47, 0.0)], "asks": [(0.48, 0.0)]}
+    assert deep.depth_no["asks"] == [(0.55, 0.0)] and deep.seq_no == 2
+
+
+def test_store_tracks_quote_age_exchange_ts_and_freshness():
+    """
+    目的：每个 asset 记录最近更新的时钟时间与消息中的交易所时间戳，并提供全局新鲜度概览
+    预期：注入时钟下快照年龄正确；毫秒时间戳转为秒；freshness 报告最旧/中位年龄与超龄数（未更新的 token 计为超龄）
+    """
+    now = [100.0]
+    store = OrderBookStore(clock=lambda: now[0])
+    store.update_from_message({"event_type": "book", "asset_id": "ty", "timestamp": "1757908892351",
+                               "bids": [["0.4", "1"]], "asks": [["0.5", "1"]]})
+    now[0] = 130.0
+    store.update_from_message({"asset_id": "tn", "bid": 0.45, "ask": 0.5})
+    now[0] = 140.0
+    snap = store.get_market_snapshot("ty", "tn")
+    assert (snap.age_yes, snap.age_no, snap.max_age()) == (40.0, 10.0, 40.0)
+    assert store.get_quote_age("tn") == 10.0
+    assert store.get_exchange_ts("ty") == pytest.approx(1757908892.351)
+    assert store.get_exchange_ts("tn") is None
+
+    fr = store.get_freshness(["ty", "tn", "never"], max_age_sec=30.0)
+    assert fr.asset_count == 3
+    assert (fr.oldest_age_sec, fr.oldest_asset_id, fr.median_age_sec) == (40.0, "ty", 25.0)
+    assert fr.stale_count == 2
+    assert store.get_freshness().stale_count == 0
+
+
+def test_desync_detection_marks_assets_invalid_until_snapshot():
+    """
+    目的：增量删除不存在的价位、best_bid/best_ask 与本地不符、外部断线标记都使 asset 失步；只有全量快照才恢复
+    预期：失步后快照 valid=False 且 is_pair_current 为 False；收到 book 快照后恢复；desync_counts 按原因计数
+    """
+    store = OrderBookStore()
+    book = {"event_type": "book", "asset_id": "ty", "bids": [["0.40", "5"]], "asks": [["0.45", "5"]]}
+    store.update_from_message(book)
+    store.update_from_message({"event_type": "book", "asset_id": "tn", "bids": [["0.50", "5"]], "asks": [["0.55", "5"]]})
+    assert store.get_market_snapshot("ty", "tn").valid
+
+    store.update_from_message({"event_type": "price_change", "asset_id": "ty",
+                               "changes": [{"price": "0.43", "side": "SELL", "size": "0"}]})
+    snap = store.get_market_snapshot("ty", "tn")
+    assert not snap.valid and not store.is_valid("ty")
+    assert not store.is_pair_current("ty", "tn", snap.seq_yes, snap.seq_no)
+    assert store.get_invalid_assets() == {"ty": "gap"}
+
+    store.update_from_message(book)
+    assert store.is_valid("ty")
+    store.update_from_message({"event_type": "price_change", "price_changes": [
+        {"asset_id": "ty", "price": "0.41", "side": "BUY", "size": "3", "best_bid": "0.42", "best_ask": "0.45"},
+    ]})
+    assert store.get_invalid_assets() == {"ty": "best_mismatch"}
+    store.update_from_message({"event_type": "price_change", "asset_id": "ty", "side": "BUY", "price": "0.39", "size": "1"})
+    assert not store.is_valid("ty")
+
+    store.invalidate(["tn"], "disconnect")
+    assert store.desync_counts == {"gap": 1, "best_mismatch": 1, "disconnect": 1}
+    assert store.apply_snapshot_if_invalid({"asset_id": "tn", "bids": [{"price": "0.51", "size": "2"}], "asks": []})
+    assert store.is_valid("tn") and store.get_best_bid("tn") == 0.51 and store.get_best_ask("tn") is None
+    assert not store.apply_snapshot_if_invalid({"asset_id": "tn", "bids": [], "asks": []})
+    assert store.get_best_bid("tn") == 0.51
+
+
+def test_book_hash_verification_is_opt_in():
+    """
+    目的：开启 verify_hash 时 book 自带 hash 与内容不符则失步；哈希一致或未开启时正常
+    预期：compute_book_hash 结果作为 hash 通过；篡改后失步；未开启校验的 store 不受影响
+    """
+    from src.orderbook import compute_book_hash
+
+    msg = {"event_type": "book", "market": "0xm", "asset_id": "t1", "timestamp": "1757908892351",
+           "bids": [{"price": "0.4", "size": "10"}], "asks": [{"price": "0.5", "size": "10"}]}
+    msg["hash"] = compute_book_hash(msg)
+    store = OrderBookStore(verify_hash=True)
+    store.update_from_message(msg)
+    assert store.is_valid("t1")
+    store.update_from_message(dict(msg, asks=[{"price": "0.49", "size": "10"}]))
+    assert store.get_invalid_assets() == {"t1": "hash"}
+    plain = OrderBookStore()
+    plain.update_from_message(dict(msg, asks=[{"price": "0.49", "size": "10"}]))
+    assert plain.is_valid("t1")
+
+
+def test_estimate_fill_walks_depth_for_vwap_worst_price_and_limit():
+    """
+    目的：买入沿 asks、卖出沿 bids 逐档吃单，得到真实 VWAP、最差价与限价内可成交量
+    预期：买 150 份吃两档 VWAP=(100*0.40+50*0.42)/150；深度不足时 get_vwap 为 None；限价 0.42 内最多买 300 份
+    """
+    store = OrderBookStore()
+    store.update_from_message({
+        "event_type": "book", "asset_id": "t",
+        "bids": [{"price": "0.38", "size": "80"}, {"price": "0.37", "size": "200"}],
+        "asks": [{"price": "0.40", "size": "100"}, {"price": "0.42", "size": "200"}, {"price": "0.45", "size": "500"}],
+    })
+    est = store.estimate_fill("t", "BUY", 150)
+    assert est.complete and est.filled == 150 and est.levels == 2
+    assert est.vwap == pytest.approx((100 * 0.40 + 50 * 0.42) / 150)
+    assert est.worst_price == 0.42
+    assert store.get_worst_price("t", "buy", 150) == 0.42
+    assert store.get_vwap("t", "SELL", 100) == pytest.approx((80 * 0.38 + 20 * 0.37) / 100)
+    assert store.get_vwap("t", "BUY", 1000) is None
+    assert not store.estimate_fill("t", "BUY", 1000).complete
+    assert store.max_size_under_limit("t", "BUY", 0.42) == 300
+    assert store.max_size_under_limit("t", "SELL", 0.38) == 80
+    assert store.max_size_under_limit("t", "BUY", 0.39) == 0
+    assert store.estimate_fill("missing", "BUY", 10).filled == 0
+    with pytest.raises(ValueError):
+        store.estimate_fill("t", "bid", 10)
@@ -0,0 +1,125 @@
+# 目的：验证数组化报价表的槽位分配、消息写入与读取 API，与 OrderBookStore 行为一致
+# 方法：构造 book/price_change/平铺报价消息写入 QuoteTable，断言最优价、快照与槽位复用；NumPy 与 array 两种列各跑一遍
+
+import pytest
+import src.quote_table as qt
+from src.quote_table import QuoteTable
+
+
+@pytest.fixture(params=["numpy", "array"])
+def table_cls(request, monkeypatch):
+    """目的：同一组用例分别在 NumPy 列与标准库 array 列上运行"""
+    if request.param == "array":
+        monkeypatch.setattr(qt, "np", None)
+    elif qt.np is None:
+        pytest.skip("未安装 numpy")
+    return QuoteTable
+
+
+def test_subscribe_assigns_stable_slots_and_grows(table_cls):
+    """
+    目的：订阅时分配连续槽位，重复订阅沿用原槽位，超过容量自动扩容
+    预期：slots 为 0..n-1；再次订阅同 token 槽位不变；capacity >= n
+    """
+    table = table_cls(capacity=2)
+    ids = ["t%d" % i for i in range(5)]
+    assert table.subscribe(ids) == [0, 1, 2, 3, 4]
+    assert table.subscribe(["t3"]) == [3]
+    assert table.capacity >= 5
+    assert len(table) == 5
+
+
+def test_book_and_price_change_update_top_of_book(table_cls):
+    """
+    目的：book 取各边最优档；新格式 price_change 使用 best_bid/best_ask 字段
+    预期：best_bid=0.47、best_ask=0.53；price_change 后 best_ask=0.55，序号递增
+    """
+    table = table_cls()
+    table.subscribe(["t1"])
+    table.update_from_message({
+        "event_type": "book",
+        "asset_id": "t1",
+        "bids": [{"price": "0.45", "size": "10"}, {"price": "0.47", "size": "5"}],
+        "asks": [{"price": "0.55", "size": "8"}, {"price": "0.53", "size": "20"}],
+    })
+    assert table.get_best_bid("t1") == 0.47
+    assert table.get_best_ask("t1") == 0.53
+    assert table.ask_size[table.slot_of("t1")] == 20.0
+    table.apply_batch([{
+        "event_type": "price_change",
+        "price_changes": [
+            {"asset_id": "t1", "price": "0.53", "size": "0", "side": "SELL", "best_bid": "0.47", "best_ask": "0.55"},
+        ],
+    }])
+    assert table.get_best_ask("t1") == 0.55
+    assert table.get_seq("t1") == 2
+
+
+def test_unsubscribed_token_ignored_and_slot_reused(table_cls):
+    """
+    目的：未订阅 token 的消息不写入；退订后槽位清空并被新 token 复用
+    预期：未订阅 token 读为 None；退订 t1 后 t2 复用其槽位且无旧报价
+    """
+    table = table_cls()
+    table.update_from_message({"asset_id": "x", "bid": 0.4, "ask": 0.6})
+    assert table.get_best_bid("x") is None
+    table.subscribe(["t1"])
+    table.update_from_message({"asset_id": "t1", "bid": 0.4, "ask": 0.6})
+    slot = table.slot_of("t1")
+    table.unsubscribe(["t1"])
+    assert table.get_best_ask("t1") is None
+    assert table.subscribe(["t2"]) == [slot]
+    assert table.get_best_ask("t2") is None
+
+
+def test_resolve_markets_and_snapshot(table_cls):
+    """
+    目的：按市场一次解析 YES/NO 槽位；快照 API 与 OrderBookStore 一致
+    预期：缺 token 的市场被跳过；快照价格与序号正确
+    """
+    table = table_cls()
+    markets = [
+        {"token_id_yes": "ty", "token_id_no": "tn"},
+        {"token_id_yes": "only_yes"},
+    ]
+    idx, ys, ns = table.resolve_markets(markets)
+    assert idx == [0]
+    assert (ys, ns) == ([table.slot_of("ty")], [table.slot_of("tn")])
+    table.update_from_message({"asset_id": "ty", "bid": 0.47, "ask": 0.48})
+    table.update_from_message({"asset_id": "tn", "bid": 0.49, "ask": 0.50})
+    snap = table.get_market_snapshot("ty", "tn")
+    assert (snap.bid_yes, snap.ask_yes, snap.bid_no, snap.ask_no) == (0.47, 0.48, 0.49, 0.50)
+    assert table.is_pair_current("ty", "tn", snap.seq_yes, snap.seq_no)
+
+
+def test_gather_slots_returns_quotes_and_seqs(table_cls):
+    """
+    目的：gather_slots 一次取出多个市场两腿的报价与序号，供向量扫描
+    预期：列顺序与传入槽位一致；未报价的槽位为 NaN、序号为 0
+    """
+    table = table_cls()
+    ys = table.subscribe(["y1", "y2"])
+    ns = table.subscribe(["n1", "n2"])
+    table.update_from_message({"asset_id": "y1", "bid": 0.4, "ask": 0.45})
+    table.update_from_message({"asset_id": "n1", "bid": 0.5, "ask": 0.52})
+    table.update_from_message({"asset_id": "n1", "ask": 0.51})
+    by, ay, bn, an, sy, sn = table.gather_slots(ys, ns)
+    assert (by[0], ay[0], bn[0], an[0]) == (0.4, 0.45, 0.5, 0.51)
+    assert (int(sy[0]), int(sn[0]), int(sy[1]), int(sn[1])) == (1, 2, 0, 0)
+    assert ay[1] != ay[1]
+
+
+def test_price_change_zero_best_means_empty_side(table_cls):
+    """
+    目的：新格式 price_change 的 best_bid/best_ask 为 "0" 表示该边为空，应存 NaN 而不是价格 0
+    预期：best_ask="0" 后 get_best_ask 为 None，bid 不受影响
+    """
+    table = table_cls()
+    table.subscribe(["t1"])
+    table.update_from_message({"asset_id": "t1", "bid": 0.4, "ask": 0.6})
+    table.apply_batch([{
+        "event_type": "price_change",
+        "price_changes": [{"asset_id": "t1", "price": "0.6", "size": "0", "side": "SELL", "best_bid": "0.4", "best_ask": "0"}],
+    }])
+    assert table.get_best_ask("t1") is None
+    assert table.get_best_bid("t1") == 0.4
@@ -0,0 +1,102 @@
+# 目的：验证失步订单簿的 REST 重同步：宽限期、分批请求、只对仍失步的 asset 应用快照、失败保留失步状态
+# 方法：注入时钟的 OrderBookStore + 假 fetch 函数，调用 BookResyncer.resync_once 断言
+
+from src.orderbook import OrderBookStore
+from src.resync import BookResyncer
+
+
+def test_resync_waits_grace_then_batches_and_restores():
+    """
+    目的：失步超过 grace_sec 才走 REST；按 batch_size 分批；快照应用后 asset 恢复可交易
+    预期：宽限期内不请求；之后 3 个 asset 分 2 批请求，全部恢复，best bid 来自 REST 快照
+    """
+    now = [0.0]
+    store = OrderBookStore(clock=lambda: now[0])
+    store.invalidate(["a", "b", "c"], "disconnect")
+    calls = []
+
+    def fetch(ids):
+        calls.append(list(ids))
+        return [{"asset_id": i, "bids": [{"price": "0.4", "size": "1"}], "asks": [{"price": "0.6", "size": "1"}]} for i in ids]
+
+    rs = BookResyncer(store, fetch=fetch, batch_size=2, grace_sec=2.0)
+    assert rs.resync_once() == 0 and calls == []
+    now[0] = 3.0
+    assert rs.resync_once() == 3
+    assert calls == [["a", "b"], ["c"]]
+    assert store.get_invalid_assets() == {}
+    assert store.get_best_bid("c") == 0.4
+    assert (rs.stats.requests, rs.stats.applied) == (2, 3)
+
+
+def test_resync_skips_assets_restored_by_ws_and_keeps_failed_batches():
+    """
+    目的：REST 返回前已被 WS 快照恢复的 asset 不被较旧的 REST 快照覆盖；请求失败时失步状态保留到下一轮
+    预期：a 保持 WS 价格；b 的请求失败后仍失步，errors=1
+    """
+    store = OrderBookStore()
+    store.invalidate(["a"], "gap")
+
+    def fetch_after_ws(ids):
+        store.update_from_message({"event_type": "book", "asset_id": "a", "bids": [["0.45", "1"]], "asks": [["0.5", "1"]]})
+        return [{"asset_id": "a", "bids": [{"price": "0.3", "size": "1"}], "asks": []}]
+
+    assert BookResyncer(store, fetch=fetch_after_ws, grace_sec=0).resync_once() == 0
+    assert store.get_best_bid("a") == 0.45
+
+    store.invalidate(["b"], "disconnect")
+
+    def failing(ids):
+        raise RuntimeError("503")
+
+    rs = BookResyncer(store, fetch=failing, grace_sec=0)
+    assert rs.resync_once() == 0
+    assert rs.stats.errors == 1 and "503" in rs.stats.last_error
+    assert store.get_invalid_assets() == {"b": "disconnect"}
+
+
+def test_delta_without_snapshot_is_gap_and_resynced():
+    """
+    目的：从未收到 book 快照的 asset 收到 price_change（漏收快照）应判为失步，由 REST 重同步补齐
+    预期：增量后 a 标记 gap；resync_once 请求 a 并应用快照后恢复，best bid 来自 REST
+    """
+    store = OrderBookStore()
+    store.update_from_message({"event_type": "price_change", "asset_id": "a", "side": "BUY", "price": "0.41", "size": "5"})
+    assert store.get_invalid_assets() == {"a": "gap"}
+    calls = []
+
+    def fetch(ids):
+        calls.append(list(ids))
+        return [{"asset_id": "a", "bids": [{"price": "0.4", "size": "1"}], "asks": [{"price": "0.6", "size": "1"}]}]
+
+    assert BookResyncer(store, fetch=fetch, grace_sec=0).resync_once() == 1
+    assert calls == [["a"]]
+    assert store.get_invalid_assets() == {}
+    assert store.get_best_bid("a") == 0.4
+
+
+def test_resync_rejects_snapshot_older_than_ws_delta():
+    """
+    目的：REST fetch 与应用之间到达的 WS 增量比快照新时，较旧的快照不得覆盖它
+    预期：快照 timestamp 早于增量 -> 不应用、a 仍失步、增量档位保留；下一轮拿到更新的快照后恢复
+    """
+    store = OrderBookStore()
+    store.update_from_message({"event_type": "price_change", "asset_id": "a", "side": "BUY", "price": "0.41", "size": "5",
+                               "timestamp": "1757908890000"})
+    assert store.get_invalid_assets() == {"a": "gap"}
+
+    def fetch_with_delta(ids):
+        store.update_from_message({"event_type": "price_change", "asset_id": "a", "side": "BUY", "price": "0.42", "size": "3",
+                                   "timestamp": "1757908892000"})
+        return [{"asset_id": "a", "timestamp": "1757908891000", "bids": [{"price": "0.4", "size": "1"}], "asks": []}]
+
+    assert BookResyncer(store, fetch=fetch_with_delta, grace_sec=0).resync_once() == 0
+    assert store.get_invalid_assets() == {"a": "gap"}
+    assert store.get_best_bid("a") == 0.42
+
+    def fetch_newer(ids):
+        return [{"asset_id": "a", "timestamp": "1757908893000", "bids": [{"price": "0.4", "size": "1"}], "asks": []}]
+
+    assert BookResyncer(store, fetch=fetch_newer, grace_sec=0).resync_once() == 1
+    assert store.get_invalid_assets() == {}
+    assert store.get_best_bid("a") == 0.4
@@ -0,0 +1,103 @@
+# 目的：验证共享内存报价表：seqlock 读写、槽位复用的 owner 校验，以及进程外接入端到端与 OrderBookStore 读取接口一致
+# 方法：直接读写 SharedQuoteTable；端到端用本地模拟 CLOB 服务端 + SharedMemoryQuoteStore.start 启动真实接入进程
+
+import asyncio
+import threading
+import time
+
+import pytest
+from src.shm_store import REASON_CODES, SharedMemoryQuoteStore, SharedQuoteTable
+
+
+def test_table_seqlock_roundtrip_and_torn_read_retry():
+    """
+    目的：写入后读回一致；写入进行中（seq 为奇数）读方重试后放弃而不是返回半写的数据
+    预期：字段与档位原样读回，超出 depth 的档位被截断；seq 置奇数时 read 返回 None
+    """
+    table = SharedQuoteTable(capacity=4, depth=2)
+    try:
+        table.write(1, 7, 3, 0, 100.0, 1757908892.351, None, [(0.4, 10.0), (0.39, 5.0), (0.38, 1.0)], [(0.45, 2.0)])
+        row = table.read(1)
+        assert row[0] == 2.0 and row[1:4] == [7.0, 3.0, 0.0]
+        assert row[4] == 100.0 and row[6] != row[6]
+        assert row[7:9] == [2.0, 1.0]
+        assert row[9:13] == [0.4, 10.0, 0.39, 5.0] and row[13:15] == [0.45, 2.0]
+        table.buf[1 * table.stride] = 5.0
+        assert table.read(1, retries=10) is None
+        assert table.read(0)[1] == 0.0
+    finally:
+        table.close()
+        table.unlink()
+
+
+def test_store_reads_slots_and_ignores_stale_owner():
+    """
+    目的：读取端按 OrderBookStore 接口返回报价；槽位回收后分配给新 token，旧 token 的残留数据因 owner 不符不被读到
+    预期：快照、深度、失步原因正确；复用槽位的新 token 在接入进程写入前无报价
+    """
+    store = SharedMemoryQuoteStore(capacity=2, depth=3)
+    try:
+        with store._lock:
+            owned = store._allocate(["ty", "tn"])
+        (sy, oy), (sn, on) = owned["ty"], owned["tn"]
+        now = time.monotonic()
+        store.table.write(sy, oy, 4, 0, now, None, None, [(0.4, 10.0)], [(0.45, 3.0), (0.46, 8.0)])
+        store.table.write(sn, on, 9, REASON_CODES["gap"], now, None, now, [(0.5, 1.0)], [(0.55, 1.0)])
+        snap = store.get_market_snapshot("ty", "tn")
+        assert (snap.bid_yes, snap.ask_yes, snap.ask_no, snap.seq_yes, snap.seq_no) == (0.4, 0.45, 0.55, 4, 9)
+        assert not snap.valid and not store.is_pair_current("ty", "tn", 4, 9)
+        assert store.get_invalid_assets() == {"tn": "gap"}
+        assert store.get_depth("ty") == {"bids": [(0.4, 10.0)], "asks": [(0.45, 3.0), (0.46, 8.0)]}
+        assert store.get_vwap("ty", "BUY", 5) == pytest.approx((3 * 0.45 + 2 * 0.46) / 5)
+        assert store.max_size_under_limit("ty", "BUY", 0.46) == 11.0
+        assert store.get_freshness(["ty", "tn", "never"], max_age_sec=60).stale_count == 1
+
+        with store._lock:
+            store._release(["tn"])
+            assert store._allocate(["tx"])["tx"][0] == sn
+        assert store.get_best_bid("tx") is None and store.get_best_bid("tn") is None
+    finally:
+        store.stop()
+
+
+def test_out_of_process_ingest_end_to_end():
+    """
+    目的：接入进程从模拟服务端收行情并发布到共享表；主进程经 wait_dirty_markets 被唤醒并读到与服务端一致的报价
+    预期：收到脏市场通知；停止推送后读到的最优价与模拟服务端簿一致；分片统计经管道回传
+    """
+    pytest.importorskip("websockets")
+    from src.mock_clob import MockClobServer, SyntheticFlow
+
+    flow = SyntheticFlow(num_markets=4, seed=5)
+    server = MockClobServer(flow, rate=500)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def _serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    assert started.wait(5)
+    store = SharedMemoryQuoteStore(capacity=16, depth=3)
+    store.set_markets(flow.markets)
+    try:
+        store.start(flow.asset_ids, url=server.url, resync_enabled=False, latency_metrics=False)
+        dirty = set()
+        deadline = time.monotonic() + 20
+        while len(dirty) < len(flow.markets) and time.monotonic() < deadline:
+            dirty.update(store.wait_dirty_markets(0.5))
+        assert dirty == {m["condition_id"] for m in flow.markets}
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result(5)
+        time.sleep(0.3)
+        for aid, book in flow.books.items():
+            assert store.get_best_ask(aid) == pytest.approx(book.best_ask() / 100)
+        deadline = time.monotonic() + 5
+        while not (store.shard_stats and store.shard_stats[0].messages) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert store.shard_stats and store.shard_stats[0].messages > 0
+    finally:
+        store.stop()
+        loop.call_soon_threadsafe(loop.stop)
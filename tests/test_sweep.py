@@ -0,0 +1,82 @@
+# 目的：验证并行参数扫描：网格展开、多进程回测同一份录制、结果按 PnL 排序
+# 方法：在 tmp_path 下录制一个 Merge 机会，对 min_profit 扫两档（一档能命中、一档不能），断言排序与 worker 结果
+
+import json
+import tempfile
+
+import pytest
+import src.sweep as sweep
+from src.capture import FrameRecorder, consolidate_capture, iter_frames, list_capture_files
+from src.sweep import expand_grid, format_table, run_sweep
+
+MARKET = {"condition_id": "c1", "token_id_yes": "y", "token_id_no": "n", "question": "Q"}
+
+
+def _capture(tmp_path):
+    now = [0.0]
+    rec = FrameRecorder(str(tmp_path), clock=lambda: now[0])
+    rec.record(json.dumps({"event_type": "book", "asset_id": "n", "bids": [["0.50", "10"]], "asks": [["0.55", "10"]]}), recv_ns=0)
+    now[0] = 3600.0
+    rec.record(json.dumps({"event_type": "book", "asset_id": "y", "bids": [["0.38", "10"]], "asks": [["0.40", "10"]]}), recv_ns=10**9)
+    rec.close()
+    return list_capture_files(str(tmp_path))
+
+
+def test_expand_grid_is_cartesian_and_ordered():
+    """
+    目的：网格按键名排序后做笛卡尔积
+    预期：2x2 = 4 个变体，顺序确定；空网格得到一个空变体
+    """
+    variants = expand_grid({"min_profit": [0.01, 0.02], "fee_bps": [0, 10]})
+    assert variants == [
+        {"fee_bps": 0, "min_profit": 0.01},
+        {"fee_bps": 0, "min_profit": 0.02},
+        {"fee_bps": 10, "min_profit": 0.01},
+        {"fee_bps": 10, "min_profit": 0.02},
+    ]
+    assert expand_grid({}) == [{}]
+
+
+def test_consolidate_capture_merges_gz_segments(tmp_path):
+    """
+    目的：多段 .gz 录制合并为单个未压缩 .bin，帧与接收时间不变
+    预期：合并文件读回 2 帧，recv_ns 依次为 0 与 1e9
+    """
+    files = _capture(tmp_path)
+    assert all(f.endswith(".gz") for f in files) and len(files) == 2
+    out = str(tmp_path / "all.bin")
+    assert consolidate_capture(files, out) == 2
+    assert [ns for ns, _ in iter_frames(out)] == [0, 10**9]
+
+
+def test_run_sweep_ranks_variants_by_pnl(tmp_path):
+    """
+    目的：多进程跑每个变体并按总 PnL 排序
+    预期：min_profit=0.01 命中 Merge（利润 0.05/份，按两腿深度定量为 10 份），排第一；min_profit=0.1 无成交
+    """
+    files = _capture(tmp_path)
+    rows = run_sweep(
+        files, [MARKET], {"min_profit": [0.1, 0.01]},
+        base_config={"default_size": 5.0, "split_arb_enabled": False}, max_workers=2,
+    )
+    assert [r["params"]["min_profit"] for r in rows] == [0.01, 0.1]
+    assert [r["rank"] for r in rows] == [1, 2]
+    assert abs(rows[0]["result"]["total_pnl"] - 0.5) < 1e-9
+    assert rows[1]["result"]["strategies"]["merge"]["trades"] == 0
+    assert "min_profit" in format_table(rows).splitlines()[0]
+
+
+def test_run_sweep_removes_temp_dir_when_consolidation_fails(tmp_path, monkeypatch):
+    """
+    目的：合并录制失败时也要删除自建的临时目录
+    预期：异常向上抛出，tmp 目录下不残留 sweep-* 目录
+    """
+    def boom(paths, out):
+        open(out, "wb").write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(sweep, "consolidate_capture", boom)
+    with pytest.raises(OSError):
+        run_sweep([], [MARKET], {"min_profit": [0.01]})
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith("sweep-")]
@@ -0,0 +1,96 @@
+# 目的：验证 Telegram 后台推送：有界队列丢弃最旧、突发合并为摘要、429 按 retry_after 重试、notify_* 只入队
+# 方法：用假 Session 记录 post 调用并按预设返回状态码，不访问网络；限速间隔设为 0，retry_after 取很小的值
+
+from src import telegram_notify
+from src.telegram_notify import TelegramNotifier, pack_digests
+
+
+class _Resp:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.headers = headers or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, data=None, timeout=None):
+        self.posts.append(data["text"])
+        return self.responses.pop(0) if self.responses else _Resp(200)
+
+
+def _notifier(session, **kwargs):
+    kwargs.setdefault("min_interval_sec", 0.0)
+    return TelegramNotifier(bot_token="t", chat_id="c", session=session, **kwargs)
+
+
+def test_enqueue_drops_oldest_when_full():
+    """
+    目的：队列满时丢弃最旧的消息，入队不阻塞、不发送
+    预期：max_queue=3 入队 5 条后队列为最新 3 条，dropped=2，未调用 post；未配置 token 时 enqueue 返回 False
+    """
+    session = _Session()
+    n = _notifier(session, max_queue=3)
+    for i in range(5):
+        assert n.enqueue("m%d" % i)
+    assert list(n._queue) == ["m2", "m3", "m4"]
+    stats = n.get_stats()
+    assert (stats.enqueued, stats.dropped, stats.queued) == (5, 2, 3)
+    assert session.posts == []
+    assert not TelegramNotifier(bot_token="", chat_id="").enqueue("x")
+
+
+def test_worker_coalesces_burst_into_digest():
+    """
+    目的：同一突发内的多条提醒合并为一条摘要发送，stop 时发完队列
+    预期：一次 post，内容含「3 条提醒」与三条原文；超长批次按 4096 字符上限拆分
+    """
+    session = _Session()
+    n = _notifier(session, digest_window_sec=0.2)
+    for i in range(3):
+        n.enqueue("alert-%d" % i)
+    n.start()
+    n.stop(timeout=5.0)
+    assert len(session.posts) == 1
+    assert "3 条提醒" in session.posts[0]
+    assert all("alert-%d" % i in session.posts[0] for i in range(3))
+    stats = n.get_stats()
+    assert (stats.sent, stats.digests, stats.failed) == (1, 1, 0)
+
+    parts = pack_digests(["x" * 3000, "y" * 3000, "z"])
+    assert len(parts) == 2 and all(len(p) <= telegram_notify.TELEGRAM_MAX_LEN for p in parts)
+
+
+def test_send_retries_after_rate_limit():
+    """
+    目的：429 时按 parameters.retry_after 等待后重试；不可重试的 4xx 直接失败
+    预期：第一次 429、第二次 200 -> 返回 True、post 两次、rate_limited=1；400 -> 返回 False 且只 post 一次
+    """
+    session = _Session([_Resp(429, {"ok": False, "parameters": {"retry_after": 0.01}}), _Resp(200)])
+    n = _notifier(session)
+    assert n.send("hi")
+    assert session.posts == ["hi", "hi"]
+    assert n.stats.rate_limited == 1
+
+    session = _Session([_Resp(400), _Resp(200)])
+    assert not _notifier(session).send("bad")
+    assert session.posts == ["bad"]
+
+
+def test_notify_enqueues_when_notifier_running(monkeypatch):
+    """
+    目的：全局后台推送器启动后 notify_* 只入队，不在调用线程发请求
+    预期：notify_heartbeat 返回 True、消息进入队列，send_telegram_message 未被调用
+    """
+    n = _notifier(_Session(), digest_window_sec=60.0)
+    monkeypatch.setattr(telegram_notify, "_notifier", n)
+    monkeypatch.setattr(telegram_notify, "send_telegram_message", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    assert telegram_notify.notify_heartbeat()
+    assert len(n._queue) == 1
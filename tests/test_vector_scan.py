@@ -0,0 +1,83 @@
+# 目的：验证向量化扫描与逐市场的 check_* 结果完全一致（相同过滤、相同公式）
+# 方法：随机生成大量市场报价（含缺失与极端价），分别用 scan_markets_for_* 与 VectorScanner 计算，比较命中集合与利润
+
+import random
+from dataclasses import replace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.arbitrage import (
+    scan_markets_for_arbitrage,
+    scan_markets_for_maker_arbitrage,
+    scan_markets_for_split_arbitrage,
+)
+from src.quote_table import QuoteTable
+from src.vector_scan import VectorScanner, compute_edge_hits
+
+
+def _random_markets(n, seed=7):
+    """目的：生成 n 个市场及其报价，约一成报价缺失、部分落在 0.01/0.99 边界外"""
+    rng = random.Random(seed)
+    markets, quotes = [], {}
+    for i in range(n):
+        ty, tn = "y%d" % i, "n%d" % i
+        markets.append({"token_id_yes": ty, "token_id_no": tn, "condition_id": "c%d" % i, "question": "Q%d" % i})
+        for tid in (ty, tn):
+            bid = None if rng.random() < 0.1 else round(rng.uniform(0.0, 0.7), 3)
+            ask = None if rng.random() < 0.1 else round(rng.uniform(0.3, 1.0), 3)
+            quotes[tid] = (bid, ask)
+    return markets, quotes
+
+
+def test_vector_scanner_matches_scalar_scans():
+    """
+    目的：向量扫描命中的市场与利润必须与三个 scan_markets_for_* 完全一致
+    预期：2000 个随机市场上，三种策略的 (condition_id, 利润, 价格) 列表相同；信号带扫描时的两腿序号，is_pair_current 通过
+    """
+    markets, quotes = _random_markets(2000)
+    table = QuoteTable()
+    scanner = VectorScanner(table, markets)
+    for tid, (bid, ask) in quotes.items():
+        msg = {"asset_id": tid}
+        if bid is not None:
+            msg["bid"] = bid
+        if ask is not None:
+            msg["ask"] = ask
+        table.update_from_message(msg)
+
+    def get_bid(tid):
+        return quotes[tid][0]
+
+    def get_ask(tid):
+        return quotes[tid][1]
+
+    kw = dict(min_profit=0.01, fee_bps=20, default_size=5.0)
+    merge, split, maker = scanner.signals(scanner.scan(min_profit=0.01, fee_bps=20, maker_bid_spread=0.02), 5.0)
+    exp_merge = scan_markets_for_arbitrage(markets, get_best_ask=get_ask, **kw)
+    exp_split = scan_markets_for_split_arbitrage(markets, get_best_bid=get_bid, **kw)
+    exp_maker = scan_markets_for_maker_arbitrage(markets, get_best_ask=get_ask, get_best_bid=get_bid, maker_bid_spread=0.02, **kw)
+    assert exp_merge and exp_split and exp_maker
+    for sig in merge + split + maker:
+        assert table.is_pair_current(sig.token_id_yes, sig.token_id_no, sig.seq_yes, sig.seq_no)
+    unseq = lambda sigs: [replace(s, seq_yes=0, seq_no=0) for s in sigs]
+    assert unseq(merge) == exp_merge
+    assert unseq(split) == exp_split
+    assert unseq(maker) == exp_maker
+
+
+def test_compute_edge_hits_nan_and_band_excluded():
+    """
+    目的：缺失报价（NaN）与 0.01/0.99 区间外的报价不应命中
+    预期：仅第 0 行命中 Merge
+    """
+    nan = float("nan")
+    hits = compute_edge_hits(
+        bid_yes=[0.40, nan, 0.40],
+        ask_yes=[0.45, 0.45, 0.995],
+        bid_no=[0.40, 0.40, 0.40],
+        ask_no=[0.50, nan, 0.002],
+        min_profit=0.01,
+    )
+    assert hits.merge_idx.tolist() == [0]
@@ -0,0 +1,187 @@
+# 目的：验证 asyncio 接入引擎的退避、保活、重连与钩子逻辑，不依赖真实 WebSocket
+# 方法：注入假连接（recv 按脚本返回帧或抛异常），用 asyncio.run 驱动，断言 store 与 ShardStats
+
+import asyncio
+import json
+
+import pytest
+from src.orderbook import OrderBookStore
+from src.ws_async import AsyncMarketIngest, backoff_delay
+
+
+class FakeConn:
+    """目的：模拟 websockets 连接。方法：recv 依次返回 frames 中的元素，元素为异常则抛出，耗尽后挂起"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def recv(self):
+        if not self.frames:
+            await asyncio.sleep(3600)
+        item = self.frames.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def close(self):
+        self.closed = True
+
+
+def test_backoff_delay_exponential_with_jitter_and_cap():
+    """
+    目的：重连等待应指数增长、带抖动且不超过上限
+    预期：rng=0 时为上限的一半，rng→1 时接近上限；attempt 很大时被 cap 截断
+    """
+    assert backoff_delay(0, base=1.0, cap=30.0, rng=lambda: 0.0) == 0.5
+    assert backoff_delay(3, base=1.0, cap=30.0, rng=lambda: 0.0) == 4.0
+    assert backoff_delay(10, base=1.0, cap=30.0, rng=lambda: 0.999) < 30.0
+    assert backoff_delay(10, base=1.0, cap=30.0, rng=lambda: 0.0) == 15.0
+
+
+def test_async_ingest_applies_frames_and_calls_hooks_then_reconnects():
+    """
+    目的：帧写入 store 并通知钩子；连接异常后记录错误并重连
+    预期：store 有 best bid/ask；钩子收到消息列表；第二条连接建立后 connects=2、errors=1
+    """
+    store = OrderBookStore()
+    frame = json.dumps([{"asset_id": "t1", "bids": [["0.4", "5"]], "asks": [["0.6", "5"]]}])
+    conns = [FakeConn([frame, ConnectionError("boom")]), FakeConn([])]
+    seen = []
+
+    async def connect(url):
+        return conns.pop(0)
+
+    async def scenario():
+        engine = AsyncMarketIngest(store, ["t1"], connect=connect, backoff_base_sec=0.001, backoff_max_sec=0.01)
+
+        async def hook(msgs):
+            seen.append(msgs)
+
+        engine.add_hook(hook)
+        task = asyncio.ensure_future(engine.run())
+        for _ in range(200):
+            if engine.stats[0].connects >= 2:
+                break
+            await asyncio.sleep(0.005)
+        engine.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert store.get_best_bid("t1") == 0.4
+    assert store.get_best_ask("t1") == 0.6
+    assert seen and seen[0][0]["asset_id"] == "t1"
+    st = engine.stats[0]
+    assert st.connects == 2
+    assert st.errors == 1
+    assert "boom" in st.last_error
+
+
+def test_async_ingest_sends_ping_when_idle():
+    """
+    目的：空闲超过 ping_interval 时应发送应用层 PING 保活
+    预期：订阅消息之后出现 "PING"
+    """
+    conn = FakeConn([])
+
+    async def connect(url):
+        return conn
+
+    async def scenario():
+        engine = AsyncMarketIngest(OrderBookStore(), ["t1"], connect=connect, ping_interval_sec=0.01, pong_timeout_sec=60)
+        task = asyncio.ensure_future(engine.run())
+        for _ in range(200):
+            if "PING" in conn.sent:
+                break
+            await asyncio.sleep(0.005)
+        engine.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert json.loads(conn.sent[0]) == {"assets_ids": ["t1"], "type": "MARKET"}
+    assert "PING" in conn.sent
+
+
+def test_async_ingest_resubscribes_on_live_connection():
+    """
+    目的：监控列表变化后应在现有连接上增量订阅，而不是等断线重连
+    预期：getter 改变后发送 subscribe/unsubscribe 帧，connects 仍为 1
+    """
+    conn = FakeConn([])
+    ids = ["t1", "t2"]
+
+    async def connect(url):
+        return conn
+
+    async def scenario():
+        engine = AsyncMarketIngest(
+            OrderBookStore(), lambda: list(ids), connect=connect, resubscribe_check_sec=0.01,
+        )
+        task = asyncio.ensure_future(engine.run())
+        await asyncio.sleep(0.02)
+        ids[:] = ["t2", "t3"]
+        for _ in range(200):
+            if len(conn.sent) >= 3:
+                break
+            await asyncio.sleep(0.005)
+        engine.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return engine
+
+    engine = asyncio.run(scenario())
+    frames = [json.loads(f) for f in conn.sent[1:3]]
+    assert {"assets_ids": ["t3"], "operation": "subscribe"} in frames
+    assert {"assets_ids": ["t1"], "operation": "unsubscribe"} in frames
+    assert engine.stats[0].connects == 1
+
+
+def test_async_ingest_empty_shard_connects_when_ids_appear():
+    """
+    目的：空分片应按 resubscribe_check_sec 检查订阅列表，而不是等 backoff_max_sec
+    预期：初始无 id，随后加入 t1，远早于 backoff_max_sec 即连接并订阅 t1
+    """
+    conn = FakeConn([])
+    ids = []
+
+    async def connect(url):
+        return conn
+
+    async def scenario():
+        engine = AsyncMarketIngest(
+            OrderBookStore(), lambda: list(ids), connect=connect, resubscribe_check_sec=0.01, backoff_max_sec=30.0,
+        )
+        task = asyncio.ensure_future(engine.run())
+        await asyncio.sleep(0.02)
+        ids.append("t1")
+        for _ in range(200):
+            if conn.sent:
+                break
+            await asyncio.sleep(0.005)
+        engine.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert json.loads(conn.sent[0]) == {"assets_ids": ["t1"], "type": "MARKET"}
+    assert engine.stats[0].connects == 1